@@ -10,6 +10,10 @@ RELIC_NAV_DATA = {
         "row_start_bottom": (0.096875, 0.776),
         "offset_x": 0.065,
         "offset_y": 0.13796,
+        # (x, y, w, h) of an item's level badge, x and y relative to its click position
+        "level_sample": (-0.02, 0.035, 0.04, 0.025),
+        # offset from an item's click position to a point on its rarity background
+        "rarity_sample": (-0.022, -0.035),
         "rows": 5,
         "cols": 9,
     }
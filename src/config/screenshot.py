@@ -9,6 +9,12 @@ SCREENSHOT_COORDS = {
             "chest": (0.44, 0.3315, 0.1245, 0.1037),
             "name": (0.0656, 0.059, 0.165, 0.0314),
             "level": (0.7975, 0.221, 0.02225, 0.031),
+            # regions that change when a character or tab is selected, watched to detect when the ui has settled
+            "settle": {
+                "details": (0.72, 0.18, 0.25, 0.1),
+                "traces": (0.48, 0.38, 0.22, 0.25),
+                "eidolons": (0.15, 0.15, 0.7, 0.7),
+            },
             "eidolons": [
                 (0.3270416666666667, 0.17777777777777778),
                 (0.5328125, 0.16574074074074074),
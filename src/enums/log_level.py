@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class LogLevel(Enum):
+    """LogLevel enum for the severity of scan log events"""
+
+    INFO = "info"
+    WARNING = "warning"
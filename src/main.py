@@ -1,19 +1,31 @@
 import asyncio
 import datetime
+import os
 from ui.hsr_scanner import Ui_MainWindow
 from PyQt6 import QtCore, QtGui, QtWidgets
 from services.scanner.scanner import HSRScanner
+from services.scanner.journal import ScanJournal
 from enums.increment_type import IncrementType
+from enums.log_level import LogLevel
 from pynput.keyboard import Key, Listener
-from utils.data import resource_path, save_to_json, executable_path
-from utils.conversion import convert_to_sro
+from utils.data import resource_path, executable_path
+from utils.export import Exporter, ExportFormat, SroExportFormat
+from utils.ocr import warm_up
 from models.game_data import GameData
 import pytesseract
 import sys
+import time
 
 
 pytesseract.pytesseract.tesseract_cmd = resource_path("assets/tesseract/tesseract.exe")
 
+# how often the scan progress and log on the UI are updated, in ms
+UPDATE_INTERVAL = 100
+# in-flight memory budget of a scan, in MB
+DEFAULT_MEMORY_BUDGET = 512
+# values of the HSR_SCANNER_PROFILE environment variable that turn profiling on
+PROFILE_ENV_VALUES = ("1", "true", "yes")
+
 
 class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
     """HSRScannerUI handles the UI for the HSR Scanner application"""
@@ -24,7 +36,12 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         """Constructor"""
         super().__init__()
         self._scanner_thread = None
+        self._scanner = None
         self._listener = InterruptListener()
+        self._update_timer = QtCore.QTimer(self)
+        self._update_timer.setInterval(UPDATE_INTERVAL)
+        self._update_timer.timeout.connect(self.update_progress)
+        self._update_timer.timeout.connect(self.flush_scan_log)
         self.settings = QtCore.QSettings("kel-z", "HSRScanner")
 
         # fetch game data
@@ -33,6 +50,12 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self._fetch_game_data_thread.error_signal.connect(self.handle_game_data_error)
         self._fetch_game_data_thread.start()
 
+        # warm up ocr
+        self._ocr_warm_up_thread = OcrWarmUpThread()
+        self._ocr_warm_up_thread.result_signal.connect(self.handle_ocr_ready)
+        self._ocr_warm_up_thread.error_signal.connect(self.handle_ocr_error)
+        self._ocr_warm_up_thread.start()
+
     def handle_game_data(self, game_data: GameData) -> None:
         """Handle on game data loaded
 
@@ -45,6 +68,11 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.pushButtonStartScan.setText("Start Scan")
         self._fetch_game_data_thread.deleteLater()
 
+        # save what a scan that crashed had parsed, now that it can be converted
+        journal = ScanJournal.open_existing(self.lineEditOutputLocation.text())
+        if journal is not None:
+            self.export_journal(journal)
+
     def handle_game_data_error(self, e: Exception) -> None:
         """Handle on game data error
 
@@ -55,6 +83,22 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.pushButtonStartScan.setEnabled(True)
         self.pushButtonStartScan.setText("Retry")
 
+    def handle_ocr_ready(self, seconds: float) -> None:
+        """Handle on OCR warmed up
+
+        :param seconds: The time it took to warm up
+        """
+        self.log(f"OCR engine ready ({seconds:.1f}s).")
+        self._ocr_warm_up_thread.deleteLater()
+
+    def handle_ocr_error(self, e: Exception) -> None:
+        """Handle on OCR warm up error
+
+        :param e: The error
+        """
+        self.log(f"Failed to start OCR engine: {e}")
+        self._ocr_warm_up_thread.deleteLater()
+
     def setup_ui(self, MainWindow: QtWidgets.QMainWindow) -> None:
         """Sets up the UI for the application
 
@@ -114,8 +158,21 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.checkBoxSroFormat.setChecked(
             self.settings.value("sro_format", False) == "true"
         )
+        self.checkBoxCompactOutput.setChecked(
+            self.settings.value("compact_output", False) == "true"
+        )
+        self.checkBoxPerformanceReport.setChecked(
+            self.settings.value("performance_report", False) == "true"
+        )
+        self.checkBoxProfile.setChecked(self.settings.value("profile", False) == "true")
+        self.checkBoxSaveCaptures.setChecked(
+            self.settings.value("save_captures", False) == "true"
+        )
         self.spinBoxNavDelay.setValue(self.settings.value("nav_delay", 0))
         self.spinBoxScanDelay.setValue(self.settings.value("scan_delay", 0))
+        self.spinBoxMemoryBudget.setValue(
+            self.settings.value("memory_budget", DEFAULT_MEMORY_BUDGET)
+        )
 
     def save_settings(self) -> None:
         """Saves the settings for the scan"""
@@ -136,8 +193,15 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.settings.setValue("scan_relics", self.checkBoxScanRelics.isChecked())
         self.settings.setValue("scan_characters", self.checkBoxScanChars.isChecked())
         self.settings.setValue("sro_format", self.checkBoxSroFormat.isChecked())
+        self.settings.setValue("compact_output", self.checkBoxCompactOutput.isChecked())
+        self.settings.setValue(
+            "performance_report", self.checkBoxPerformanceReport.isChecked()
+        )
+        self.settings.setValue("profile", self.checkBoxProfile.isChecked())
+        self.settings.setValue("save_captures", self.checkBoxSaveCaptures.isChecked())
         self.settings.setValue("nav_delay", self.spinBoxNavDelay.value())
         self.settings.setValue("scan_delay", self.spinBoxScanDelay.value())
+        self.settings.setValue("memory_budget", self.spinBoxMemoryBudget.value())
 
     def reset_settings(self) -> None:
         """Resets the settings for the scan"""
@@ -152,8 +216,13 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.settings.setValue("scan_relics", False)
         self.settings.setValue("scan_characters", False)
         self.settings.setValue("sro_format", False)
+        self.settings.setValue("compact_output", False)
+        self.settings.setValue("performance_report", False)
+        self.settings.setValue("profile", False)
+        self.settings.setValue("save_captures", False)
         self.settings.setValue("nav_delay", 0)
         self.settings.setValue("scan_delay", 0)
+        self.settings.setValue("memory_budget", DEFAULT_MEMORY_BUDGET)
         self.load_settings()
 
     def start_scan(self) -> None:
@@ -176,9 +245,8 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         # initialize scanner
         try:
             scanner = HSRScanner(self.get_config(), self.game_data)
-            scanner.log_signal.connect(self.log)
-            scanner.update_signal.connect(self.increment_progress)
             scanner.complete_signal.connect(self._listener.stop)
+            self._scanner = scanner
         except Exception as e:
             self.log(e)
             self.enable_start_scan_button()
@@ -193,6 +261,7 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         self._scanner_thread.result_signal.connect(self.enable_start_scan_button)
 
         self._scanner_thread.error_signal.connect(self.log)
+        self._scanner_thread.error_signal.connect(self.handle_error)
         self._scanner_thread.error_signal.connect(self._scanner_thread.deleteLater)
         self._scanner_thread.error_signal.connect(self.enable_start_scan_button)
         self._scanner_thread.error_signal.connect(self._listener.stop)
@@ -201,6 +270,7 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         # start thread
         self._scanner_thread.started.connect(self._listener.start)
+        self._update_timer.start()
         self._scanner_thread.start()
 
     def get_config(self) -> dict:
@@ -246,6 +316,21 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
         config["nav_delay"] = self.spinBoxNavDelay.value() / 1000
         config["scan_delay"] = self.spinBoxScanDelay.value() / 1000
 
+        # memory budget of the captured items waiting for OCR, in bytes
+        config["memory_budget"] = self.spinBoxMemoryBudget.value() * 1024 * 1024
+
+        # checkpoints
+        config["output_location"] = self.lineEditOutputLocation.text()
+        config["resume"] = self.checkBoxResume.isChecked()
+
+        # developer
+        config["performance_report"] = self.checkBoxPerformanceReport.isChecked()
+        profile_env = os.environ.get("HSR_SCANNER_PROFILE", "").strip().lower()
+        config["profile"] = (
+            self.checkBoxProfile.isChecked() or profile_env in PROFILE_ENV_VALUES
+        )
+        config["save_captures"] = self.checkBoxSaveCaptures.isChecked()
+
         return config
 
     def handle_result(self, data: dict) -> None:
@@ -253,51 +338,86 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
         :param data: The data from the scan
         """
+        if not self.export(data, datetime.datetime.now().strftime("%Y%m%d_%H%M%S")):
+            return
+
+        self._scanner.discard_journal()
+        self.log("Scan complete. Data saved to " + self.lineEditOutputLocation.text())
+
+    def handle_error(self, message: str) -> None:
+        """Handles a scan that was interrupted or failed
+
+        :param message: The error message
+        """
+        if self._scanner is not None and self._scanner.journal is not None:
+            self.export_journal(self._scanner.journal)
+
+    def export_journal(self, journal: ScanJournal) -> None:
+        """Exports the results of a scan that did not finish from its checkpoint journal
+
+        The journal is kept so the scan can still be resumed, but is marked so the same
+        results are not exported again.
+
+        :param journal: The checkpoint journal
+        """
+        if journal.is_exported or not journal.has_results():
+            return
+
+        self.log("Saving the items parsed before the scan stopped...")
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        if not self.export(journal.get_export(), "partial_" + timestamp):
+            return
+
+        journal.mark_exported()
+        self.log("Partial data saved to " + self.lineEditOutputLocation.text())
+
+    def export(self, data: dict, timestamp: str) -> bool:
+        """Exports scan results in every selected format
+
+        :param data: The scan results
+        :param timestamp: The timestamp to name the files with
+        :return: True if the native export was saved, False otherwise
+        """
         output_location = self.lineEditOutputLocation.text()
-        file_name = (
-            f"HSRScanData_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        )
-        save_to_json(data, output_location, file_name)
+        indent = None if self.checkBoxCompactOutput.isChecked() else 4
 
+        formats = [ExportFormat()]
         if self.checkBoxSroFormat.isChecked():
             self.log("Creating accompanying export in SRO format...")
             try:
-                file_name = f"HSRScanData_SRO_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-                save_to_json(
-                    convert_to_sro(data, self.game_data), output_location, file_name
-                )
+                formats.append(SroExportFormat(self.game_data))
             except Exception as e:
                 self.log("Failed to convert to SRO format: " + str(e))
-        self.log("Scan complete. Data saved to " + output_location)
 
-    def increment_progress(self, enum: IncrementType) -> None:
+        _, errors = Exporter(output_location, formats, indent).export(data, timestamp)
+        for name, e in errors.items():
+            self.log(f"Failed to export in {name} format: {e}")
+
+        return ExportFormat.NAME not in errors
+
+    def update_progress(self) -> None:
+        """Adds the progress counted by the scanner since the last update to the UI"""
+        if self._scanner is None:
+            return
+
+        for enum, count in self._scanner.progress.drain().items():
+            self.increment_progress(enum, count)
+
+    def increment_progress(self, enum: IncrementType, count: int = 1) -> None:
         """Increments the number on the UI based on the enum
 
         :param enum: The enum to increment the progress for
+        :param count: The amount to increment by, defaults to 1
         """
-        match IncrementType(enum):
-            case IncrementType.LIGHT_CONE_ADD:
-                self.labelLightConeCount.setText(
-                    str(int(self.labelLightConeCount.text()) + 1)
-                )
-            case IncrementType.RELIC_ADD:
-                self.labelRelicCount.setText(str(int(self.labelRelicCount.text()) + 1))
-            case IncrementType.CHARACTER_ADD:
-                self.labelCharacterCount.setText(
-                    str(int(self.labelCharacterCount.text()) + 1)
-                )
-            case IncrementType.LIGHT_CONE_SUCCESS:
-                self.labelLightConeProcessed.setText(
-                    str(int(self.labelLightConeProcessed.text()) + 1)
-                )
-            case IncrementType.RELIC_SUCCESS:
-                self.labelRelicProcessed.setText(
-                    str(int(self.labelRelicProcessed.text()) + 1)
-                )
-            case IncrementType.CHARACTER_SUCCESS:
-                self.labelCharacterProcessed.setText(
-                    str(int(self.labelCharacterProcessed.text()) + 1)
-                )
+        label = {
+            IncrementType.LIGHT_CONE_ADD: self.labelLightConeCount,
+            IncrementType.RELIC_ADD: self.labelRelicCount,
+            IncrementType.CHARACTER_ADD: self.labelCharacterCount,
+            IncrementType.LIGHT_CONE_SUCCESS: self.labelLightConeProcessed,
+            IncrementType.RELIC_SUCCESS: self.labelRelicProcessed,
+            IncrementType.CHARACTER_SUCCESS: self.labelCharacterProcessed,
+        }[IncrementType(enum)]
+        label.setText(str(int(label.text()) + count))
 
     def disable_start_scan_button(self) -> None:
         """Disables the start scan button and sets the text to Processing"""
@@ -307,15 +427,38 @@ class HSRScannerUI(QtWidgets.QMainWindow, Ui_MainWindow):
 
     def enable_start_scan_button(self) -> None:
         """Enables the start scan button and sets the text to Start Scan"""
+        self._update_timer.stop()
+        self.update_progress()
+        self.flush_scan_log()
         self.is_scanning = False
         self.pushButtonStartScan.setText("Start Scan")
         self.pushButtonStartScan.setEnabled(True)
 
+    def flush_scan_log(self) -> None:
+        """Adds the events logged by the scanner since the last flush to the log box"""
+        if self._scanner is None:
+            return
+
+        events = self._scanner.scan_log.drain()
+        if not events:
+            return
+
+        self.textEditLog.appendPlainText(
+            "\n".join(
+                f"[{datetime.datetime.fromtimestamp(event['time']).strftime('%H:%M:%S')}] > "
+                + ("WARNING: " if event["level"] == LogLevel.WARNING.value else "")
+                + event["message"]
+                for event in events
+            )
+        )
+
     def log(self, message: str) -> None:
         """Logs a message to the log box
 
         :param message: The message to log
         """
+        # keep the order of messages logged before this one by the scanner
+        self.flush_scan_log()
         self.textEditLog.appendPlainText(
             f"[{datetime.datetime.now().strftime('%H:%M:%S')}] > {str(message)}"
         )
@@ -340,6 +483,26 @@ class FetchGameDataThread(QtCore.QThread):
             self.error_signal.emit(e)
 
 
+class OcrWarmUpThread(QtCore.QThread):
+    """OcrWarmUpThread class handles warming up OCR in a separate thread"""
+
+    result_signal = QtCore.pyqtSignal(float)
+    error_signal = QtCore.pyqtSignal(object)
+
+    def __init__(self) -> None:
+        """Constructor"""
+        super().__init__()
+
+    def run(self) -> None:
+        """Runs the OCR warm up"""
+        try:
+            start = time.time()
+            warm_up()
+            self.result_signal.emit(time.time() - start)
+        except Exception as e:
+            self.error_signal.emit(e)
+
+
 class InterruptListener(QtCore.QThread):
     """InterruptListener class listens for the enter key to interrupt the scan"""
 
@@ -0,0 +1,118 @@
+import numpy as np
+from PIL import Image
+from utils.crop_store import CropStore
+
+
+class CapturedItem:
+    """CapturedItem class for holding the crops of an item between capture and parse
+
+    Every crop is packed into one contiguous uint8 buffer, so an item costs a single
+    allocation however many regions it has. Crops are only wrapped in PIL images when
+    they are read, and values parsed from a crop replace it, so the item can be used
+    like the stats dict it replaces. The confidence of each parsed value is kept
+    alongside it, so low-confidence items can be captured again. The buffer can be
+    spilled to a CropStore, after which the crops are read from the memory-mapped file.
+    """
+
+    __slots__ = ("_buffer", "_layout", "_values", "confidence", "is_spilled")
+
+    def __init__(self, rois: dict[str, np.ndarray]) -> None:
+        """Constructor
+
+        :param rois: The crops of the item with the key being the stat name
+        """
+        layout = {}
+        arrays = []
+        offset = 0
+        for key, roi in rois.items():
+            layout[key] = (offset, roi.shape)
+            offset += roi.size
+            arrays.append(roi.reshape(-1))
+
+        self._buffer = (
+            np.concatenate(arrays).astype(np.uint8, copy=False)
+            if arrays
+            else np.empty(0, dtype=np.uint8)
+        )
+        self._layout = layout
+        self._values = {}
+        self.confidence = {}
+        self.is_spilled = False
+
+    @classmethod
+    def from_buffer(cls, buffer: np.ndarray, layout: dict) -> "CapturedItem":
+        """Create an item from an existing crop buffer without copying it
+
+        :param buffer: The contiguous uint8 crop buffer
+        :param layout: The (offset, shape) of each crop in the buffer by key
+        :return: The item
+        """
+        item = cls({})
+        item._buffer = buffer
+        item._layout = layout
+
+        return item
+
+    @property
+    def nbytes(self) -> int:
+        """The size of the crop buffer in bytes"""
+        return self._buffer.nbytes
+
+    def spill(self, store: CropStore, **meta) -> None:
+        """Move the crop buffer into a crop store
+
+        :param store: The crop store
+        :param meta: Metadata to record in the index of the store
+        """
+        if self.is_spilled:
+            return
+
+        self._buffer = store.append(self._buffer, self._layout, **meta)
+        self.is_spilled = True
+
+    def get_array(self, key: str) -> np.ndarray:
+        """Get a crop as a numpy array without copying it
+
+        :param key: The stat name
+        :raises KeyError: Thrown if the item has no crop for the key
+        :return: The crop
+        """
+        offset, shape = self._layout[key]
+        size = int(np.prod(shape))
+
+        return self._buffer[offset : offset + size].reshape(shape)
+
+    def get(self, key: str, default=None):
+        """Get a value or crop, with a default if the key is missing
+
+        :param key: The stat name
+        :param default: The value to return if the key is missing, defaults to None
+        :return: The parsed value, the crop as a PIL image, or the default
+        """
+        return self[key] if key in self else default
+
+    def keys(self) -> list[str]:
+        """Get the keys of the item
+
+        :return: The stat names of the crops followed by any other parsed values
+        """
+        return list(self._layout) + [k for k in self._values if k not in self._layout]
+
+    def __getitem__(self, key: str):
+        if key in self._values:
+            return self._values[key]
+
+        return Image.fromarray(self.get_array(key))
+
+    def __setitem__(self, key: str, value) -> None:
+        self._values[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values or key in self._layout
+
+    def __iter__(self):
+        # keys are listed up front so parsed values can be set while iterating
+        return iter(self.keys())
+
+    def __len__(self) -> int:
+        return len(self.keys())
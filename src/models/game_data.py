@@ -5,6 +5,7 @@ import numpy as np
 import cv2
 import requests
 from PIL import Image
+from utils.instrumentation import timed
 
 GAME_DATA_URL = "https://raw.githubusercontent.com/kel-z/HSR-Data/main/output/min/game_data_with_icons.json"
 SRO_MAPPINGS_URL = (
@@ -129,6 +130,7 @@ class GameData:
         """
         return self.CHARACTER_META_DATA[name]
 
+    @timed("game_data.get_equipped_character")
     def get_equipped_character(self, equipped_avatar_img: Image) -> str:
         """Get equipped character from equipped avatar image
 
@@ -224,6 +226,19 @@ class GameData:
 
         return int(np.argmin(distances)) + 1
 
+    def get_closest_rarities(self, pixels: np.ndarray) -> np.ndarray:
+        """Get closest rarities from an array of pixels
+
+        :param pixels: The (n, 3) array of pixels to get the rarities from
+        :return: The closest rarity of each pixel
+        """
+        distances = np.linalg.norm(
+            self.COLOURS[np.newaxis, :, :] - pixels[:, np.newaxis, :3], axis=2
+        )
+
+        return np.argmin(distances, axis=1) + 1
+
+    @timed("game_data.get_closest_match")
     def _get_closest_match(self, name, targets: set | dict) -> str:
         """Get closest match from name
 
@@ -0,0 +1,112 @@
+import re
+import cv2
+import numpy as np
+from PIL import Image
+from models.game_data import GameData
+from utils.ocr import image_to_words, preprocess_img
+
+# the furthest a rarity sample can be from its rarity colour, and the most it can vary
+MAX_COLOUR_DISTANCE = 40
+MAX_SAMPLE_DEVIATION = 16
+
+
+class GridAnalyser:
+    """GridAnalyser class for classifying every item on an inventory page from one screenshot"""
+
+    def __init__(self, nav_data: dict, game_data: GameData, scale: float = 1) -> None:
+        """Constructor
+
+        :param nav_data: The nav data of the inventory tab
+        :param game_data: The GameData class instance
+        :param scale: The UI scale of the game window relative to 1080p, defaults to 1
+        """
+        self._rarity_sample = nav_data["rarity_sample"]
+        self._level_sample = nav_data["level_sample"]
+        self._game_data = game_data
+        self._scale = scale
+
+    def get_rarities(
+        self, img: Image.Image | np.ndarray, cells: list[tuple[float, float]]
+    ) -> list[int | None]:
+        """Get the rarity of every item from the colour of its background
+
+        :param img: The screenshot of the game window
+        :param cells: The (x, y) click positions of the items in % of the window
+        :return: The rarity of each item, or None if its sample is not a rarity background
+        """
+        img = np.asarray(img)
+        height, width = img.shape[:2]
+
+        # 5x5 patch around the sample point of every cell, gathered in one indexing op
+        points = np.array(cells) + self._rarity_sample
+        xs = (points[:, 0] * width).astype(int)
+        ys = (points[:, 1] * height).astype(int)
+        offsets = np.arange(-2, 3)
+        patch_ys = np.clip(ys[:, None, None] + offsets[None, :, None], 0, height - 1)
+        patch_xs = np.clip(xs[:, None, None] + offsets[None, None, :], 0, width - 1)
+        patches = img[patch_ys, patch_xs, :3].reshape(len(cells), -1, 3).astype(float)
+
+        # a sample on the background is flat and close to one of the rarity colours
+        colours = patches.mean(axis=1)
+        rarities = self._game_data.get_closest_rarities(colours)
+        distances = np.linalg.norm(
+            colours - self._game_data.COLOURS[rarities - 1], axis=1
+        )
+        is_background = (distances <= MAX_COLOUR_DISTANCE) & (
+            patches.std(axis=1).max(axis=1) <= MAX_SAMPLE_DEVIATION
+        )
+
+        return [
+            int(rarity) if ok else None for rarity, ok in zip(rarities, is_background)
+        ]
+
+    def get_levels(
+        self, img: Image.Image | np.ndarray, cells: list[tuple[float, float]]
+    ) -> list[int | None]:
+        """Get the level of every item by OCRing all level badges in one batch
+
+        :param img: The screenshot of the game window
+        :param cells: The (x, y) click positions of the items in % of the window
+        :return: The level of each item, or None for the items whose badge could not be read
+        """
+        img = np.asarray(img)
+        height, width = img.shape[:2]
+        dx, dy, w, h = self._level_sample
+        w, h = int(w * width), int(h * height)
+
+        # Stack the badges vertically with a gap so each one is OCR'd as its own line
+        gap = np.zeros((h // 2, w, 3), dtype=np.uint8)
+        pitch = h + gap.shape[0]
+        badges = []
+        for x, y in cells:
+            left = min(max(int((x + dx) * width), 0), width - w)
+            upper = min(max(int((y + dy) * height), 0), height - h)
+            badges += [img[upper : upper + h, left : left + w, :3], gap]
+        batch = np.vstack(badges)
+        scale = 1
+        if self._scale != 1:
+            # the screenshot is at the native resolution, but OCR is tuned for 1080p
+            scale = 1 / self._scale
+            batch = cv2.resize(
+                batch,
+                (int(batch.shape[1] * scale), int(batch.shape[0] * scale)),
+                interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC,
+            )
+        batch = Image.fromarray(batch)
+
+        # assign every word to the badge it is drawn over, so a missed badge only
+        # loses its own level
+        texts = [""] * len(cells)
+        for text, _, top, word_height in image_to_words(
+            batch, "0123456789+Lv.", 6, preprocess_img
+        ):
+            i = int((top + word_height / 2) / scale // pitch)
+            if 0 <= i < len(cells):
+                texts[i] += text
+
+        levels = []
+        for text in texts:
+            digits = re.sub(r"\D", "", text)
+            levels.append(int(digits) if digits else None)
+
+        return levels
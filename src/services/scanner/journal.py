@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+from enums.increment_type import IncrementType
+
+JOURNAL_FILE_NAME = "HSRScanData_journal.jsonl"
+
+
+class ScanJournal:
+    """ScanJournal class for checkpointing scan progress to a local journal file
+
+    The journal is a JSON Lines file with the following record types:
+    - header: the filters the scan was started with
+    - checkpoint: a fully captured inventory page and the item IDs queued on it
+    - result: a parsed item, or a null item that failed to parse, which still counts as done
+    - reset: the checkpoints and results of a scan type are no longer valid
+    - exported: the results so far were saved, so a crash does not need them exported again
+    """
+
+    def __init__(
+        self, output_location: str, filters: dict | None, resume: bool
+    ) -> None:
+        """Constructor
+
+        :param output_location: The directory to keep the journal in
+        :param filters: The filters of the current scan, or None to load the journal whatever its filters
+        :param resume: Whether to load the existing journal instead of starting a new one
+        """
+        self._path = os.path.join(output_location, JOURNAL_FILE_NAME)
+        self._lock = threading.Lock()
+        self._checkpoints = {}
+        self._results = {}
+        self.is_resumed = False
+        self.is_exported = False
+
+        if not os.path.exists(output_location):
+            os.makedirs(output_location)
+
+        if resume and self._load(filters):
+            self.is_resumed = True
+        else:
+            self._checkpoints = {}
+            self._results = {}
+            with open(self._path, "w") as journal_file:
+                journal_file.write(
+                    json.dumps({"type": "header", "filters": filters}) + "\n"
+                )
+
+    @classmethod
+    def open_existing(cls, output_location: str) -> "ScanJournal | None":
+        """Open the journal left behind by an earlier scan
+
+        :param output_location: The directory the journal is kept in
+        :return: The journal, or None if there is none
+        """
+        if not os.path.exists(os.path.join(output_location, JOURNAL_FILE_NAME)):
+            return None
+
+        return cls(output_location, None, True)
+
+    @property
+    def path(self) -> str:
+        """The path of the journal file"""
+        return self._path
+
+    def get_export(self) -> dict:
+        """Build the scan results from the journaled results
+
+        :return: The scan results in the export format
+        """
+        return {
+            "source": "HSR-Scanner",
+            "version": 3,
+            "light_cones": self.get_results(IncrementType.LIGHT_CONE_ADD),
+            "relics": self.get_results(IncrementType.RELIC_ADD),
+            "characters": self.get_results(IncrementType.CHARACTER_ADD),
+        }
+
+    def has_results(self) -> bool:
+        """Check if any item was parsed
+
+        :return: True if there is a result to export, False otherwise
+        """
+        with self._lock:
+            return any(
+                result is not None
+                for results in self._results.values()
+                for result in results.values()
+            )
+
+    def get_checkpoint(self, scan_type: IncrementType) -> dict | None:
+        """Get the last checkpoint of a scan type
+
+        :param scan_type: The scan type
+        :return: The last checkpoint, or None if there is none
+        """
+        return self._checkpoints.get(scan_type.name)
+
+    def get_resume_page(self, scan_type: IncrementType) -> int:
+        """Get the first inventory page that is not fully parsed
+
+        :param scan_type: The scan type
+        :return: The page index to resume from
+        """
+        checkpoint = self.get_checkpoint(scan_type)
+        if not checkpoint:
+            return 0
+
+        results = self._results.get(scan_type.name, {})
+        for page, item_ids in enumerate(checkpoint["pages"]):
+            if any(item_id not in results for item_id in item_ids):
+                return page
+
+        return len(checkpoint["pages"])
+
+    def is_complete(self, scan_type: IncrementType) -> bool:
+        """Check if a scan type was finished and all of its items were parsed
+
+        :param scan_type: The scan type
+        :return: True if the scan type does not need to be scanned again, False otherwise
+        """
+        checkpoint = self.get_checkpoint(scan_type)
+        if not checkpoint or not checkpoint["complete"]:
+            return False
+
+        return self.get_resume_page(scan_type) == len(checkpoint["pages"])
+
+    def has_result(self, scan_type: IncrementType, item_id: int) -> bool:
+        """Check if an item was already parsed
+
+        :param scan_type: The scan type
+        :param item_id: The item ID
+        :return: True if the item has a journaled result or failed to parse, False otherwise
+        """
+        with self._lock:
+            return item_id in self._results.get(scan_type.name, {})
+
+    def get_results(self, scan_type: IncrementType) -> list[dict]:
+        """Get the journaled results of a scan type in item ID order
+
+        :param scan_type: The scan type
+        :return: The results, without the items that failed to parse
+        """
+        with self._lock:
+            results = self._results.get(scan_type.name, {})
+            return [
+                results[item_id]
+                for item_id in sorted(results)
+                if results[item_id] is not None
+            ]
+
+    def checkpoint(
+        self,
+        scan_type: IncrementType,
+        quantity: int,
+        page: int,
+        item_ids: list[int],
+        complete: bool = False,
+    ) -> None:
+        """Record that an inventory page has been captured
+
+        :param scan_type: The scan type
+        :param quantity: The inventory quantity the scan was started with
+        :param page: The page index
+        :param item_ids: The item IDs on the page that passed the filters
+        :param complete: Whether the scan of this type has finished, defaults to False
+        """
+        record = {
+            "type": "checkpoint",
+            "scan": scan_type.name,
+            "quantity": quantity,
+            "page": page,
+            "items": item_ids,
+            "complete": complete,
+        }
+        with self._lock:
+            self._apply_checkpoint(record)
+            self._write(record)
+
+    def reset(self, scan_type: IncrementType) -> None:
+        """Discard the checkpoints and results of a scan type
+
+        :param scan_type: The scan type
+        """
+        with self._lock:
+            self._checkpoints.pop(scan_type.name, None)
+            self._results.pop(scan_type.name, None)
+            self._write({"type": "reset", "scan": scan_type.name})
+
+    def add_result(
+        self, scan_type: IncrementType, item_id: int, result: dict | None
+    ) -> None:
+        """Record a parsed item
+
+        :param scan_type: The scan type
+        :param item_id: The item ID
+        :param result: The parsed item, or None to mark an item that failed to parse as done
+        """
+        with self._lock:
+            self._results.setdefault(scan_type.name, {})[item_id] = result
+            self._write(
+                {
+                    "type": "result",
+                    "scan": scan_type.name,
+                    "id": item_id,
+                    "data": result,
+                }
+            )
+
+    def mark_exported(self) -> None:
+        """Record that the results so far were saved"""
+        with self._lock:
+            self._write({"type": "exported"})
+
+    def discard(self) -> None:
+        """Delete the journal file"""
+        with self._lock:
+            if os.path.exists(self._path):
+                os.remove(self._path)
+
+    def _write(self, record: dict) -> None:
+        """Append a record to the journal file
+
+        :param record: The record to append
+        """
+        self.is_exported = record["type"] == "exported"
+        with open(self._path, "a") as journal_file:
+            journal_file.write(json.dumps(record) + "\n")
+
+    def _apply_checkpoint(self, record: dict) -> None:
+        """Apply a checkpoint record to the in-memory checkpoints
+
+        :param record: The checkpoint record
+        """
+        checkpoint = self._checkpoints.setdefault(
+            record["scan"],
+            {"quantity": record["quantity"], "pages": [], "complete": False},
+        )
+        checkpoint["complete"] = record["complete"]
+        if not record["complete"]:
+            # a resumed scan overwrites the pages from where it picked up
+            del checkpoint["pages"][record["page"] :]
+            checkpoint["pages"].append(record["items"])
+
+    def _load(self, filters: dict) -> bool:
+        """Load the journal file
+
+        :param filters: The filters of the current scan
+        :return: True if the journal was loaded, False if it is missing or was started with different filters
+        """
+        if not os.path.exists(self._path):
+            return False
+
+        with open(self._path) as journal_file:
+            for line in journal_file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # last line may be cut off if the app was killed mid-write
+                    continue
+
+                self.is_exported = record["type"] == "exported"
+                match record["type"]:
+                    case "header":
+                        if filters is not None and record["filters"] != filters:
+                            return False
+                    case "checkpoint":
+                        self._apply_checkpoint(record)
+                    case "reset":
+                        self._checkpoints.pop(record["scan"], None)
+                        self._results.pop(record["scan"], None)
+                    case "result":
+                        self._results.setdefault(record["scan"], {})[record["id"]] = (
+                            record["data"]
+                        )
+
+        return True
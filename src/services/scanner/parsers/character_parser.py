@@ -2,11 +2,12 @@ import cv2
 import numpy as np
 from pyautogui import locate
 from utils.data import resource_path
-from utils.ocr import image_to_string
 from PIL import Image
-from utils.ocr import preprocess_trace_img, image_to_string
+from utils.ocr import preprocess_trace_img
+from utils.recognition import GlyphRecognizer
 from models.game_data import GameData
-from PyQt6.QtCore import pyqtBoundSignal
+from services.scanner.progress import ProgressAggregator
+from services.scanner.scan_log import ScanLog
 from asyncio import Event
 from enums.increment_type import IncrementType
 
@@ -17,26 +18,27 @@ class CharacterParser:
     def __init__(
         self,
         game_data: GameData,
-        log_signal: pyqtBoundSignal,
-        update_signal: pyqtBoundSignal,
+        scan_log: ScanLog,
+        progress: ProgressAggregator,
         interrupt_event: Event,
     ) -> None:
         """Constructor
 
         :param game_data: The GameData class instance
-        :param log_signal: The log signal
-        :param update_signal: The update signal
+        :param scan_log: The scan log
+        :param progress: The progress aggregator
         :param interrupt_event: The interrupt event
         """
         self._game_data = game_data
-        self._log_signal = log_signal
-        self._update_signal = update_signal
+        self._scan_log = scan_log
+        self._progress = progress
         self._interrupt_event = interrupt_event
         self._trailblazer_imgs = {
             "M": Image.open(resource_path("assets/images/trailblazerm.png")),
             "F": Image.open(resource_path("assets/images/trailblazerf.png")),
         }
         self._is_trailblazer_scanned = False
+        self._glyph_recognizer = GlyphRecognizer()
 
     def parse(self, stats_dict: dict) -> dict:
         """Parse the stats dictionary and return a character dictionary
@@ -61,19 +63,23 @@ class CharacterParser:
             },
             "traces": {},
         }
+        confidence = {}
 
         level = stats_dict["level"]
-        res = image_to_string(level, "0123456789", 7, True)
-        if not res:
-            res = image_to_string(level, "0123456789", 6, True)
-        level = res
+        level, confidence["level"] = self._glyph_recognizer.image_to_data(
+            "level", level, "0123456789", [7, 6], validate=str.isdigit
+        )
 
         try:
             character["level"] = int(level)
         except ValueError:
-            self._log_signal.emit(
+            confidence["level"] = 0
+            self._scan_log.warning(
                 f"{character['key']}: Failed to parse level."
-                + (f' Got "{level}" instead.' if level else "")
+                + (f' Got "{level}" instead.' if level else ""),
+                item_id=character["key"],
+                field="level",
+                code="parse_failed",
             )
 
         for eidolon in (5, 3):
@@ -88,25 +94,35 @@ class CharacterParser:
         traces_dict = stats_dict["traces"]
         for k, v in traces_dict["levels"].items():
             try:
-                res = image_to_string(v, "0123456789/", 6, True, preprocess_trace_img)
-                if not res or not res.find("/"):
-                    res = image_to_string(
-                        v, "0123456789/", 7, True, preprocess_trace_img
-                    )
+                res, confidence[k] = self._glyph_recognizer.image_to_data(
+                    "trace",
+                    v,
+                    "0123456789/",
+                    [6, 7],
+                    preprocess_trace_img,
+                    lambda r: r.split("/")[0].isdigit(),
+                )
                 character["skills"][k] += int(res.split("/")[0])
                 if not 1 <= character["skills"][k] <= (6 if k == "basic" else 10):
                     raise ValueError
             except ValueError:
-                self._log_signal.emit(
+                self._scan_log.warning(
                     f"{character['key']}: Failed to parse '{k}' level. "
                     + (f"Got '{res}' instead. " if res else "")
-                    + "Setting to 1."
+                    + "Setting to 1.",
+                    item_id=character["key"],
+                    field=k,
+                    code="parse_failed",
                 )
                 character["skills"][k] = 1
+                confidence[k] = 0
 
         character["traces"] = traces_dict["unlocks"]
+        character["_confidence"] = {
+            key: round(conf) for key, conf in confidence.items()
+        }
 
-        self._update_signal.emit(IncrementType.CHARACTER_SUCCESS.value)
+        self._progress.add(IncrementType.CHARACTER_SUCCESS)
 
         return character
 
@@ -125,9 +141,10 @@ class CharacterParser:
 
         if self._is_trailblazer(character_img):
             if self._is_trailblazer_scanned:
-                self._log_signal.emit(
-                    "WARNING: Parsed more than one Trailblazer. Please review JSON output."
-                ) if self._log_signal else None
+                self._scan_log.warning(
+                    "Parsed more than one Trailblazer. Please review JSON output.",
+                    code="duplicate_trailblazer",
+                ) if self._scan_log else None
             else:
                 self._is_trailblazer_scanned = True
 
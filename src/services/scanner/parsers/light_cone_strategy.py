@@ -3,15 +3,20 @@ from pyautogui import locate
 from PIL import Image
 from utils.data import resource_path
 from utils.ocr import (
+    OcrPolicy,
     image_to_string,
+    preprocess_img,
     preprocess_equipped_img,
     preprocess_superimposition_img,
     preprocess_lc_level_img,
 )
 from config.light_cone_scan import LIGHT_CONE_NAV_DATA
 from enums.increment_type import IncrementType
-from PyQt6.QtCore import pyqtBoundSignal
+from services.scanner.planner import InventoryPlanner
+from services.scanner.progress import ProgressAggregator
+from services.scanner.scan_log import ScanLog
 from asyncio import Event
+from utils.recognition import GlyphRecognizer, NameImageCache
 
 
 class LightConeStrategy:
@@ -23,34 +28,52 @@ class LightConeStrategy:
     def __init__(
         self,
         game_data: GameData,
-        log_signal: pyqtBoundSignal,
-        update_signal: pyqtBoundSignal,
+        scan_log: ScanLog,
+        progress: ProgressAggregator,
         interrupt_event: Event,
     ) -> None:
         """Constructor
 
         :param game_data: The GameData class instance
-        :param log_signal: The log signal
-        :param update_signal: The update signal
+        :param scan_log: The scan log
+        :param progress: The progress aggregator
         :param interrupt_event: The interrupt event
         """
         self._game_data = game_data
-        self._log_signal = log_signal
-        self._update_signal = update_signal
+        self._scan_log = scan_log
+        self._progress = progress
         self._interrupt_event = interrupt_event
         self._lock_icon = Image.open(resource_path("assets/images/lock.png"))
+        self._ocr_policy = OcrPolicy()
+        self._glyph_recognizer = GlyphRecognizer()
+        self._name_cache = NameImageCache()
 
     def get_optimal_sort_method(self, filters: dict) -> str:
         """Gets the optimal sort method based on the filters
 
+        Rarity sort is secondarily sorted by level, so a minimum level filter only
+        needs level sort when there is no minimum rarity filter.
+
         :param filters: The filters
         :return: The optimal sort method
         """
-        if filters["light_cone"]["min_level"] > 1:
+        filters = filters["light_cone"]
+        if filters["min_level"] > 1 and filters["min_rarity"] <= 3:
             return "Lv"
         else:
             return "Rarity"
 
+    def get_inventory_planner(
+        self, filters: dict, sort_method: str
+    ) -> InventoryPlanner:
+        """Gets the planner for skipping items that will fail the filters
+
+        :param filters: The filters
+        :param sort_method: The current sort method
+        :return: The inventory planner
+        """
+        return InventoryPlanner(sort_method, filters["light_cone"], 3, 1)
+
     def check_filters(
         self, stats_dict: dict, filters: dict, lc_id: int
     ) -> tuple[dict, dict]:
@@ -77,9 +100,10 @@ class LightConeStrategy:
                     if filters[key] <= 3:
                         filter_results[key] = True
                         continue
-                    stats_dict["name"] = self.extract_stats_data(
-                        "name", stats_dict["name"]
-                    )
+                    (
+                        stats_dict["name"],
+                        stats_dict.confidence["name"],
+                    ) = self.extract_stats_data("name", stats_dict["name"])
                     stats_dict["name"], _ = self._game_data.get_closest_light_cone_name(
                         stats_dict["name"]
                     )
@@ -92,14 +116,19 @@ class LightConeStrategy:
                     if filters[key] <= 1:
                         filter_results[key] = True
                         continue
-                    stats_dict["level"] = self.extract_stats_data(
-                        "level", stats_dict["level"]
-                    )
+                    (
+                        stats_dict["level"],
+                        stats_dict.confidence["level"],
+                    ) = self.extract_stats_data("level", stats_dict["level"])
                     if not stats_dict["level"]:
-                        self._log_signal.emit(
-                            f"Light Cone ID {lc_id}: Failed to parse level. Setting to 1."
+                        self._scan_log.warning(
+                            f"Light Cone ID {lc_id}: Failed to parse level. Setting to 1.",
+                            item_id=lc_id,
+                            field="level",
+                            code="parse_failed",
                         )
                         stats_dict["level"] = "1/20"
+                        stats_dict.confidence["level"] = 0
                         filter_results[key] = True
                         continue
                     val = int(stats_dict["level"].split("/")[0])
@@ -116,43 +145,78 @@ class LightConeStrategy:
 
         return (filter_results, stats_dict)
 
-    def extract_stats_data(self, key: str, img: Image):
+    def get_rarity_and_level(self, stats_dict: dict) -> tuple[int | None, int | None]:
+        """Gets the rarity and level of the light cone after checking the filters
+
+        :param stats_dict: The stats dictionary
+        :return: The rarity and level, or None if they were not parsed yet
+        """
+        rarity = stats_dict.get("rarity")
+        level = stats_dict["level"]
+        try:
+            level = int(level.split("/")[0]) if isinstance(level, str) else None
+        except ValueError:
+            level = None
+
+        return rarity, level
+
+    def extract_stats_data(self, key: str, img: Image) -> tuple:
         """Extracts the stats data from the image
 
         :param key: The key
         :param img: The image
-        :return: The extracted data, or the image if the key is not recognized
+        :return: The extracted data and its confidence (0-100), or the image and None if the key is not recognized
         """
         match key:
             case "name":
-                name, _ = self._game_data.get_closest_light_cone_name(
-                    image_to_string(
-                        img,
-                        "ABCDEFGHIJKLMNOPQRSTUVWXYZ 'abcedfghijklmnopqrstuvwxyz-",
-                        6,
-                    )
+                name = self._name_cache.get(img)
+                if name is not None:
+                    return name, 100
+                res, conf = self._ocr_policy.image_to_data(
+                    "name",
+                    img,
+                    "ABCDEFGHIJKLMNOPQRSTUVWXYZ 'abcedfghijklmnopqrstuvwxyz-",
+                    [(None, 6), (preprocess_img, 6)],
                 )
-                return name
+                name, dist = self._game_data.get_closest_light_cone_name(res)
+                if dist <= 2:
+                    # the exported name is the match, so the OCR confidence no longer matters
+                    self._name_cache.add(img, name)
+                    return name, 100
+                return name, conf
             case "level":
-                return image_to_string(
-                    img, "0123456789S/", 7, True, preprocess_lc_level_img
-                ).replace("S", "5")
+                level, conf = self._glyph_recognizer.image_to_data(
+                    "level", img, "0123456789S/", 7, preprocess_lc_level_img
+                )
+                return level.replace("S", "5"), conf
             case "superimposition":
-                return image_to_string(
-                    img, "12345S", 10, True, preprocess_superimposition_img
-                ).replace("S", "5")
+                superimposition, conf = self._glyph_recognizer.image_to_data(
+                    "superimposition",
+                    img,
+                    "12345S",
+                    10,
+                    preprocess_superimposition_img,
+                )
+                return superimposition.replace("S", "5"), conf
             case "equipped":
-                return image_to_string(
+                equipped = image_to_string(
                     img, "Equipped", 7, True, preprocess_equipped_img
                 )
+                # the label is either there in full or not at all, so a read of most of
+                # it is the label and only a read of about half of it is uncertain
+                ratio = min(len(equipped) / len("Equipped"), 1)
+                if ratio >= 0.5:
+                    return "Equipped", 100 * ratio
+                return "", 100 * (1 - ratio)
             case _:
-                return img
+                return img, None
 
-    def parse(self, stats_dict: dict, lc_id: int) -> dict:
+    def parse(self, stats_dict: dict, lc_id: int, is_recapture: bool = False) -> dict:
         """Parses the stats dictionary
 
         :param stats_dict: The stats dictionary
         :param lc_id: The ID of the light cone
+        :param is_recapture: Whether the light cone was already counted by an earlier parse, defaults to False
         :return: The parsed stats dictionary
         """
         if self._interrupt_event.is_set():
@@ -160,7 +224,9 @@ class LightConeStrategy:
 
         for key in stats_dict:
             if isinstance(stats_dict[key], Image.Image):
-                stats_dict[key] = self.extract_stats_data(key, stats_dict[key])
+                val, conf = self.extract_stats_data(key, stats_dict[key])
+                if conf is not None:
+                    stats_dict[key], stats_dict.confidence[key] = val, conf
 
         name = stats_dict["name"]
         level = stats_dict["level"]
@@ -174,21 +240,29 @@ class LightConeStrategy:
             level = int(level)
             max_level = int(max_level)
         except ValueError:
-            self._log_signal.emit(
-                f"Light Cone ID {lc_id}: Error parsing level, setting to 1."
+            self._scan_log.warning(
+                f"Light Cone ID {lc_id}: Error parsing level, setting to 1.",
+                item_id=lc_id,
+                field="level",
+                code="parse_failed",
             )
             level = 1
             max_level = 20
+            stats_dict.confidence["level"] = 0
 
         ascension = (max(max_level, 20) - 20) // 10
 
         try:
             superimposition = int(superimposition)
         except ValueError:
-            self._log_signal.emit(
-                f"Light Cone ID {lc_id}: Error parsing superimposition, setting to 1."
+            self._scan_log.warning(
+                f"Light Cone ID {lc_id}: Error parsing superimposition, setting to 1.",
+                item_id=lc_id,
+                field="superimposition",
+                code="parse_failed",
             )
             superimposition = 1
+            stats_dict.confidence["superimposition"] = 0
 
         min_dim = min(lock.size)
         locked = self._lock_icon.resize((min_dim, min_dim))
@@ -210,8 +284,12 @@ class LightConeStrategy:
             "location": location,
             "lock": lock,
             "_id": f"light_cone_{lc_id}",
+            "_confidence": {
+                key: round(conf) for key, conf in stats_dict.confidence.items()
+            },
         }
 
-        self._update_signal.emit(IncrementType.LIGHT_CONE_SUCCESS.value)
+        if not is_recapture:
+            self._progress.add(IncrementType.LIGHT_CONE_SUCCESS)
 
         return result
@@ -1,9 +1,11 @@
-from models.game_data import GameData
+from models.game_data import GameData, RELIC_MAIN_STATS, RELIC_SUB_STATS
 import numpy as np
 from config.relic_scan import RELIC_NAV_DATA
 from utils.data import resource_path
 from utils.ocr import (
+    OcrPolicy,
     image_to_string,
+    preprocess_img,
     preprocess_main_stat_img,
     preprocess_sub_stat_img,
     preprocess_equipped_img,
@@ -11,9 +13,17 @@ from utils.ocr import (
 from PIL import Image
 from pyautogui import locate
 from enums.increment_type import IncrementType
-from PyQt6.QtCore import pyqtBoundSignal
+from services.scanner.planner import InventoryPlanner
+from services.scanner.progress import ProgressAggregator
+from services.scanner.scan_log import ScanLog
 from asyncio import Event
 from models.substat_vals import SUBSTAT_ROLL_VALS
+from utils.recognition import (
+    GlyphRecognizer,
+    LineClassifier,
+    NameImageCache,
+    segment_lines,
+)
 
 
 class RelicStrategy:
@@ -25,34 +35,54 @@ class RelicStrategy:
     def __init__(
         self,
         game_data: GameData,
-        log_signal: pyqtBoundSignal,
-        update_signal: pyqtBoundSignal,
+        scan_log: ScanLog,
+        progress: ProgressAggregator,
         interrupt_event: Event,
     ) -> None:
         """Constructor
 
         :param game_data: The GameData class instance
-        :param log_signal: The log signal
-        :param update_signal: The update signal
+        :param scan_log: The scan log
+        :param progress: The progress aggregator
         :param interrupt_event: The interrupt event
         """
         self._game_data = game_data
-        self._log_signal = log_signal
-        self._update_signal = update_signal
+        self._scan_log = scan_log
+        self._progress = progress
         self._interrupt_event = interrupt_event
         self._lock_icon = Image.open(resource_path("assets/images/lock.png"))
+        self._ocr_policy = OcrPolicy()
+        self._glyph_recognizer = GlyphRecognizer()
+        self._main_stat_classifier = LineClassifier(RELIC_MAIN_STATS)
+        self._sub_stat_classifier = LineClassifier(RELIC_SUB_STATS)
+        self._name_cache = NameImageCache()
 
     def get_optimal_sort_method(self, filters: dict) -> str:
         """Gets the optimal sort method based on the filters
 
+        Rarity sort is secondarily sorted by level, so a minimum level filter only
+        needs level sort when there is no minimum rarity filter.
+
         :param filters: The filters
         :return: The optimal sort method
         """
-        if filters["relic"]["min_level"] > 0:
+        filters = filters["relic"]
+        if filters["min_level"] > 0 and filters["min_rarity"] <= 2:
             return "Lv"
         else:
             return "Rarity"
 
+    def get_inventory_planner(
+        self, filters: dict, sort_method: str
+    ) -> InventoryPlanner:
+        """Gets the planner for skipping items that will fail the filters
+
+        :param filters: The filters
+        :param sort_method: The current sort method
+        :return: The inventory planner
+        """
+        return InventoryPlanner(sort_method, filters["relic"], 2, 0)
+
     def check_filters(
         self, stats_dict: dict, filters: dict, relic_id: int
     ) -> tuple[dict, dict]:
@@ -78,20 +108,27 @@ class RelicStrategy:
                     if filters[key] <= 2:
                         filter_results[key] = True
                         continue
-                    val = stats_dict["rarity"] = self.extract_stats_data(
+                    val, stats_dict.confidence["rarity"] = self.extract_stats_data(
                         filter_key, stats_dict["rarity"]
                     )
+                    stats_dict["rarity"] = val
                 elif key == "min_level":
                     # Trivial case
                     if filters[key] <= 0:
                         filter_results[key] = True
                         continue
-                    level = self.extract_stats_data("level", stats_dict["level"])
+                    level, stats_dict.confidence["level"] = self.extract_stats_data(
+                        "level", stats_dict["level"]
+                    )
                     if not level:
-                        self._log_signal.emit(
-                            f"Relic ID {relic_id}: Failed to parse level. Setting to 0."
+                        self._scan_log.warning(
+                            f"Relic ID {relic_id}: Failed to parse level. Setting to 0.",
+                            item_id=relic_id,
+                            field="level",
+                            code="parse_failed",
                         )
                         stats_dict["level"] = 0
+                        stats_dict.confidence["level"] = 0
                         filter_results[key] = True
                         continue
                     val = stats_dict["level"] = int(level)
@@ -106,66 +143,133 @@ class RelicStrategy:
 
         return (filter_results, stats_dict)
 
-    def extract_stats_data(self, key: str, img: Image):
+    def get_rarity_and_level(self, stats_dict: dict) -> tuple[int, int | None]:
+        """Gets the rarity and level of the relic after checking the filters
+
+        :param stats_dict: The stats dict
+        :return: The rarity, and the level or None if it was not parsed yet
+        """
+        if isinstance(stats_dict["rarity"], Image.Image):
+            (
+                stats_dict["rarity"],
+                stats_dict.confidence["rarity"],
+            ) = self.extract_stats_data("rarity", stats_dict["rarity"])
+        level = stats_dict["level"]
+
+        return stats_dict["rarity"], level if isinstance(level, int) else None
+
+    def extract_stats_data(self, key: str, img: Image) -> tuple:
         """Extracts the stats data from the image
 
         :param key: The key
         :param img: The image
-        :return: The extracted data, or the image if the key is not relevant
+        :return: The extracted data and its confidence (0-100), or the image and None if the key is not relevant
         """
         match key:
             case "name":
-                return image_to_string(
-                    img, "ABCDEFGHIJKLMNOPQRSTUVWXYZ 'abcedfghijklmnopqrstuvwxyz-", 6
+                name = self._name_cache.get(img)
+                if name is not None:
+                    return name, 100
+                res, conf = self._ocr_policy.image_to_data(
+                    "name",
+                    img,
+                    "ABCDEFGHIJKLMNOPQRSTUVWXYZ 'abcedfghijklmnopqrstuvwxyz-",
+                    [(None, 6), (preprocess_img, 6)],
                 )
+                name, dist = self._game_data.get_closest_relic_name(res)
+                if dist <= 2:
+                    # the exported name is the match, so the OCR confidence no longer matters
+                    self._name_cache.add(img, name)
+                    return name, 100
+                return name, conf
             case "level":
-                return image_to_string(img, "0123456789S", 7, True).replace("S", "5")
+                # "+" is read so the glyphs line up with the text, then dropped
+                level, conf = self._glyph_recognizer.image_to_data(
+                    "level", img, "0123456789S+", 7
+                )
+                return level.replace("+", "").replace("S", "5"), conf
             case "mainStatKey":
-                return image_to_string(
+                return self._main_stat_classifier.image_to_data(
                     img,
                     "ABCDEFGHIJKLMNOPQRSTUVWXYZ abcedfghijklmnopqrstuvwxyz",
                     7,
-                    True,
                     preprocess_main_stat_img,
                 )
             case "equipped":
-                return image_to_string(img, "Equiped", 7, True, preprocess_equipped_img)
+                equipped = image_to_string(
+                    img, "Equiped", 7, True, preprocess_equipped_img
+                )
+                # the label is either there in full or not at all, so a read of most of
+                # it is the label and only a read of about half of it is uncertain
+                ratio = min(len(equipped) / len("Equipped"), 1)
+                if ratio >= 0.5:
+                    return "Equipped", 100 * ratio
+                return "", 100 * (1 - ratio)
             case "rarity":
                 # Get rarity by color matching
                 rarity_sample = np.array(img)
                 rarity_sample = rarity_sample[int(rarity_sample.shape[0] / 2)][
                     int(rarity_sample.shape[1] / 2)
                 ]
-                return self._game_data.get_closest_rarity(rarity_sample)
-            case "substat_names":
-                return image_to_string(
-                    img,
-                    " ABCDEFGHIKMPRSTacefikrt",
-                    6,
-                    True,
-                    preprocess_sub_stat_img,
-                    False,
-                )
-            case "substat_vals":
-                return image_to_string(
-                    img, "0123456789S.%", 6, True, preprocess_sub_stat_img, False
-                ).replace("S", "5")
+                return self._game_data.get_closest_rarity(rarity_sample), 100
             case _:
-                return img
+                return img, None
+
+    def extract_substats(
+        self, names_img: Image.Image, vals_img: Image.Image
+    ) -> tuple[list[tuple[str, float]], list[tuple[str, float]]]:
+        """Extracts the substat names and values row by row
+
+        The rows are found once across both images, so every name stays paired with
+        the value on the same row even if another row fails to read.
+
+        :param names_img: The substat names image
+        :param vals_img: The substat values image
+        :return: The substat names and values with their confidences (0-100), one per row
+        """
+        names_img = preprocess_sub_stat_img(names_img)
+        vals_img = preprocess_sub_stat_img(vals_img)
+
+        # both images cover the same rows of the stats screenshot
+        rows = segment_lines(np.hstack((names_img, vals_img)))
 
-    def parse(self, stats_dict: dict, relic_id: int) -> dict:
+        names = self._sub_stat_classifier.read_cells(
+            [names_img[top:bottom] for top, bottom in rows],
+            " ABCDEFGHIKMPRSTacefikrt",
+        )
+        vals = self._glyph_recognizer.read_cells(
+            "substat_vals",
+            [vals_img[top:bottom] for top, bottom in rows],
+            "0123456789S.%",
+        )
+
+        return names, [(val.replace("S", "5"), conf) for val, conf in vals]
+
+    def parse(
+        self, stats_dict: dict, relic_id: int, is_recapture: bool = False
+    ) -> dict:
         """Parses the relic data
 
         :param stats_dict: The stats dict
         :param relic_id: The relic ID
+        :param is_recapture: Whether the relic was already counted by an earlier parse, defaults to False
         :return: The parsed relic data
         """
         if self._interrupt_event.is_set():
             return
 
+        substats = self.extract_substats(
+            stats_dict["substat_names"], stats_dict["substat_vals"]
+        )
+        for key, rows in zip(("substat_names", "substat_vals"), substats):
+            stats_dict[key] = [text for text, _ in rows]
+            stats_dict.confidence[key] = min((conf for _, conf in rows), default=100)
+
         for key in stats_dict:
             if isinstance(stats_dict[key], Image.Image):
-                stats_dict[key] = self.extract_stats_data(key, stats_dict[key])
+                val, conf = self.extract_stats_data(key, stats_dict[key])
+                if conf is not None:
+                    stats_dict[key], stats_dict.confidence[key] = val, conf
 
         name = stats_dict["name"]
         level = stats_dict["level"]
@@ -180,20 +284,17 @@ class RelicStrategy:
         name, _ = self._game_data.get_closest_relic_name(name)
         main_stat_key, _ = self._game_data.get_closest_relic_main_stat(main_stat_key)
         if not level:
-            self._log_signal.emit(
-                f"Relic ID {relic_id}: Failed to extract level. Setting to 0."
+            self._scan_log.warning(
+                f"Relic ID {relic_id}: Failed to extract level. Setting to 0.",
+                item_id=relic_id,
+                field="level",
+                code="parse_failed",
             )
             level = 0
+            stats_dict.confidence["level"] = 0
         level = int(level)
 
         # Substats
-        while "\n\n" in substat_names:
-            substat_names = substat_names.replace("\n\n", "\n")
-        while "\n\n" in substat_vals:
-            substat_vals = substat_vals.replace("\n\n", "\n")
-        substat_names = substat_names.split("\n")
-        substat_vals = substat_vals.split("\n")
-
         substats_res = self._parse_substats(
             substat_names, substat_vals, rarity, relic_id
         )
@@ -225,9 +326,13 @@ class RelicStrategy:
             "location": location,
             "lock": lock,
             "_id": f"relic_{relic_id}",
+            "_confidence": {
+                key: round(conf) for key, conf in stats_dict.confidence.items()
+            },
         }
 
-        self._update_signal.emit(IncrementType.RELIC_SUCCESS.value)
+        if not is_recapture:
+            self._progress.add(IncrementType.RELIC_SUCCESS)
 
         return result
 
@@ -253,8 +358,11 @@ class RelicStrategy:
                 continue
 
             if i >= len(vals):
-                self._log_signal.emit(
-                    f"Relic ID {relic_id}: Failed to get value for substat: {name}."
+                self._scan_log.warning(
+                    f"Relic ID {relic_id}: Failed to get value for substat: {name}.",
+                    item_id=relic_id,
+                    field=name,
+                    code="missing_value",
                 )
                 break
             val = vals[i]
@@ -267,14 +375,20 @@ class RelicStrategy:
                     val = int(val)
             except ValueError:
                 if dist == 0:
-                    self._log_signal.emit(
-                        f"Relic ID {relic_id}: Failed to get value for substat: {name}. Error parsing substat value: {val}."
+                    self._scan_log.warning(
+                        f"Relic ID {relic_id}: Failed to get value for substat: {name}. Error parsing substat value: {val}.",
+                        item_id=relic_id,
+                        field=name,
+                        code="parse_failed",
                     )
                 continue
 
             if not self._validate_substat(name, val, rarity):
-                self._log_signal.emit(
-                    f'WARNING: Relic ID {relic_id}: Substat {name} has illegal value "{val}".'
+                self._scan_log.warning(
+                    f'Relic ID {relic_id}: Substat {name} has illegal value "{val}".',
+                    item_id=relic_id,
+                    field=name,
+                    code="illegal_value",
                 )
 
             substats.append({"key": name, "value": val})
@@ -317,6 +431,9 @@ class RelicStrategy:
         min_substats = min(rarity - 2 + int(level / 3), 4)
 
         if substats_len < min_substats:
-            self._log_signal.emit(
-                f"WARNING: Relic ID {relic_id} has {substats_len} substat(s), but the minimum for rarity {rarity} and level {level} is {min_substats}."
+            self._scan_log.warning(
+                f"Relic ID {relic_id} has {substats_len} substat(s), but the minimum for rarity {rarity} and level {level} is {min_substats}.",
+                item_id=relic_id,
+                field="substats",
+                code="too_few_substats",
             )
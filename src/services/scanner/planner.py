@@ -0,0 +1,252 @@
+class InventoryPlanner:
+    """InventoryPlanner class for deciding which inventory items need to be clicked
+
+    The inventory is sorted in descending order by the sort method, and items sorted by
+    rarity are additionally sorted in descending order by level. Together with the rarity
+    and level read from the grid, this tells us which items will fail the filters before
+    they are clicked.
+
+    Grid values are only used to skip single items, and only once a clicked item has
+    confirmed them. The scan only ends, and a rarity is only exhausted, on the values
+    parsed from a clicked item, so an item the grid places past a filter limit is clicked
+    to check it instead of being skipped.
+    """
+
+    # pages in a row without a readable grid level before grid levels are not used
+    MAX_LEVEL_FAILURES = 3
+
+    def __init__(
+        self, sort_method: str, filters: dict, min_rarity: int, min_level: int
+    ) -> None:
+        """Constructor
+
+        :param sort_method: The current sort method
+        :param filters: The filters of the item type
+        :param min_rarity: The lowest rarity of the item type
+        :param min_level: The lowest level of the item type
+        """
+        self._sort_method = sort_method
+        self._min_rarity = filters["min_rarity"]
+        self._min_level = filters["min_level"]
+        self._filter_rarity = self._min_rarity > min_rarity
+        self._filter_level = self._min_level > min_level
+        self._rarities = set(range(max(self._min_rarity, min_rarity), 6))
+        self._exhausted_rarities = set()
+        self._use_grid_rarities = True
+        self._use_grid_levels = True
+        self._is_rarity_confirmed = False
+        self._is_level_confirmed = False
+        self._level_failures = 0
+        self.is_done = False
+
+    @property
+    def needs_rarities(self) -> bool:
+        """Whether the rarities of the grid are needed to plan the clicks"""
+        return self._use_grid_rarities and (
+            self._filter_rarity
+            or (self._sort_method == "Rarity" and self._filter_level)
+        )
+
+    @property
+    def needs_levels(self) -> bool:
+        """Whether the levels of the grid are needed to plan the clicks"""
+        return self._use_grid_levels and self._filter_level
+
+    def should_click(self, rarity: int | None, level: int | None) -> bool:
+        """Check if an item needs to be clicked
+
+        :param rarity: The rarity read from the grid, or None if unknown
+        :param level: The level read from the grid, or None if unknown
+        :return: True if the item may pass the filters, False otherwise
+        """
+        if self.is_done:
+            return False
+
+        if not (self.needs_rarities and self._is_rarity_confirmed):
+            rarity = None
+        if not (self.needs_levels and self._is_level_confirmed):
+            level = None
+
+        if rarity is not None and self._filter_rarity and rarity < self._min_rarity:
+            # Every item after this one has a lower rarity, which the click confirms
+            return self._sort_method == "Rarity"
+
+        if level is not None and level < self._min_level:
+            if self._sort_method == "Lv":
+                # Every item after this one has a lower level, which the click confirms
+                return True
+            if self._sort_method == "Rarity":
+                # The first item of its rarity below the minimum level exhausts the rarity
+                return rarity not in self._exhausted_rarities
+            return False
+
+        return rarity not in self._exhausted_rarities
+
+    def record(
+        self, grid_rarity: int | None, rarity: int | None, filter_results: dict
+    ) -> None:
+        """Record the filter results of a clicked item
+
+        :param grid_rarity: The rarity read from the grid, used if the item's is unknown and the grid is confirmed
+        :param rarity: The rarity read from the item details, or None if not parsed
+        :param filter_results: The filter results of the item
+        """
+        if rarity is None and self._use_grid_rarities and self._is_rarity_confirmed:
+            rarity = grid_rarity
+        if self._filter_level and not filter_results.get("min_level", True):
+            self._exhaust(rarity)
+
+    def verify(
+        self,
+        grid_rarity: int | None,
+        rarity: int | None,
+        grid_level: int | None,
+        level: int | None,
+    ) -> bool:
+        """Check the rarity and level read from the grid against the clicked item
+
+        Planning relies on the grid for a value once the two first agree, and stops
+        relying on it once they ever disagree.
+
+        :param grid_rarity: The rarity read from the grid
+        :param rarity: The rarity read from the item details
+        :param grid_level: The level read from the grid
+        :param level: The level read from the item details
+        :return: False if the grid was wrong, True otherwise
+        """
+        res = True
+        if None not in (grid_rarity, rarity):
+            if grid_rarity == rarity:
+                self._is_rarity_confirmed = True
+            else:
+                self.stop_using_grid(rarities=True)
+                res = False
+        if None not in (grid_level, level):
+            if grid_level == level:
+                self._is_level_confirmed = True
+            else:
+                self.stop_using_grid(levels=True)
+                res = False
+
+        return res
+
+    def record_grid_levels(self, is_read: bool) -> bool:
+        """Record whether any level of a page could be read from the grid
+
+        Grid levels are no longer used after MAX_LEVEL_FAILURES pages in a row without one.
+
+        :param is_read: Whether any level of the page was read
+        :return: True if grid levels are still used, False otherwise
+        """
+        self._level_failures = 0 if is_read else self._level_failures + 1
+        if self._level_failures >= self.MAX_LEVEL_FAILURES:
+            self.stop_using_grid(levels=True)
+
+        return self._use_grid_levels
+
+    def stop_using_grid(self, rarities: bool = False, levels: bool = False) -> None:
+        """Stop relying on values read from the grid
+
+        :param rarities: Whether to stop using the grid rarities, defaults to False
+        :param levels: Whether to stop using the grid levels, defaults to False
+        """
+        if rarities:
+            self._use_grid_rarities = False
+            self._exhausted_rarities.clear()
+        if levels:
+            self._use_grid_levels = False
+
+    def _exhaust(self, rarity: int | None) -> None:
+        """Mark the remaining items of a rarity as failing the minimum level filter
+
+        Only applies when sorted by rarity, since levels are then descending per rarity.
+
+        :param rarity: The rarity
+        """
+        if rarity is None or self._sort_method != "Rarity":
+            return
+
+        self._exhausted_rarities.add(rarity)
+        if self._rarities <= self._exhausted_rarities:
+            self.is_done = True
+
+
+class CharacterTraversalPlanner:
+    """CharacterTraversalPlanner class for ordering the tab and character clicks on a page
+
+    Every character needs a capture from the Details, Traces and Eidolons tabs, and the
+    Details tab must come first for Traces since it tells us the path. The planner picks
+    the visiting order with the lowest expected wait, based on how long each kind of
+    click has taken to settle so far.
+    """
+
+    TABS = ("details", "traces", "eidolons")
+    # the fixed waits each click used to have, used as the maximum time to settle
+    CHARACTER_TIMEOUTS = {"details": 0.3, "traces": 0.6, "eidolons": 0.5}
+    TAB_TIMEOUTS = {"details": 0.5, "traces": 0.4, "eidolons": 0.9}
+    TAB_ORDERS = (
+        ("details", "traces", "eidolons"),
+        ("details", "eidolons", "traces"),
+        ("eidolons", "details", "traces"),
+    )
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._waits = {
+            "character": dict(self.CHARACTER_TIMEOUTS),
+            "tab": dict(self.TAB_TIMEOUTS),
+        }
+
+    def plan(
+        self, num_characters: int, current_tab: str | None
+    ) -> list[tuple[str, int]]:
+        """Plan the order of the captures on a page
+
+        :param num_characters: The number of characters on the page
+        :param current_tab: The tab that is currently open, or None if unknown
+        :return: The (tab, character index) captures in order
+        """
+        tab_major = [(tab, i) for tab in self.TABS for i in range(num_characters)]
+
+        character_major = []
+        tab = current_tab
+        for i in range(num_characters):
+            # Start each character on the open tab if the order allows it
+            order = next(
+                (o for o in self.TAB_ORDERS if o[0] == tab), self.TAB_ORDERS[0]
+            )
+            character_major += [(t, i) for t in order]
+            tab = order[-1]
+
+        return min(
+            (tab_major, character_major), key=lambda p: self._cost(p, current_tab)
+        )
+
+    def record(self, kind: str, tab: str, seconds: float) -> None:
+        """Record how long a click took to settle
+
+        :param kind: "character" or "tab"
+        :param tab: The tab the click was made on or to
+        :param seconds: The time it took to settle
+        """
+        # exponential moving average, so estimates follow the game's current speed
+        self._waits[kind][tab] = 0.7 * self._waits[kind][tab] + 0.3 * seconds
+
+    def _cost(self, plan: list[tuple[str, int]], current_tab: str | None) -> float:
+        """Get the expected wait of a plan
+
+        :param plan: The (tab, character index) captures in order
+        :param current_tab: The tab that is currently open
+        :return: The expected wait in seconds
+        """
+        cost = 0
+        tab, character = current_tab, None
+        for next_tab, next_character in plan:
+            if next_tab != tab:
+                cost += self._waits["tab"][next_tab]
+                tab = next_tab
+            if next_character != character:
+                cost += self._waits["character"][tab]
+                character = next_character
+
+        return cost
@@ -0,0 +1,35 @@
+import threading
+from enums.increment_type import IncrementType
+
+
+class ProgressAggregator:
+    """ProgressAggregator class for counting scan progress from any thread
+
+    Counts are accumulated here instead of being sent to the UI one event at a time,
+    and the UI drains them on a timer, so the cost of updating the UI does not depend
+    on how many items are scanned or how many threads report progress.
+    """
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def add(self, increment_type: IncrementType, count: int = 1) -> None:
+        """Add to the count of an increment type
+
+        :param increment_type: The increment type
+        :param count: The amount to add, defaults to 1
+        """
+        with self._lock:
+            self._counts[increment_type] = self._counts.get(increment_type, 0) + count
+
+    def drain(self) -> dict[IncrementType, int]:
+        """Take the counts added since the last drain
+
+        :return: The counts by increment type
+        """
+        with self._lock:
+            counts, self._counts = self._counts, {}
+
+        return counts
@@ -0,0 +1,148 @@
+import collections
+import json
+import os
+import threading
+import time
+from enums.log_level import LogLevel
+
+LOG_FILE_NAME = "HSRScanData_log_{}.jsonl"
+# the time between writes of the log file in seconds
+WRITE_INTERVAL = 0.5
+
+
+class ScanLog:
+    """ScanLog class for collecting structured log events from any thread
+
+    Events are appended to deques, which need no lock. The UI drains them in batches
+    for display only, while a writer thread appends them to a JSON Lines file in the
+    output location, so the warnings of a scan can be analysed afterwards without the
+    UI thread ever touching the file.
+
+    Each event has a time, level and message, and optionally the item ID, field and a
+    code identifying the kind of event.
+    """
+
+    def __init__(self, output_location: str) -> None:
+        """Constructor
+
+        :param output_location: The directory to write the log file to
+        """
+        self._events = collections.deque()
+        self._unwritten = collections.deque()
+        self._output_location = output_location
+        self._path = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self) -> str | None:
+        """The path of the log file, or None if nothing has been written yet"""
+        return self._path
+
+    def info(self, message: str, **fields) -> None:
+        """Log an info event
+
+        :param message: The message
+        :param fields: The item_id, field and code of the event
+        """
+        self.log(LogLevel.INFO, message, **fields)
+
+    def warning(self, message: str, **fields) -> None:
+        """Log a warning event
+
+        :param message: The message
+        :param fields: The item_id, field and code of the event
+        """
+        self.log(LogLevel.WARNING, message, **fields)
+
+    def log(
+        self,
+        level: LogLevel,
+        message: str,
+        item_id: int | str | None = None,
+        field: str | None = None,
+        code: str | None = None,
+    ) -> None:
+        """Log an event
+
+        :param level: The level
+        :param message: The message
+        :param item_id: The ID of the item the event is about, defaults to None
+        :param field: The field of the item the event is about, defaults to None
+        :param code: The kind of event, defaults to None
+        """
+        event = {"time": time.time(), "level": level.value, "message": message}
+        if item_id is not None:
+            event["item_id"] = item_id
+        if field is not None:
+            event["field"] = field
+        if code is not None:
+            event["code"] = code
+
+        self._events.append(event)
+        self._unwritten.append(event)
+
+    def drain(self) -> list[dict]:
+        """Take the events logged since the last drain
+
+        :return: The events
+        """
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+
+        return events
+
+    def start(self) -> None:
+        """Start writing events to the log file"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="ScanLogWriter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop writing events to the log file, writing the remaining ones first"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        """Write events to the log file until stopped"""
+        while not self._stop_event.wait(WRITE_INTERVAL):
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        """Append the events logged since the last flush to the log file"""
+        events = []
+        while self._unwritten:
+            events.append(self._unwritten.popleft())
+
+        if events and self._output_location is not None:
+            try:
+                self._write(events)
+            except OSError:
+                # keep logging to the UI if the log file cannot be written
+                self._output_location = None
+
+    def _write(self, events: list[dict]) -> None:
+        """Append events to the log file
+
+        :param events: The events
+        """
+        if self._path is None:
+            if not os.path.exists(self._output_location):
+                os.makedirs(self._output_location)
+            self._path = os.path.join(
+                self._output_location,
+                LOG_FILE_NAME.format(time.strftime("%Y%m%d_%H%M%S")),
+            )
+
+        with open(self._path, "a", encoding="utf-8") as log_file:
+            log_file.write(
+                "".join(
+                    json.dumps(event, ensure_ascii=False) + "\n" for event in events
+                )
+            )
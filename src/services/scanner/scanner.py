@@ -2,30 +2,54 @@ from utils.navigation import Navigation
 import win32gui
 import time
 from utils.screenshot import Screenshot
+from utils.layout import Layout
 import asyncio
+import concurrent.futures
+import datetime
+import os
+import tempfile
+import threading
+import cv2
+import numpy as np
 from .parsers.light_cone_strategy import LightConeStrategy
 from .parsers.relic_strategy import RelicStrategy
 from pynput.keyboard import Key
-from utils.data import resource_path
+from utils.data import resource_path, save_to_json
+from utils import instrumentation
+from utils.profiler import SamplingProfiler
+from utils.crop_store import CropStore, CROP_STORE_FILE_NAME
+from models.captured_item import CapturedItem
 from utils.ocr import image_to_string, preprocess_char_count_img
 import pyautogui
 from .parsers.character_parser import CharacterParser
+from .journal import ScanJournal
+from .planner import CharacterTraversalPlanner, InventoryPlanner
+from .progress import ProgressAggregator
+from .scan_log import ScanLog
+from .grid import GridAnalyser
 from config.character_scan import CHARACTER_NAV_DATA
 from PIL import Image
 from models.game_data import GameData
 from PyQt6 import QtCore
 from enums.increment_type import IncrementType
 
-SUPPORTED_ASPECT_RATIOS = ["16:9"]
+
+# (w, h) of the Data Bank button in % of a 16:9 window
+DATABANK_SIZE = (0.0296875, 0.05625)
+# name prefix of the parse worker threads
+PARSE_THREAD_NAME = "ScannerParse"
 
 
 class HSRScanner(QtCore.QObject):
     """HSRScanner class is responsible for scanning the game for light cones, relics, and characters"""
 
-    update_signal = QtCore.pyqtSignal(int)
-    log_signal = QtCore.pyqtSignal(str)
     complete_signal = QtCore.pyqtSignal()
 
+    # items with a field below this confidence are captured again at the end of a scan
+    RECAPTURE_CONFIDENCE = 60
+    # the most items of one inventory to capture again, least confident first
+    MAX_RECAPTURES = 20
+
     def __init__(self, config: dict, game_data: GameData) -> None:
         """Constructor
 
@@ -58,109 +82,235 @@ class HSRScanner(QtCore.QObject):
         self._nav = Navigation(self._hwnd)
 
         self._aspect_ratio = self._nav.get_aspect_ratio()
-        if self._aspect_ratio not in SUPPORTED_ASPECT_RATIOS:
-            raise Exception(
-                f"Aspect ratio {self._aspect_ratio} not supported. Supported aspect ratios: {SUPPORTED_ASPECT_RATIOS}"
-            )
+        self._layout = Layout(*self._nav.get_window_size(), self._aspect_ratio)
 
-        self._screenshot = Screenshot(self._hwnd, self._aspect_ratio)
+        self._screenshot = Screenshot(self._hwnd, self._layout)
         self._databank_img = Image.open(resource_path("assets/images/databank.png"))
 
         self._interrupt_event = asyncio.Event()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix=PARSE_THREAD_NAME
+        )
+        # parses waiting or running in the executor, and the bytes of their captures
+        self._in_flight = threading.Condition()
+        self._queue_depth = 0
+        self._in_flight_bytes = 0
+        self._peak_in_flight_bytes = 0
+        self._is_memory_limited = False
+        self._crop_store = None
+        self._is_crop_store_failed = False
+        self._journal = None
+        # (strategy, positions, low confidence parses) of each scanned inventory
+        self._recaptures = []
+        self.progress = ProgressAggregator()
+        self.scan_log = ScanLog(config["output_location"])
 
     async def start_scan(self) -> dict:
-        """Starts the scan
+        """Starts the scan, profiling it if enabled
+
+        :return: The scan results
+        """
+        self.scan_log.start()
+        profiler = None
+        if self._config["profile"]:
+            profiler = SamplingProfiler()
+            profiler.add_thread(threading.get_ident(), "navigation")
+            profiler.add_threads(PARSE_THREAD_NAME, "parse")
+            profiler.start()
+
+        try:
+            return await self._scan()
+        finally:
+            if profiler:
+                self._save_profile(profiler)
+            self._close_crop_store()
+            self.scan_log.stop()
+
+    def _save_profile(self, profiler: SamplingProfiler) -> None:
+        """Stops the profiler and saves the profile next to the export
+
+        :param profiler: The profiler
+        """
+        profiler.stop()
+        file_name = f"HSRScanData_profile_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        try:
+            profiler.save(os.path.join(self._config["output_location"], file_name))
+            self.scan_log.info(
+                f"Profile of {profiler.samples} samples saved to {file_name}."
+            )
+        except OSError as e:
+            self.scan_log.warning(f"Failed to save profile: {e}")
+
+    async def _scan(self) -> dict:
+        """Scans the selected items
 
         :return: The scan results
         """
+        instrumentation.enable(self._config["performance_report"])
         if not self._is_en:
-            self.log_signal.emit(
-                "WARNING: Non-English game name detected. The scanner only works with English text."
+            self.scan_log.warning(
+                "Non-English game name detected. The scanner only works with English text.",
+                code="non_english",
+            )
+        self._journal = ScanJournal(
+            self._config["output_location"],
+            self._config["filters"],
+            self._config["resume"],
+        )
+        self._recaptures = []
+        if self._config["resume"]:
+            self.scan_log.info(
+                "Resuming from the last checkpoint."
+                if self._journal.is_resumed
+                else "No matching checkpoint found. Starting a new scan."
             )
         self._nav.bring_window_to_foreground()
+        if not self._layout.is_reference:
+            self._calibrate_layout()
 
         light_cones = []
         if self._config["scan_light_cones"] and not self._interrupt_event.is_set():
-            self.log_signal.emit("Scanning light cones...")
+            self.scan_log.info("Scanning light cones...")
             light_cones = self.scan_inventory(
                 LightConeStrategy(
                     self._game_data,
-                    self.log_signal,
-                    self.update_signal,
+                    self.scan_log,
+                    self.progress,
                     self._interrupt_event,
                 )
             )
-            self.log_signal.emit(
+            self.scan_log.info(
                 "Finished scanning light cones."
             ) if not self._interrupt_event.is_set() else None
 
         relics = []
         if self._config["scan_relics"] and not self._interrupt_event.is_set():
-            self.log_signal.emit("Scanning relics...")
+            self.scan_log.info("Scanning relics...")
             relics = self.scan_inventory(
                 RelicStrategy(
                     self._game_data,
-                    self.log_signal,
-                    self.update_signal,
+                    self.scan_log,
+                    self.progress,
                     self._interrupt_event,
                 )
             )
-            self.log_signal.emit(
+            self.scan_log.info(
                 "Finished scanning relics."
             ) if not self._interrupt_event.is_set() else None
 
         characters = []
         if self._config["scan_characters"] and not self._interrupt_event.is_set():
-            self.log_signal.emit("Scanning characters...")
+            self.scan_log.info("Scanning characters...")
             characters = self.scan_characters()
-            self.log_signal.emit(
+            self.scan_log.info(
                 "Finished scanning characters."
             ) if not self._interrupt_event.is_set() else None
 
+        recaptures = set()
+        if self._recaptures and not self._interrupt_event.is_set():
+            # every inventory parse has to finish before its low confidence items are known
+            await asyncio.wait({*light_cones, *relics})
+            recaptures = self._recapture_items()
+
         if self._interrupt_event.is_set():
-            await asyncio.gather(*light_cones, *relics, *characters)
+            await asyncio.gather(*light_cones, *relics, *characters, *recaptures)
             return
 
         self.complete_signal.emit()
-        self.log_signal.emit("Starting OCR process. Please wait...")
+        self.scan_log.info("Starting OCR process. Please wait...")
+        await asyncio.gather(*light_cones, *relics, *characters, *recaptures)
 
-        return {
-            "source": "HSR-Scanner",
-            "version": 3,
-            "light_cones": await asyncio.gather(*light_cones),
-            "relics": await asyncio.gather(*relics),
-            "characters": await asyncio.gather(*characters),
-        }
+        # results are exported from the journal in ID order, which also holds the
+        # results from before the last checkpoint and the more confident recaptures
+        res = self._journal.get_export()
+
+        if instrumentation.is_enabled():
+            self._report_performance(res)
+
+        return res
+
+    def _report_performance(self, res: dict) -> None:
+        """Saves the timings of the scan next to the export and logs a summary
+
+        :param res: The scan results
+        """
+        report = instrumentation.get_report()
+        items = sum(len(v) for v in res.values() if isinstance(v, list))
+        report["items"] = items
+        report["items_per_second"] = round(items / max(report["elapsed"], 1e-9), 3)
+        report["peak_in_flight_bytes"] = self._peak_in_flight_bytes
+        report["idle"] = round(
+            sum(
+                stage["total"]
+                for name, stage in report["stages"].items()
+                if name.startswith("sleep.")
+            ),
+            3,
+        )
+
+        file_name = (
+            f"HSRScanData_perf_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        save_to_json(report, self._config["output_location"], file_name)
+
+        self.scan_log.info(
+            f"Scanned {items} item(s) in {report['elapsed']:.1f}s ({report['items_per_second']:.2f}/s), {report['idle']:.1f}s of it in sleeps."
+        )
+        for line in instrumentation.summarize(report):
+            self.scan_log.info(line)
+        self.scan_log.info(f"Performance report saved to {file_name}.")
+
+    def _calibrate_layout(self) -> None:
+        """Detects the UI scale of a window without a hand-maintained layout
+
+        The cellphone menu is open when a scan starts, so its Data Bank button is used
+        as the anchor.
+        """
+        self.scan_log.info(
+            f"No layout for aspect ratio {self._aspect_ratio}. Deriving one from the 16:9 layout..."
+        )
+        self._nav_sleep(0.5)
+        if self._layout.calibrate(
+            self._screenshot.screenshot_screen(), self._databank_img, DATABANK_SIZE
+        ):
+            self.scan_log.info(f"UI scale: {self._layout.scale:.3f}.")
+        else:
+            self.scan_log.warning(
+                "Could not find the Data Bank button in the cellphone menu. Assuming the UI fits the window.",
+                code="calibration_failed",
+            )
 
     def stop_scan(self) -> None:
         """Stops the scan"""
         self._interrupt_event.set()
 
+    @property
+    def journal(self) -> ScanJournal | None:
+        """The checkpoint journal of the scan, or None if the scan did not get to start one"""
+        return self._journal
+
+    def discard_journal(self) -> None:
+        """Deletes the checkpoint journal once the results have been saved"""
+        if self._journal is not None:
+            self._journal.discard()
+
     def scan_inventory(
         self, strategy: LightConeStrategy | RelicStrategy
-    ) -> set[asyncio.Task]:
+    ) -> set[asyncio.Future]:
         """Scans the inventory for light cones or relics
 
         :param strategy: The strategy to use
         :raises ValueError: Thrown if the quantity could not be parsed
         :return: The tasks to await
         """
-        nav_data = strategy.NAV_DATA[self._aspect_ratio]
+        nav_data = self._layout.get_table(strategy.NAV_DATA)
 
-        # Navigate to correct tab from cellphone menu
-        self._nav_sleep(1)
-        self._nav.key_press(Key.esc)
-        self._nav_sleep(1.5)
-        if self._interrupt_event.is_set():
-            return []
-        self._nav.key_press(self._config["inventory_key"])
-        self._nav_sleep(1)
-        if self._interrupt_event.is_set():
+        if self._journal.is_complete(strategy.SCAN_TYPE):
+            self.scan_log.info("Already scanned before the last checkpoint.")
+            return set()
+
+        if not self._open_inventory(strategy):
             return []
-        self._nav.move_cursor_to(*nav_data["inv_tab"])
-        time.sleep(0.05)
-        self._nav.click()
-        self._nav_sleep(1.5)
 
         # TODO: using quantity to know when to scan the bottom row is not ideal
         #       because it will not work for tabs that do not have a quantity
@@ -171,7 +321,7 @@ class HSRScanner(QtCore.QObject):
         quantity = image_to_string(quantity, "0123456789/", 7)
 
         try:
-            self.log_signal.emit(f"Quantity: {quantity}.")
+            self.scan_log.info(f"Quantity: {quantity}.")
             quantity = quantity_remaining = int(quantity.split("/")[0])
         except ValueError:
             raise ValueError(
@@ -184,11 +334,11 @@ class HSRScanner(QtCore.QObject):
         optimal_sort_method = strategy.get_optimal_sort_method(self._config["filters"])
 
         if optimal_sort_method != current_sort_method:
-            self.log_signal.emit(
+            self.scan_log.info(
                 f"Sorting by {optimal_sort_method}... (was {current_sort_method})"
             )
             self._nav.move_cursor_to(*nav_data["sort"]["button"])
-            time.sleep(0.05)
+            instrumentation.sleep(0.05, "sleep.cursor")
             self._nav.click()
             self._nav_sleep(0.5)
             self._nav.move_cursor_to(*nav_data["sort"][optimal_sort_method])
@@ -196,9 +346,34 @@ class HSRScanner(QtCore.QObject):
             current_sort_method = optimal_sort_method
             self._nav_sleep(0.5)
 
-        tasks = set()
+        parses = {}
+        positions = {}
+        low_confidence = []
         scanned_per_scroll = nav_data["rows"] * nav_data["cols"]
         num_times_scrolled = 0
+
+        # Skip to the first page that was not fully parsed before the last checkpoint
+        checkpoint = self._journal.get_checkpoint(strategy.SCAN_TYPE)
+        if checkpoint and checkpoint["quantity"] != quantity:
+            self.scan_log.info(
+                f"Quantity changed since the last checkpoint (was {checkpoint['quantity']}). Scanning from the start."
+            )
+            self._journal.reset(strategy.SCAN_TYPE)
+        start_page = self._journal.get_resume_page(strategy.SCAN_TYPE)
+        if start_page:
+            self.scan_log.info(f"Resuming from page {start_page + 1}.")
+            self._nav.move_cursor_to(*nav_data["row_start_top"])
+            for _ in range(start_page):
+                self._nav.scroll_page_down(num_times_scrolled)
+                num_times_scrolled += 1
+            quantity_remaining -= start_page * scanned_per_scroll
+            self._scan_sleep(0.5)
+
+        planner = strategy.get_inventory_planner(
+            self._config["filters"], current_sort_method
+        )
+        grid_analyser = GridAnalyser(nav_data, self._game_data, self._layout.scale)
+
         while quantity_remaining > 0:
             if (
                 quantity_remaining <= scanned_per_scroll
@@ -210,64 +385,112 @@ class HSRScanner(QtCore.QObject):
             else:
                 x, y = nav_data["row_start_top"]
 
+            # Positions of the items on this page
+            cells = []
             for r in range(nav_data["rows"]):
                 for c in range(nav_data["cols"]):
-                    if quantity_remaining <= 0:
-                        break
-
-                    if self._interrupt_event.is_set():
-                        return tasks
-
-                    # Next item
-                    self._nav.move_cursor_to(x, y)
-                    time.sleep(0.05)
-                    self._nav.click()
-                    self._scan_sleep(0.1)
-                    quantity_remaining -= 1
-
-                    # Get stats
-                    stats_dict = self._screenshot.screenshot_stats(strategy.SCAN_TYPE)
-                    item_id = quantity - quantity_remaining
-                    x += nav_data["offset_x"]
-
-                    # Check if item satisfies filters
-                    if self._config["filters"]:
-                        filter_results, stats_dict = strategy.check_filters(
-                            stats_dict,
-                            self._config["filters"],
-                            item_id,
-                        )
-                        if (
-                            current_sort_method == "Lv"
-                            and not filter_results["min_level"]
-                        ):
-                            quantity_remaining = 0
-                            self.log_signal.emit(
-                                f"Reached minimum level filter (got level {stats_dict['level']})."
-                            )
-                            break
-                        if (
-                            current_sort_method == "Rarity"
-                            and not filter_results["min_rarity"]
-                        ):
-                            quantity_remaining = 0
-                            self.log_signal.emit(
-                                f"Reached minimum rarity filter (got rarity {stats_dict['rarity']})."
-                            )
-                            break
-                        if not all(filter_results.values()):
-                            continue
-
-                    # Update UI count
-                    self.update_signal.emit(strategy.SCAN_TYPE.value)
-
-                    task = asyncio.to_thread(strategy.parse, stats_dict, item_id)
-                    tasks.add(task)
+                    if len(cells) < quantity_remaining:
+                        cells.append((x + c * nav_data["offset_x"], y))
 
                 # Next row
                 x = nav_data["row_start_top"][0]
                 y += nav_data["offset_y"]
 
+            # Classify the page from one screenshot so items failing the filters are never clicked
+            rarities = levels = [None] * len(cells)
+            if planner.needs_rarities or planner.needs_levels:
+                grid = self._screenshot.screenshot_screen()
+                if planner.needs_rarities:
+                    rarities = grid_analyser.get_rarities(grid, cells)
+                if planner.needs_levels:
+                    levels = grid_analyser.get_levels(grid, cells)
+                rarities, levels = self._check_grid(planner, rarities, levels)
+
+            page_item_ids = []
+            for (x, y), grid_rarity, grid_level in zip(cells, rarities, levels):
+                if self._interrupt_event.is_set():
+                    return self._wrap_parses(parses)
+
+                quantity_remaining -= 1
+                item_id = quantity - quantity_remaining
+
+                # Already parsed before the last checkpoint
+                if self._journal.has_result(strategy.SCAN_TYPE, item_id):
+                    page_item_ids.append(item_id)
+                    continue
+
+                if not planner.should_click(grid_rarity, grid_level):
+                    continue
+
+                # Next item
+                self._nav.move_cursor_to(x, y)
+                instrumentation.sleep(0.05, "sleep.cursor")
+                self._nav.click()
+                self._scan_sleep(0.1)
+
+                # Get stats
+                stats_dict = self._screenshot.screenshot_stats(strategy.SCAN_TYPE)
+
+                # Check if item satisfies filters
+                if self._config["filters"]:
+                    filter_results, stats_dict = strategy.check_filters(
+                        stats_dict,
+                        self._config["filters"],
+                        item_id,
+                    )
+
+                    rarity, level = strategy.get_rarity_and_level(stats_dict)
+                    if not planner.verify(grid_rarity, rarity, grid_level, level):
+                        self.scan_log.warning(
+                            f"Inventory grid (rarity {grid_rarity}, level {grid_level}) does not match item ID {item_id} (rarity {rarity}, level {level}). No longer skipping items by the mismatched value.",
+                            item_id=item_id,
+                            code="grid_mismatch",
+                        )
+                    planner.record(grid_rarity, rarity, filter_results)
+
+                    if current_sort_method == "Lv" and not filter_results["min_level"]:
+                        quantity_remaining = 0
+                        self.scan_log.info(
+                            f"Reached minimum level filter (got level {stats_dict['level']})."
+                        )
+                        break
+                    if (
+                        current_sort_method == "Rarity"
+                        and not filter_results["min_rarity"]
+                    ):
+                        quantity_remaining = 0
+                        self.scan_log.info(
+                            f"Reached minimum rarity filter (got rarity {stats_dict['rarity']})."
+                        )
+                        break
+                    if planner.is_done:
+                        quantity_remaining = 0
+                        self.scan_log.info(
+                            f"Reached minimum level filter for every rarity (got level {stats_dict['level']})."
+                        )
+                        break
+                    if not all(filter_results.values()):
+                        continue
+
+                # Update UI count
+                self.progress.add(strategy.SCAN_TYPE)
+
+                self._store_capture(strategy, stats_dict, item_id)
+                parses[item_id] = self._submit_parse(
+                    self._parse_item, strategy, stats_dict, item_id
+                )
+                parses[item_id].add_done_callback(
+                    lambda parse, item_id=item_id: self._collect_low_confidence(
+                        low_confidence, item_id, parse
+                    )
+                )
+                positions[item_id] = (num_times_scrolled, x, y)
+                page_item_ids.append(item_id)
+
+            self._journal.checkpoint(
+                strategy.SCAN_TYPE, quantity, num_times_scrolled, page_item_ids
+            )
+
             if quantity_remaining <= 0:
                 break
 
@@ -276,21 +499,56 @@ class HSRScanner(QtCore.QObject):
 
             self._scan_sleep(0.5)
 
+        if positions:
+            self._recaptures.append((strategy, positions, low_confidence))
+
+        self._journal.checkpoint(
+            strategy.SCAN_TYPE, quantity, num_times_scrolled, [], complete=True
+        )
+
         self._nav.key_press(Key.esc)
         self._nav_sleep(1.5)
         self._nav.key_press(Key.esc)
-        return tasks
+        return self._wrap_parses(parses)
+
+    def _open_inventory(self, strategy: LightConeStrategy | RelicStrategy) -> bool:
+        """Opens the inventory tab of a strategy from the cellphone menu
+
+        :param strategy: The strategy to use
+        :return: True if the tab was opened, False if the scan was interrupted
+        """
+        nav_data = self._layout.get_table(strategy.NAV_DATA)
 
-    def scan_characters(self) -> set[asyncio.Task]:
+        # Navigate to correct tab from cellphone menu
+        self._nav_sleep(1)
+        self._nav.key_press(Key.esc)
+        self._nav_sleep(1.5)
+        if self._interrupt_event.is_set():
+            return False
+        self._nav.key_press(self._config["inventory_key"])
+        self._nav_sleep(1)
+        if self._interrupt_event.is_set():
+            return False
+        self._nav.move_cursor_to(*nav_data["inv_tab"])
+        instrumentation.sleep(0.05, "sleep.cursor")
+        self._nav.click()
+        self._nav_sleep(1.5)
+
+        return True
+
+    def scan_characters(self) -> set[asyncio.Future]:
         """Scans the characters
 
         :raises ValueError: Thrown if the character count could not be parsed
         :return: The tasks to await
         """
         char_parser = CharacterParser(
-            self._game_data, self.log_signal, self.update_signal, self._interrupt_event
+            self._game_data, self.scan_log, self.progress, self._interrupt_event
         )
-        nav_data = CHARACTER_NAV_DATA[self._aspect_ratio]
+        nav_data = self._layout.get_table(CHARACTER_NAV_DATA)
+
+        # Characters are always scanned again, so drop the ones of a resumed scan
+        self._journal.reset(IncrementType.CHARACTER_ADD)
 
         # Assume ESC menu is open
         self._nav.bring_window_to_foreground()
@@ -303,12 +561,12 @@ class HSRScanner(QtCore.QObject):
         needle = self._databank_img.resize(
             # Scale image to match capture size
             (
-                int(haystack.size[0] * 0.0296875),
-                int(haystack.size[1] * 0.05625),
+                int(haystack.size[0] * self._layout.dx(DATABANK_SIZE[0])),
+                int(haystack.size[1] * self._layout.dy(DATABANK_SIZE[1])),
             )
         )
         self._nav.move_cursor_to_image(haystack, needle)
-        time.sleep(0.05)
+        instrumentation.sleep(0.05, "sleep.cursor")
         self._nav.click()
         self._nav_sleep(1)
 
@@ -318,7 +576,7 @@ class HSRScanner(QtCore.QObject):
             character_total, "0123456789/", 7, True, preprocess_char_count_img
         )
         try:
-            self.log_signal.emit(f"Character total: {character_total}.")
+            self.scan_log.info(f"Character total: {character_total}.")
             character_total, _ = character_total.split("/")
             character_count = character_total = int(character_total)
         except ValueError:
@@ -328,8 +586,7 @@ class HSRScanner(QtCore.QObject):
             )
 
         # Update UI count
-        for _ in range(character_count):
-            self.update_signal.emit(IncrementType.CHARACTER_ADD.value)
+        self.progress.add(IncrementType.CHARACTER_ADD, character_count)
 
         # Navigate to characters menu
         self._nav.key_press(Key.esc)
@@ -343,6 +600,9 @@ class HSRScanner(QtCore.QObject):
         self._nav.key_press(self._config["characters_key"])
         self._nav_sleep(1)
 
+        traversal_planner = CharacterTraversalPlanner()
+        current_tab = None
+
         tasks = set()
         while character_count > 0:
             if self._interrupt_event.is_set():
@@ -361,124 +621,71 @@ class HSRScanner(QtCore.QObject):
             i_stop = min(character_count, nav_data["chars_per_scan"])
             curr_page_res = [{} for _ in range(i_stop)]
 
-            # Details tab
-            i = 0
-            self._nav.move_cursor_to(*nav_data["details_button"])
-            time.sleep(0.05)
-            self._nav.click()
-            self._nav_sleep(0.5)
-            while i < i_stop:
+            selected = None
+            for tab, i in traversal_planner.plan(i_stop, current_tab):
                 if self._interrupt_event.is_set():
                     return tasks
-                self._nav.move_cursor_to(character_x + i * offset_x, character_y)
-                time.sleep(0.05)
-                self._nav.click()
-                self._scan_sleep(0.3)
-
-                # Get ascension by counting ascension stars
-                ascension_pos = nav_data["ascension_start"]
-                ascension = 0
-                for _ in range(6):
-                    pixel = pyautogui.pixel(
-                        *self._nav.translate_percent_to_coords(*ascension_pos)
-                    )
-                    dist = sum([(a - b) ** 2 for a, b in zip(pixel, (255, 222, 152))])
-                    if dist > 100:
-                        break
-
-                    ascension += 1
-                    ascension_pos = (
-                        ascension_pos[0] + nav_data["ascension_offset_x"],
-                        ascension_pos[1],
-                    )
-
-                max_retry = 5
-                retry = 0
-                character_name = ""
-                while retry < max_retry and not character_name:
-                    try:
-                        character_name_img = (
-                            self._screenshot.screenshot_character_name()
-                        )
-                        character_name = image_to_string(
-                            character_name_img,
-                            "ABCDEFGHIJKLMNOPQRSTUVWXYZ abcdefghijklmnopqrstuvwxyz/7",
-                            7,
-                        )
-                        path, character_name = map(
-                            str.strip, character_name.split("/")[:2]
-                        )
-                        character_img = self._screenshot.screenshot_character()
-                        character_name, path = char_parser.get_closest_name_and_path(
-                            character_name, path, character_img
-                        )
-                    except Exception as e:
-                        retry += 1
-                        self._scan_sleep(0.1)
 
-                if not character_name:
-                    self.log_signal.emit(
-                        f"Failed to parse character name. Got '{character_name}' instead. Ending scan early."
+                if tab != current_tab:
+                    baseline = self._screenshot.screenshot_character_settle(tab)
+                    self._nav.move_cursor_to(*nav_data[f"{tab}_button"])
+                    instrumentation.sleep(0.05, "sleep.cursor")
+                    self._nav.click()
+                    timeout = traversal_planner.TAB_TIMEOUTS[tab]
+                    if tab == "eidolons" and character_total == character_count:
+                        # Eidolons tab takes longer to load the first time
+                        timeout = 1.5
+                    traversal_planner.record(
+                        "tab",
+                        tab,
+                        self._settle_sleep(
+                            tab, baseline, timeout, self._config["nav_delay"]
+                        ),
                     )
-                    return tasks
+                    current_tab = tab
 
-                curr_page_res[i] = {
-                    "name": character_name,
-                    "ascension": ascension,
-                    "path": path,
-                    "level": self._screenshot.screenshot_character_level(),
-                }
-                i += 1
-
-            # Traces tab
-            i = 0
-            self._nav.move_cursor_to(*nav_data["traces_button"])
-            time.sleep(0.05)
-            self._nav.click()
-            self._nav_sleep(0.4)
-            while i < i_stop:
-                if self._interrupt_event.is_set():
-                    return tasks
-                self._nav.move_cursor_to(character_x + i * offset_x, character_y)
-                time.sleep(0.05)
-                self._nav.click()
-                self._scan_sleep(0.6)
-                path_key = curr_page_res[i]["path"].split(" ")[-1].lower()
-                traces_dict = self._screenshot.screenshot_character_traces(path_key)
-                curr_page_res[i]["traces"] = {
-                    "levels": traces_dict,
-                    "unlocks": {},
-                }
-                for k, v in nav_data["traces"][path_key].items():
-                    pixel = pyautogui.pixel(*self._nav.translate_percent_to_coords(*v))
-                    dist = min(
-                        sum([(a - b) ** 2 for a, b in zip(pixel, (255, 255, 255))]),
-                        sum([(a - b) ** 2 for a, b in zip(pixel, (178, 200, 255))]),
+                if i != selected:
+                    baseline = self._screenshot.screenshot_character_settle(tab)
+                    self._nav.move_cursor_to(character_x + i * offset_x, character_y)
+                    instrumentation.sleep(0.05, "sleep.cursor")
+                    self._nav.click()
+                    traversal_planner.record(
+                        "character",
+                        tab,
+                        self._settle_sleep(
+                            tab,
+                            baseline,
+                            traversal_planner.CHARACTER_TIMEOUTS[tab],
+                            self._config["scan_delay"],
+                        ),
                     )
-                    curr_page_res[i]["traces"]["unlocks"][k] = dist < 3000
-                i += 1
-
-            # Eidolons tab
-            i = 0
-            self._nav.move_cursor_to(*nav_data["eidolons_button"])
-            time.sleep(0.05)
-            self._nav.click()
-            self._nav_sleep(1.5 if character_total == character_count else 0.9)
-            while i < i_stop:
-                if self._interrupt_event.is_set():
-                    return tasks
-                self._nav.move_cursor_to(character_x + i * offset_x, character_y)
-                time.sleep(0.05)
-                self._nav.click()
-                self._scan_sleep(0.5)
-                curr_page_res[i][
-                    "eidolon_images"
-                ] = self._screenshot.screenshot_character_eidolons()
-                i += 1
+                    selected = i
+
+                match tab:
+                    case "details":
+                        details = self._capture_character_details(char_parser, nav_data)
+                        if not details:
+                            return tasks
+                        curr_page_res[i].update(details)
+                    case "traces":
+                        curr_page_res[i]["traces"] = self._capture_character_traces(
+                            nav_data, curr_page_res[i]["path"]
+                        )
+                    case "eidolons":
+                        curr_page_res[i][
+                            "eidolon_images"
+                        ] = self._screenshot.screenshot_character_eidolons()
 
             for stats_dict in curr_page_res:
                 character_count -= 1
-                task = asyncio.to_thread(char_parser.parse, stats_dict)
+                task = asyncio.wrap_future(
+                    self._submit_parse(
+                        self._parse_character,
+                        char_parser,
+                        stats_dict,
+                        character_total - character_count,
+                    )
+                )
                 tasks.add(task)
 
             # Drag to next page
@@ -486,13 +693,13 @@ class HSRScanner(QtCore.QObject):
                 character_x, character_y = nav_data["char_start"]
                 character_x += nav_data["offset_x"] * nav_data["chars_per_scan"]
                 self._nav.move_cursor_to(character_x, character_y)
-                time.sleep(0.05)
+                instrumentation.sleep(0.05, "sleep.cursor")
                 self._nav.click()
-                time.sleep(0.05)
+                instrumentation.sleep(0.05, "sleep.cursor")
                 self._nav.drag_scroll(
                     character_x,
                     character_y,
-                    nav_data["char_start"][0] - 0.031,
+                    nav_data["char_start"][0] - self._layout.dx(0.031),
                     character_y,
                 )
 
@@ -502,19 +709,545 @@ class HSRScanner(QtCore.QObject):
         self._nav.key_press(Key.esc)
         return tasks
 
+    def _capture_character_details(
+        self, char_parser: CharacterParser, nav_data: dict
+    ) -> dict | None:
+        """Captures the selected character on the Details tab
+
+        :param char_parser: The CharacterParser class instance
+        :param nav_data: The character nav data
+        :return: The name, path, ascension and level image, or None if the name could not be parsed
+        """
+        # Get ascension by counting ascension stars
+        ascension_pos = nav_data["ascension_start"]
+        ascension = 0
+        for _ in range(6):
+            pixel = pyautogui.pixel(
+                *self._nav.translate_percent_to_coords(*ascension_pos)
+            )
+            dist = sum([(a - b) ** 2 for a, b in zip(pixel, (255, 222, 152))])
+            if dist > 100:
+                break
+
+            ascension += 1
+            ascension_pos = (
+                ascension_pos[0] + nav_data["ascension_offset_x"],
+                ascension_pos[1],
+            )
+
+        max_retry = 5
+        retry = 0
+        character_name = ""
+        while retry < max_retry and not character_name:
+            try:
+                character_name_img = self._screenshot.screenshot_character_name()
+                character_name = image_to_string(
+                    character_name_img,
+                    "ABCDEFGHIJKLMNOPQRSTUVWXYZ abcdefghijklmnopqrstuvwxyz/7",
+                    7,
+                )
+                path, character_name = map(str.strip, character_name.split("/")[:2])
+                character_img = self._screenshot.screenshot_character()
+                character_name, path = char_parser.get_closest_name_and_path(
+                    character_name, path, character_img
+                )
+            except Exception as e:
+                retry += 1
+                self._scan_sleep(0.1)
+
+        if not character_name:
+            self.scan_log.warning(
+                f"Failed to parse character name. Got '{character_name}' instead. Ending scan early.",
+                field="name",
+                code="parse_failed",
+            )
+            return None
+
+        return {
+            "name": character_name,
+            "ascension": ascension,
+            "path": path,
+            "level": self._screenshot.screenshot_character_level(),
+        }
+
+    def _capture_character_traces(self, nav_data: dict, path: str) -> dict:
+        """Captures the selected character on the Traces tab
+
+        :param nav_data: The character nav data
+        :param path: The path of the character
+        :return: The trace level images and trace unlocks
+        """
+        path_key = path.split(" ")[-1].lower()
+        traces = {
+            "levels": self._screenshot.screenshot_character_traces(path_key),
+            "unlocks": {},
+        }
+        for k, v in nav_data["traces"][path_key].items():
+            pixel = pyautogui.pixel(*self._nav.translate_percent_to_coords(*v))
+            dist = min(
+                sum([(a - b) ** 2 for a, b in zip(pixel, (255, 255, 255))]),
+                sum([(a - b) ** 2 for a, b in zip(pixel, (178, 200, 255))]),
+            )
+            traces["unlocks"][k] = dist < 3000
+
+        return traces
+
+    def _settle_sleep(
+        self, tab: str, baseline: np.ndarray, timeout: float, delay: float
+    ) -> float:
+        """Sleeps until the tab has changed from the baseline and stopped changing
+
+        Never sleeps longer than the fixed wait the click used to have.
+
+        :param tab: The tab whose contents to watch
+        :param baseline: The tab contents before the click
+        :param timeout: The maximum time to wait for the contents to settle
+        :param delay: The additional delay from the config
+        :return: The time it took to settle
+        """
+        start = time.time()
+        previous = None
+        while time.time() - start < timeout:
+            instrumentation.sleep(0.03, "sleep.settle")
+            current = self._screenshot.screenshot_character_settle(tab)
+            if (
+                previous is not None
+                and not self._is_same_img(current, baseline)
+                and self._is_same_img(current, previous)
+            ):
+                break
+            previous = current
+
+        settled = time.time() - start
+        instrumentation.sleep(delay, "sleep.settle")
+
+        return settled
+
+    def _is_same_img(self, a: np.ndarray, b: np.ndarray) -> bool:
+        """Checks if two captures of the same region are the same, ignoring noise
+
+        :param a: The first capture
+        :param b: The second capture
+        :return: True if the captures are the same, False otherwise
+        """
+        return np.mean(cv2.absdiff(a, b)) < 1
+
+    def _check_grid(
+        self,
+        planner: InventoryPlanner,
+        rarities: list[int | None],
+        levels: list[int | None],
+    ) -> tuple[list[int | None], list[int | None]]:
+        """Checks that the grid samples landed on the rarity backgrounds and level badges
+
+        A page where most rarity samples could not be read means the sample offsets are
+        off for this window, so the planner stops using grid rarities for the rest of the
+        scan. Grid levels are only given up on after several pages in a row without one.
+
+        :param planner: The inventory planner
+        :param rarities: The rarities read from the grid
+        :param levels: The levels read from the grid
+        :return: The rarities and levels to plan with
+        """
+        unknown = [None] * len(rarities)
+        if planner.needs_rarities and rarities.count(None) * 2 > len(rarities):
+            self.scan_log.warning(
+                "Inventory grid rarity samples do not match any rarity colour. No longer skipping items by rarity.",
+                code="grid_sample",
+            )
+            planner.stop_using_grid(rarities=True)
+            rarities = unknown
+        if planner.needs_levels and levels:
+            is_read = any(level is not None for level in levels)
+            if not planner.record_grid_levels(is_read):
+                self.scan_log.warning(
+                    "Inventory grid level badges could not be read. No longer skipping items by level.",
+                    code="grid_sample",
+                )
+                levels = unknown
+
+        return rarities, levels
+
+    def _submit_parse(self, func: callable, *args) -> concurrent.futures.Future:
+        """Starts parsing in a worker thread without waiting for the scan to finish
+
+        Unlike asyncio.to_thread, the work is submitted to the executor right away,
+        so results are checkpointed while the scanner is still navigating. The captures
+        count towards the in-flight memory budget until the parse is done.
+
+        :param func: The parse function
+        :return: The future of the parse
+        """
+        nbytes = self._get_nbytes(args)
+        self._wait_for_memory(nbytes)
+
+        with self._in_flight:
+            self._queue_depth += 1
+            self._in_flight_bytes += nbytes
+            self._peak_in_flight_bytes = max(
+                self._peak_in_flight_bytes, self._in_flight_bytes
+            )
+            self._record_in_flight()
+
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(lambda _: self._release_parse(nbytes))
+
+        return future
+
+    def _release_parse(self, nbytes: int) -> None:
+        """Removes a finished parse from the in-flight parses
+
+        :param nbytes: The bytes of the captures of the parse
+        """
+        with self._in_flight:
+            self._queue_depth -= 1
+            self._in_flight_bytes -= nbytes
+            self._record_in_flight()
+            self._in_flight.notify_all()
+
+    def _wait_for_memory(self, nbytes: int) -> None:
+        """Waits for parses to finish until a capture fits in the in-flight memory budget
+
+        A capture is always let through when nothing is in flight, so a budget smaller
+        than one capture only serializes capture and parsing.
+
+        :param nbytes: The bytes of the capture
+        """
+        budget = self._config["memory_budget"]
+        if not budget:
+            return
+
+        with self._in_flight, instrumentation.measure("memory_wait"):
+            while self._is_over_budget(nbytes) and not self._interrupt_event.is_set():
+                if not self._is_memory_limited:
+                    self._is_memory_limited = True
+                    self.scan_log.info(
+                        f"In-flight memory budget of {budget // (1024 * 1024)} MB reached. Waiting for OCR to catch up..."
+                    )
+                self._in_flight.wait(0.1)
+
+    def _is_over_budget(self, nbytes: int) -> bool:
+        """Checks if a capture would take the in-flight parses over the memory budget
+
+        :param nbytes: The bytes of the capture
+        :return: True if the capture does not fit, False otherwise
+        """
+        budget = self._config["memory_budget"]
+
+        return bool(
+            budget and self._in_flight_bytes and self._in_flight_bytes + nbytes > budget
+        )
+
+    def _store_capture(
+        self,
+        strategy: LightConeStrategy | RelicStrategy,
+        stats_dict: CapturedItem,
+        item_id: int,
+    ) -> None:
+        """Spills a capture to the crop store if it is kept for replay or over the memory budget
+
+        :param strategy: The strategy of the capture
+        :param stats_dict: The capture
+        :param item_id: The item ID
+        """
+        if not (
+            self._config["save_captures"] or self._is_over_budget(stats_dict.nbytes)
+        ):
+            return
+
+        if self._crop_store is None:
+            if self._is_crop_store_failed:
+                return
+            self._crop_store = self._open_crop_store()
+            if self._crop_store is None:
+                return
+
+        stats_dict.spill(
+            self._crop_store, scan_type=strategy.SCAN_TYPE.name, item_id=item_id
+        )
+
+    def _open_crop_store(self) -> CropStore | None:
+        """Opens the crop store, kept in the output location if captures are saved for replay
+
+        :return: The crop store, or None if it could not be created
+        """
+        file_name = CROP_STORE_FILE_NAME.format(
+            datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        )
+        directory = (
+            self._config["output_location"]
+            if self._config["save_captures"]
+            else tempfile.gettempdir()
+        )
+        try:
+            return CropStore(os.path.join(directory, file_name))
+        except OSError as e:
+            # captures stay in memory and the budget is kept by waiting for OCR
+            self._is_crop_store_failed = True
+            self.scan_log.warning(f"Failed to create crop store: {e}")
+
+    def _close_crop_store(self) -> None:
+        """Closes the crop store, deleting it unless captures are saved for replay
+
+        Waits for the parses still in flight first, since the items they hold are views
+        of the store that keep it mapped.
+        """
+        if self._crop_store is None:
+            return
+
+        with self._in_flight:
+            while self._queue_depth:
+                self._in_flight.wait(0.1)
+
+        store, self._crop_store = self._crop_store, None
+        file_name = os.path.basename(store.path)
+        try:
+            failed = store.close(delete=not self._config["save_captures"])
+        except OSError as e:
+            self.scan_log.warning(
+                f"Failed to close {file_name}: {e}", code="crop_store"
+            )
+            return
+
+        if failed:
+            self.scan_log.warning(
+                f"Failed to delete {', '.join(map(os.path.basename, failed))}. Retrying when the scanner exits.",
+                code="crop_store",
+            )
+        elif self._config["save_captures"]:
+            self.scan_log.info(f"Captures saved to {file_name}.")
+
+    def _record_in_flight(self) -> None:
+        """Records the number and memory of the in-flight parses"""
+        instrumentation.gauge("ocr_queue", self._queue_depth)
+        instrumentation.gauge("in_flight_bytes", self._in_flight_bytes)
+
+    def _get_nbytes(self, value) -> int:
+        """Gets the bytes held by the captures in a value
+
+        :param value: A capture, or a dict, list or tuple of them
+        :return: The bytes of the image data
+        """
+        if isinstance(value, Image.Image):
+            return value.width * value.height * len(value.getbands())
+        if isinstance(value, dict):
+            return sum(self._get_nbytes(v) for v in value.values())
+        if isinstance(value, (list, tuple)):
+            return sum(self._get_nbytes(v) for v in value)
+
+        if isinstance(value, CapturedItem) and value.is_spilled:
+            return 0
+
+        # numpy arrays and CapturedItem
+        return getattr(value, "nbytes", 0)
+
+    def _wrap_parses(
+        self, parses: dict[int, concurrent.futures.Future]
+    ) -> set[asyncio.Future]:
+        """Wraps the parses of an inventory scan to be awaited
+
+        :param parses: The parse futures by item ID
+        :return: The tasks to await
+        """
+        return {asyncio.wrap_future(parse) for parse in parses.values()}
+
+    def _collect_low_confidence(
+        self,
+        low_confidence: list[tuple[int, dict]],
+        item_id: int,
+        parse: concurrent.futures.Future,
+    ) -> None:
+        """Records an item to capture again if it was parsed with low confidence
+
+        Runs in the parse worker as each parse completes, so the scan never waits on it.
+
+        :param low_confidence: The (item ID, result) of the low confidence items
+        :param item_id: The item ID
+        :param parse: The completed parse future
+        """
+        if parse.cancelled() or parse.exception() is not None:
+            return
+
+        if self._is_low_confidence(parse.result()):
+            low_confidence.append((item_id, parse.result()))
+
+    def _recapture_items(self) -> set[asyncio.Future]:
+        """Captures the items that were parsed with low confidence again
+
+        Runs once after every inventory has been walked and parsed. Each inventory is
+        opened again and only the grid positions of its MAX_RECAPTURES least confident
+        items are revisited, page by page, with a longer settle than the first time.
+
+        :return: The tasks of the new parses to await
+        """
+        reparses = set()
+        for strategy, positions, low_confidence in self._recaptures:
+            if not low_confidence or self._interrupt_event.is_set():
+                continue
+
+            items = sorted(
+                low_confidence, key=lambda item: self._get_confidence(item[1])
+            )[: self.MAX_RECAPTURES]
+            self.scan_log.info(
+                f"Capturing {len(items)} of {len(low_confidence)} low confidence item(s) again..."
+            )
+            if not self._open_inventory(strategy):
+                break
+
+            page = 0
+            for item_id, previous in sorted(items, key=lambda item: positions[item[0]]):
+                if self._interrupt_event.is_set():
+                    break
+
+                item_page, x, y = positions[item_id]
+                page = self._scroll_to_page(strategy, page, item_page)
+
+                self._nav.move_cursor_to(x, y)
+                instrumentation.sleep(0.05, "sleep.cursor")
+                self._nav.click()
+                # Give the details panel longer to settle than the first time
+                self._scan_sleep(0.5)
+
+                stats_dict = self._screenshot.screenshot_stats(strategy.SCAN_TYPE)
+                self._store_capture(strategy, stats_dict, item_id)
+                reparse = self._submit_parse(
+                    self._reparse_item, strategy, stats_dict, item_id, previous
+                )
+                reparses.add(asyncio.wrap_future(reparse))
+
+            self._nav.key_press(Key.esc)
+            self._nav_sleep(1.5)
+            self._nav.key_press(Key.esc)
+
+        return reparses
+
+    def _scroll_to_page(
+        self,
+        strategy: LightConeStrategy | RelicStrategy,
+        page: int,
+        target: int,
+    ) -> int:
+        """Scrolls the inventory to a page, going back to the top if it is above
+
+        :param strategy: The strategy to use
+        :param page: The current page
+        :param target: The page to scroll to
+        :return: The new current page
+        """
+        if page == target:
+            return page
+
+        self._nav.move_cursor_to(
+            *self._layout.get_table(strategy.NAV_DATA)["row_start_top"]
+        )
+        if target < page:
+            self._nav.scroll_to_top(page)
+            page = 0
+        while page < target:
+            self._nav.scroll_page_down(page)
+            page += 1
+        self._scan_sleep(0.5)
+
+        return page
+
+    def _is_low_confidence(self, result: dict | None) -> bool:
+        """Checks if any field of a parsed item is below the recapture confidence
+
+        :param result: The parsed item
+        :return: True if the item should be captured again, False otherwise
+        """
+        if not result:
+            return False
+
+        return self._get_confidence(result) < self.RECAPTURE_CONFIDENCE
+
+    def _get_confidence(self, result: dict) -> float:
+        """Gets the confidence of the least confident field of a parsed item
+
+        :param result: The parsed item
+        :return: The confidence (0-100)
+        """
+        return min(result["_confidence"].values(), default=100)
+
+    def _parse_item(
+        self,
+        strategy: LightConeStrategy | RelicStrategy,
+        stats_dict: dict,
+        item_id: int,
+    ) -> dict:
+        """Parses an item and records the result in the checkpoint journal
+
+        :param strategy: The strategy to use
+        :param stats_dict: The stats dict
+        :param item_id: The item ID
+        :return: The parsed item
+        """
+        try:
+            result = strategy.parse(stats_dict, item_id)
+        except Exception:
+            # mark the item as done so its page is not scanned again on resume
+            self._journal.add_result(strategy.SCAN_TYPE, item_id, None)
+            raise
+        if result or not self._interrupt_event.is_set():
+            self._journal.add_result(strategy.SCAN_TYPE, item_id, result)
+
+        return result
+
+    def _parse_character(
+        self, char_parser: CharacterParser, stats_dict: dict, character_id: int
+    ) -> dict:
+        """Parses a character and records the result in the checkpoint journal
+
+        :param char_parser: The CharacterParser class instance
+        :param stats_dict: The stats dict
+        :param character_id: The position of the character in the scan
+        :return: The parsed character
+        """
+        result = char_parser.parse(stats_dict)
+        if result:
+            self._journal.add_result(IncrementType.CHARACTER_ADD, character_id, result)
+
+        return result
+
+    def _reparse_item(
+        self,
+        strategy: LightConeStrategy | RelicStrategy,
+        stats_dict: dict,
+        item_id: int,
+        previous: dict,
+    ) -> dict:
+        """Parses a captured again item, keeping whichever parse is more confident
+
+        :param strategy: The strategy to use
+        :param stats_dict: The stats dict of the new capture
+        :param item_id: The item ID
+        :param previous: The result of the first parse
+        :return: The parsed item
+        """
+        result = strategy.parse(stats_dict, item_id, is_recapture=True)
+        if not result:
+            return previous
+
+        if self._get_confidence(result) < self._get_confidence(previous):
+            return previous
+
+        self._journal.add_result(strategy.SCAN_TYPE, item_id, result)
+
+        return result
+
     def _nav_sleep(self, seconds: float) -> None:
         """Sleeps for the specified amount of time with navigation delay
 
         :param seconds: The amount of time to sleep
         """
-        time.sleep(seconds + self._config["nav_delay"])
+        instrumentation.sleep(seconds + self._config["nav_delay"], "sleep.nav")
 
     def _scan_sleep(self, seconds: float) -> None:
         """Sleeps for the specified amount of time with scan delay
 
         :param seconds: The amount of time to sleep
         """
-        time.sleep(seconds + self._config["scan_delay"])
+        instrumentation.sleep(seconds + self._config["scan_delay"], "sleep.scan")
 
     def _ceildiv(self, a, b) -> int:
         """Divides a by b and rounds up
@@ -56,6 +56,9 @@ class Ui_MainWindow(object):
         self.pushButtonStartScan.setEnabled(False)
         self.pushButtonStartScan.setGeometry(QtCore.QRect(10, 350, 111, 41))
         self.pushButtonStartScan.setObjectName("pushButtonStartScan")
+        self.checkBoxResume = QtWidgets.QCheckBox(parent=self.Home)
+        self.checkBoxResume.setGeometry(QtCore.QRect(130, 360, 131, 21))
+        self.checkBoxResume.setObjectName("checkBoxResume")
         self.groupBox = QtWidgets.QGroupBox(parent=self.Home)
         self.groupBox.setGeometry(QtCore.QRect(270, 210, 151, 91))
         self.groupBox.setObjectName("groupBox")
@@ -249,16 +252,16 @@ class Ui_MainWindow(object):
         self.lineEditInventoryKey.setObjectName("lineEditInventoryKey")
         self.formLayout_5.setWidget(0, QtWidgets.QFormLayout.ItemRole.FieldRole, self.lineEditInventoryKey)
         self.groupBox_7 = QtWidgets.QGroupBox(parent=self.Configure)
-        self.groupBox_7.setGeometry(QtCore.QRect(10, 260, 131, 61))
+        self.groupBox_7.setGeometry(QtCore.QRect(10, 320, 131, 61))
         self.groupBox_7.setObjectName("groupBox_7")
         self.pushButtonRestoreDefaults = QtWidgets.QPushButton(parent=self.groupBox_7)
         self.pushButtonRestoreDefaults.setGeometry(QtCore.QRect(10, 20, 111, 31))
         self.pushButtonRestoreDefaults.setObjectName("pushButtonRestoreDefaults")
         self.groupBox_8 = QtWidgets.QGroupBox(parent=self.Configure)
-        self.groupBox_8.setGeometry(QtCore.QRect(10, 200, 181, 51))
+        self.groupBox_8.setGeometry(QtCore.QRect(10, 200, 181, 111))
         self.groupBox_8.setObjectName("groupBox_8")
         self.verticalLayoutWidget = QtWidgets.QWidget(parent=self.groupBox_8)
-        self.verticalLayoutWidget.setGeometry(QtCore.QRect(10, 20, 161, 21))
+        self.verticalLayoutWidget.setGeometry(QtCore.QRect(10, 20, 161, 81))
         self.verticalLayoutWidget.setObjectName("verticalLayoutWidget")
         self.verticalLayout_2 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget)
         self.verticalLayout_2.setContentsMargins(0, 0, 0, 0)
@@ -266,6 +269,46 @@ class Ui_MainWindow(object):
         self.checkBoxSroFormat = QtWidgets.QCheckBox(parent=self.verticalLayoutWidget)
         self.checkBoxSroFormat.setObjectName("checkBoxSroFormat")
         self.verticalLayout_2.addWidget(self.checkBoxSroFormat)
+        self.checkBoxPerformanceReport = QtWidgets.QCheckBox(parent=self.verticalLayoutWidget)
+        self.checkBoxPerformanceReport.setObjectName("checkBoxPerformanceReport")
+        self.verticalLayout_2.addWidget(self.checkBoxPerformanceReport)
+        self.checkBoxProfile = QtWidgets.QCheckBox(parent=self.verticalLayoutWidget)
+        self.checkBoxProfile.setObjectName("checkBoxProfile")
+        self.verticalLayout_2.addWidget(self.checkBoxProfile)
+        self.checkBoxSaveCaptures = QtWidgets.QCheckBox(parent=self.verticalLayoutWidget)
+        self.checkBoxSaveCaptures.setObjectName("checkBoxSaveCaptures")
+        self.verticalLayout_2.addWidget(self.checkBoxSaveCaptures)
+        self.groupBox_10 = QtWidgets.QGroupBox(parent=self.Configure)
+        self.groupBox_10.setGeometry(QtCore.QRect(200, 200, 221, 51))
+        self.groupBox_10.setObjectName("groupBox_10")
+        self.verticalLayoutWidget_2 = QtWidgets.QWidget(parent=self.groupBox_10)
+        self.verticalLayoutWidget_2.setGeometry(QtCore.QRect(10, 20, 201, 21))
+        self.verticalLayoutWidget_2.setObjectName("verticalLayoutWidget_2")
+        self.verticalLayout_3 = QtWidgets.QVBoxLayout(self.verticalLayoutWidget_2)
+        self.verticalLayout_3.setContentsMargins(0, 0, 0, 0)
+        self.verticalLayout_3.setObjectName("verticalLayout_3")
+        self.checkBoxCompactOutput = QtWidgets.QCheckBox(parent=self.verticalLayoutWidget_2)
+        self.checkBoxCompactOutput.setObjectName("checkBoxCompactOutput")
+        self.verticalLayout_3.addWidget(self.checkBoxCompactOutput)
+        self.groupBox_11 = QtWidgets.QGroupBox(parent=self.Configure)
+        self.groupBox_11.setGeometry(QtCore.QRect(200, 260, 221, 51))
+        self.groupBox_11.setObjectName("groupBox_11")
+        self.horizontalLayoutWidget = QtWidgets.QWidget(parent=self.groupBox_11)
+        self.horizontalLayoutWidget.setGeometry(QtCore.QRect(10, 20, 201, 22))
+        self.horizontalLayoutWidget.setObjectName("horizontalLayoutWidget")
+        self.horizontalLayout_5 = QtWidgets.QHBoxLayout(self.horizontalLayoutWidget)
+        self.horizontalLayout_5.setContentsMargins(0, 0, 0, 0)
+        self.horizontalLayout_5.setObjectName("horizontalLayout_5")
+        self.label_26 = QtWidgets.QLabel(parent=self.horizontalLayoutWidget)
+        self.label_26.setObjectName("label_26")
+        self.horizontalLayout_5.addWidget(self.label_26)
+        self.spinBoxMemoryBudget = QtWidgets.QSpinBox(parent=self.horizontalLayoutWidget)
+        self.spinBoxMemoryBudget.setMaximumSize(QtCore.QSize(75, 16777215))
+        self.spinBoxMemoryBudget.setMaximum(65536)
+        self.spinBoxMemoryBudget.setSingleStep(128)
+        self.spinBoxMemoryBudget.setProperty("value", 512)
+        self.spinBoxMemoryBudget.setObjectName("spinBoxMemoryBudget")
+        self.horizontalLayout_5.addWidget(self.spinBoxMemoryBudget)
         self.groupBox_9 = QtWidgets.QGroupBox(parent=self.Configure)
         self.groupBox_9.setGeometry(QtCore.QRect(10, 100, 411, 91))
         self.groupBox_9.setObjectName("groupBox_9")
@@ -343,6 +386,8 @@ class Ui_MainWindow(object):
         self.checkBoxScanRelics.setText(_translate("MainWindow", "Relics"))
         self.checkBoxScanChars.setText(_translate("MainWindow", "Characters"))
         self.pushButtonStartScan.setText(_translate("MainWindow", "Start Scan"))
+        self.checkBoxResume.setToolTip(_translate("MainWindow", "Continue the last interrupted or failed scan from its last checkpoint"))
+        self.checkBoxResume.setText(_translate("MainWindow", "Resume last scan"))
         self.groupBox.setTitle(_translate("MainWindow", "Item count"))
         self.label_23.setText(_translate("MainWindow", "Light Cones:"))
         self.label_24.setText(_translate("MainWindow", "Relics:"))
@@ -397,6 +442,18 @@ class Ui_MainWindow(object):
         self.groupBox_8.setTitle(_translate("MainWindow", "Developer"))
         self.checkBoxSroFormat.setToolTip(_translate("MainWindow", "Star Rail Optimizer"))
         self.checkBoxSroFormat.setText(_translate("MainWindow", "Also export in SRO format"))
+        self.checkBoxPerformanceReport.setToolTip(_translate("MainWindow", "Time each stage of the scan and save a report next to the export"))
+        self.checkBoxPerformanceReport.setText(_translate("MainWindow", "Save performance report"))
+        self.checkBoxProfile.setToolTip(_translate("MainWindow", "Sample the scanner and OCR threads and save a collapsed-stack profile for flame graphs next to the export. Can also be turned on with the HSR_SCANNER_PROFILE environment variable"))
+        self.checkBoxProfile.setText(_translate("MainWindow", "Profile scan"))
+        self.checkBoxSaveCaptures.setToolTip(_translate("MainWindow", "Keep every captured item in a memory-mapped file next to the export, so the scan can be reprocessed offline"))
+        self.checkBoxSaveCaptures.setText(_translate("MainWindow", "Save captures for replay"))
+        self.groupBox_10.setTitle(_translate("MainWindow", "Output"))
+        self.checkBoxCompactOutput.setToolTip(_translate("MainWindow", "Write the JSON files without indentation, which makes them smaller and faster to save"))
+        self.checkBoxCompactOutput.setText(_translate("MainWindow", "Compact JSON output"))
+        self.groupBox_11.setTitle(_translate("MainWindow", "Memory"))
+        self.label_26.setToolTip(_translate("MainWindow", "The most memory that captured items waiting for OCR may use. The scanner waits for OCR to catch up when it is reached. 0 for no limit"))
+        self.label_26.setText(_translate("MainWindow", "In-flight budget (MB):"))
         self.groupBox_9.setTitle(_translate("MainWindow", "Additional Delay (if the scanner is too fast for inputs to register)"))
         self.label_11.setToolTip(_translate("MainWindow", "Navigating between different pages (inventory, character details, etc.)"))
         self.label_11.setText(_translate("MainWindow", "Navigation speed (ms):"))
@@ -45,172 +45,170 @@ SRO_SUB_STAT_MAP = {
 }
 
 
-def convert_to_sro(data: dict, game_data: GameData) -> dict:
-    """Reformat data to SRO format
+class SroConverter:
+    """SroConverter class for converting scan results to SRO format one record at a time
 
-    :param data: The data to reformat
-    :param game_data: The GameData class instance
-    :return: The reformatted data
+    The SRO key mappings are compiled into flat translation tables once per load, so
+    converting a record is a handful of direct lookups.
     """
-    res = {
+
+    HEADER = {
         "format": "SRO",
         "source": "HSR-Scanner",
         "version": 1,
     }
+    # SRO keys of the lists of the scan results
+    KEYS = {
+        "characters": "characters",
+        "relics": "relics",
+        "light_cones": "lightCones",
+    }
 
-    sro_mappings = game_data.get_sro_mappings()
-    trailblazer_suffix = "F" if game_data.is_trailblazer_female else "M"
-    get_sro_character_key = lambda key: _get_sro_character_key(
-        key, sro_mappings, trailblazer_suffix
-    )
-
-    if data["characters"]:
-        res["characters"] = _convert_characters_sro(
-            data["characters"], get_sro_character_key
-        )
-
-    if data["relics"]:
-        res["relics"] = _convert_relics_sro(
-            data["relics"], sro_mappings, get_sro_character_key
-        )
-
-    if data["light_cones"]:
-        res["lightCones"] = _convert_light_cones_sro(
-            data["light_cones"], sro_mappings, get_sro_character_key
-        )
-    return res
-
-
-def _convert_characters_sro(
-    characters: list[dict], character_key_fn: callable
-) -> list[dict]:
-    """Convert characters to SRO format
-
-    :param characters: The characters to convert
-    :param character_key_fn: The function to get the SRO character key
-    :return: The converted characters
-    """
-    formatted_characters = []
-    for character in characters:
-        res = {
-            "key": character_key_fn(character["key"]),
+    def __init__(self, game_data: GameData) -> None:
+        """Constructor
+
+        :param game_data: The GameData class instance
+        """
+        tables = _get_sro_tables(game_data.get_sro_mappings())
+        self._main_stats = tables["main_stats"]
+        self._sub_stats = tables["sub_stats"]
+        self._relic_sets = tables["relic_sets"]
+        self._light_cones = tables["light_cones"]
+        self._characters = tables["characters"][
+            "F" if game_data.is_trailblazer_female else "M"
+        ]
+
+    def convert(self, kind: str, record: dict) -> dict:
+        """Convert a record to SRO format
+
+        :param kind: The list of the scan results the record is from
+        :param record: The record to convert
+        :raises KeyError: Thrown if the kind or a key of the record has no SRO mapping
+        :return: The converted record
+        """
+        match kind:
+            case "characters":
+                return self._convert_character(record)
+            case "relics":
+                return self._convert_relic(record)
+            case "light_cones":
+                return self._convert_light_cone(record)
+            case _:
+                raise KeyError(f"No SRO conversion for {kind}.")
+
+    def _convert_character(self, character: dict) -> dict:
+        """Convert a character to SRO format
+
+        :param character: The character to convert
+        :return: The converted character
+        """
+        skills = character["skills"]
+        traces = character["traces"]
+
+        return {
+            "key": self._characters[character["key"]],
             "level": character["level"],
             "eidolon": character["eidolon"],
             "ascension": character["ascension"],
-            "basic": character["skills"]["basic"],
-            "skill": character["skills"]["skill"],
-            "ult": character["skills"]["ult"],
-            "talent": character["skills"]["talent"],
-            "bonusAbilities": {
-                1: character["traces"]["ability_1"],
-                2: character["traces"]["ability_2"],
-                3: character["traces"]["ability_3"],
-            },
-            "statBoosts": {
-                1: character["traces"]["stat_1"],
-                2: character["traces"]["stat_2"],
-                3: character["traces"]["stat_3"],
-                4: character["traces"]["stat_4"],
-                5: character["traces"]["stat_5"],
-                6: character["traces"]["stat_6"],
-                7: character["traces"]["stat_7"],
-                8: character["traces"]["stat_8"],
-                9: character["traces"]["stat_9"],
-                10: character["traces"]["stat_10"],
-            },
+            "basic": skills["basic"],
+            "skill": skills["skill"],
+            "ult": skills["ult"],
+            "talent": skills["talent"],
+            "bonusAbilities": {i: traces[f"ability_{i}"] for i in range(1, 4)},
+            "statBoosts": {i: traces[f"stat_{i}"] for i in range(1, 11)},
         }
-        formatted_characters.append(res)
 
-    return formatted_characters
+    def _convert_relic(self, relic: dict) -> dict:
+        """Convert a relic to SRO format
 
+        Substats without an SRO mapping are left out.
 
-def _convert_relics_sro(
-    relics: list[dict], sro_mappings: dict, character_key_fn: callable
-) -> list[dict]:
-    """Convert relics to SRO format
-
-    :param relics: The relics to convert
-    :param sro_mappings: The SRO key mappings
-    :param character_key_fn: The function to get the SRO character key
-    :return: The converted relics
-    """
-    formatted_relics = []
-    for relic in relics:
-        mainStatKey = SRO_MAIN_STAT_MAP[relic["mainstat"]]
-        if relic["slot"] not in ["Head", "Hands"] and relic["mainstat"] != "SPD":
-            mainStatKey += "_"
+        :param relic: The relic to convert
+        :return: The converted relic
+        """
+        slot_key, main_stat_key = self._main_stats[relic["slot"], relic["mainstat"]]
 
         substats = []
         for substat in relic["substats"]:
-            try:
-                value = (
-                    round(substat["value"] / 100, 3)
-                    if substat["key"].endswith("_")
-                    else substat["value"]
-                )
-                substats.append(
-                    {
-                        "key": SRO_SUB_STAT_MAP[substat["key"]],
-                        "value": value,
-                    }
-                )
-            except KeyError:
-                pass
-
-        res = {
-            "setKey": sro_mappings["relic_sets"][relic["set"]],
-            "slotKey": SRO_SLOT_MAP[relic["slot"]],
+            mapping = self._sub_stats.get(substat["key"])
+            if mapping is None:
+                continue
+            key, is_percent = mapping
+            value = substat["value"]
+            substats.append(
+                {"key": key, "value": round(value / 100, 3) if is_percent else value}
+            )
+
+        return {
+            "setKey": self._relic_sets[relic["set"]],
+            "slotKey": slot_key,
             "level": relic["level"],
             "rarity": relic["rarity"],
-            "mainStatKey": mainStatKey,
-            "location": character_key_fn(relic["location"]),
+            "mainStatKey": main_stat_key,
+            "location": self._characters[relic["location"]],
             "lock": relic["lock"],
             "substats": substats,
         }
-        formatted_relics.append(res)
 
-    return formatted_relics
+    def _convert_light_cone(self, light_cone: dict) -> dict:
+        """Convert a light cone to SRO format
 
-
-def _convert_light_cones_sro(
-    light_cones: list[dict], sro_mappings: dict, character_key_fn: callable
-) -> list[dict]:
-    """Convert light cones to SRO format
-
-    :param light_cones: The light cones to convert
-    :param sro_mappings: The SRO key mappings
-    :param character_key_fn: The function to get the SRO character key
-    :return: The converted light cones
-    """
-    formatted_light_cones = []
-    for light_cone in light_cones:
-        res = {
-            "key": sro_mappings["light_cones"][light_cone["key"]],
+        :param light_cone: The light cone to convert
+        :return: The converted light cone
+        """
+        return {
+            "key": self._light_cones[light_cone["key"]],
             "level": light_cone["level"],
             "ascension": light_cone["ascension"],
             "superimpose": light_cone["superimposition"],
-            "location": character_key_fn(light_cone["location"]),
+            "location": self._characters[light_cone["location"]],
             "lock": light_cone["lock"],
         }
-        formatted_light_cones.append(res)
 
-    return formatted_light_cones
+
+# compiled translation tables, by id of the SRO mappings they were compiled from
+_sro_tables = {}
 
 
-def _get_sro_character_key(
-    key: str, sro_mappings: dict, trailblazer_suffix: str
-) -> str:
-    """Get the SRO character key
+def _get_sro_tables(sro_mappings: dict) -> dict:
+    """Get the translation tables compiled from the SRO key mappings
 
-    :param key: The character key
     :param sro_mappings: The SRO key mappings
-    :param trailblazer_suffix: The Trailblazer suffix
-    :return: The SRO character key
+    :return: The translation tables
     """
-    if not key:
-        return ""
-    sro_key = sro_mappings["characters"][key]
-    if "Trailblazer" in key:
-        sro_key += trailblazer_suffix
+    cached = _sro_tables.get(id(sro_mappings))
+    if cached is not None and cached[0] is sro_mappings:
+        return cached[1]
+
+    tables = {
+        # (slot, main stat) to (SRO slot key, SRO main stat key)
+        "main_stats": {
+            (slot, stat): (
+                slot_key,
+                (key + "_" if slot not in ["Head", "Hands"] and stat != "SPD" else key),
+            )
+            for slot, slot_key in SRO_SLOT_MAP.items()
+            for stat, key in SRO_MAIN_STAT_MAP.items()
+        },
+        # substat to (SRO key, whether the value is a percentage to scale down)
+        "sub_stats": {
+            stat: (key, stat.endswith("_")) for stat, key in SRO_SUB_STAT_MAP.items()
+        },
+        "relic_sets": sro_mappings["relic_sets"],
+        "light_cones": sro_mappings["light_cones"],
+        # character to SRO character key, by Trailblazer suffix
+        "characters": {
+            suffix: {
+                "": "",
+                **{
+                    key: sro_key + suffix if "Trailblazer" in key else sro_key
+                    for key, sro_key in sro_mappings["characters"].items()
+                },
+            }
+            for suffix in ("M", "F")
+        },
+    }
+    _sro_tables.clear()
+    _sro_tables[id(sro_mappings)] = (sro_mappings, tables)
 
-    return sro_key
+    return tables
@@ -0,0 +1,205 @@
+import atexit
+import gc
+import json
+import mmap
+import os
+import numpy as np
+
+CROP_STORE_FILE_NAME = "HSRScanData_captures_{}.crops"
+INDEX_SUFFIX = ".jsonl"
+
+# size of each mapped segment of the arena, a multiple of the allocation granularity
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class CropStore:
+    """CropStore class for an append-only arena of crop buffers in a memory-mapped file
+
+    Each item's crop buffer is copied once into the file and read back as a numpy view
+    of the mapping, so spilled crops are paged by the OS instead of held in memory. The
+    file is mapped in fixed-size segments, since a mapping with views into it cannot
+    be resized, and an item never spans two segments.
+
+    Every item is also recorded in a JSON Lines index next to the file, with its offset,
+    crop layout and any metadata such as the scan type and item ID. A kept store is a
+    replay corpus: any process can open it with read and get the items as views without
+    copying them.
+
+    A segment cannot be unmapped while a view of it is alive, and on Windows a mapped
+    file cannot be shrunk or deleted, so whatever close cannot release is retried when
+    the process exits.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Constructor
+
+        :param path: The path of the file, which is created or truncated
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        self.path = path
+        self._file = open(path, "w+b")
+        self._index = open(path + INDEX_SUFFIX, "w", encoding="utf-8")
+        self._segments = []
+        self._segment_start = 0
+        self._segment_size = 0
+        self._position = 0
+        self.nbytes = 0
+
+    def append(self, buffer: np.ndarray, layout: dict, **meta) -> np.ndarray:
+        """Copy a crop buffer into the arena
+
+        :param buffer: The contiguous uint8 crop buffer
+        :param layout: The (offset, shape) of each crop in the buffer by key
+        :param meta: Metadata to record in the index
+        :return: The view of the buffer in the arena
+        """
+        size = buffer.nbytes
+        if self._position + size > self._segment_size:
+            self._add_segment(size)
+
+        view = np.frombuffer(
+            self._segments[-1], dtype=np.uint8, count=size, offset=self._position
+        )
+        view[:] = buffer.reshape(-1)
+
+        self._index.write(
+            json.dumps(
+                {
+                    **meta,
+                    "offset": self._segment_start + self._position,
+                    "size": size,
+                    "layout": {k: [o, list(s)] for k, (o, s) in layout.items()},
+                }
+            )
+            + "\n"
+        )
+        self._position += size
+        self.nbytes += size
+
+        return view
+
+    def close(self, delete: bool = False) -> list[str]:
+        """Flush and close the store
+
+        Release every view of the store first, e.g. by dropping the items spilled to it.
+
+        :param delete: Whether to delete the file and index, defaults to False
+        :raises OSError: Thrown if the store could not be flushed or shrunk
+        :return: The paths that could not be deleted yet, which are deleted at exit instead
+        """
+        try:
+            for segment in self._segments:
+                segment.flush()
+            self._segments = _close_segments(self._segments)
+            if not self._segments:
+                # drop the unused end of the last segment
+                self._file.truncate(self._segment_start + self._position)
+        finally:
+            self._file.close()
+            self._index.close()
+
+        if not delete:
+            return []
+
+        failed = _remove(self.path, self.path + INDEX_SUFFIX)
+        if failed:
+            atexit.register(_remove_at_exit, self._segments, failed)
+            self._segments = []
+
+        return failed
+
+    @staticmethod
+    def read(path: str):
+        """Read the items of a store
+
+        :param path: The path of the file
+        :return: An iterator of (metadata, buffer, layout) with the buffers as read-only views of the file
+        """
+        with open(path + INDEX_SUFFIX, encoding="utf-8") as index:
+            records = [json.loads(line) for line in index if line.strip()]
+        if not records:
+            return
+
+        with open(path, "rb") as data_file:
+            data = mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        for record in records:
+            buffer = np.frombuffer(
+                data,
+                dtype=np.uint8,
+                count=record.pop("size"),
+                offset=record.pop("offset"),
+            )
+            layout = {k: (o, tuple(s)) for k, (o, s) in record.pop("layout").items()}
+            yield record, buffer, layout
+
+    def _add_segment(self, size: int) -> None:
+        """Map a new segment at the end of the file
+
+        :param size: The size of the item that did not fit in the current segment
+        """
+        granularity = mmap.ALLOCATIONGRANULARITY
+        segment_size = max(SEGMENT_SIZE, -(size // -granularity) * granularity)
+
+        self._segment_start += self._segment_size
+        self._segment_size = segment_size
+        self._position = 0
+
+        self._file.truncate(self._segment_start + segment_size)
+        self._segments.append(
+            mmap.mmap(
+                self._file.fileno(),
+                segment_size,
+                access=mmap.ACCESS_WRITE,
+                offset=self._segment_start,
+            )
+        )
+
+
+def _close_segments(segments: list[mmap.mmap]) -> list[mmap.mmap]:
+    """Close mapped segments
+
+    :param segments: The segments
+    :return: The segments that still have views and could not be closed
+    """
+    in_use = []
+    for segment in segments:
+        try:
+            segment.close()
+        except BufferError:
+            in_use.append(segment)
+
+    return in_use
+
+
+def _remove(*paths: str) -> list[str]:
+    """Delete files
+
+    :param paths: The paths of the files
+    :return: The paths that could not be deleted
+    """
+    failed = []
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            failed.append(path)
+
+    return failed
+
+
+def _remove_at_exit(segments: list[mmap.mmap], paths: list[str]) -> None:
+    """Close the segments and delete the files of a store that was in use when closed
+
+    :param segments: The segments that could not be closed
+    :param paths: The paths that could not be deleted
+    """
+    # free the views still held by unreachable objects
+    gc.collect()
+    _close_segments(segments)
+    _remove(*paths)
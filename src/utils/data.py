@@ -1,6 +1,23 @@
 import sys
 import os
 import json
+import re
+from collections.abc import Iterator
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+# the line breaks and leading spaces of indented JSON
+_INDENT_PATTERN = re.compile(rb"\n( +)")
+# UTF-8 encoded non-ASCII characters, which only appear inside JSON strings
+_NON_ASCII_PATTERN = re.compile(rb"[\x80-\xff]+")
 
 
 def resource_path(relative_path: str) -> str:
@@ -30,18 +47,203 @@ def executable_path(path: str) -> str:
     return os.path.join(os.path.dirname(sys.executable), path)
 
 
-def save_to_json(data: dict, output_location: str, file_name: str) -> None:
+def save_to_json(
+    data: dict, output_location: str, file_name: str, indent: int | None = 4
+) -> None:
     """Save data to json file
 
+    Lists and iterators are streamed one record at a time and the file is replaced
+    atomically, so an existing file is never left half-written.
+
     :param data: The data to save
     :param output_location: The output location
     :param file_name: The file name
+    :param indent: The indent, or None for compact output, defaults to 4
     """
     if not os.path.exists(output_location):
         os.makedirs(output_location)
 
-    with open(os.path.join(output_location, file_name), "w") as outfile:
-        json.dump(data, outfile, indent=4)
+    with JsonStreamWriter(os.path.join(output_location, file_name), indent) as writer:
+        for key, value in data.items():
+            if isinstance(value, (list, Iterator)):
+                writer.write_array(key, value)
+            else:
+                writer.write_field(key, value)
+
+
+def dumps(value, indent: int | None = None) -> bytes:
+    """Serialize a value to JSON with the fastest encoder available
+
+    Uses orjson, then ujson, then the json module, all with the same output. Non-ASCII
+    characters are escaped like the json module does by default, e.g. "•" as "\\u2022",
+    so the output matches earlier versions.
+
+    :param value: The JSON serializable value, which may have int dict keys
+    :param indent: The indent, or None for compact output, defaults to None
+    :return: The ASCII encoded JSON
+    """
+    if orjson:
+        if indent is None:
+            res = orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        else:
+            res = orjson.dumps(
+                value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_INDENT_2
+            )
+            if indent != 2:
+                # orjson only indents by 2, so widen the leading spaces of every line
+                res = _INDENT_PATTERN.sub(
+                    lambda m: b"\n" + b" " * (len(m.group(1)) // 2 * indent), res
+                )
+
+        # orjson always writes UTF-8, so escape the rare non-ASCII text afterwards
+        if res.isascii():
+            return res
+        return _NON_ASCII_PATTERN.sub(
+            lambda m: json.dumps(m.group().decode())[1:-1].encode(), res
+        )
+
+    if ujson:
+        return ujson.dumps(
+            value,
+            indent=indent or 0,
+            escape_forward_slashes=False,
+        ).encode()
+
+    return json.dumps(
+        value,
+        indent=indent,
+        separators=(",", ":") if indent is None else None,
+    ).encode()
+
+
+class JsonStreamWriter:
+    """JsonStreamWriter class for writing a JSON object one field or record at a time
+
+    Writes the same text as dumps would for the whole object, to a temporary file next
+    to the output that atomically replaces it on close. If writing fails part way, the
+    temporary file is removed and the output is left untouched.
+    """
+
+    def __init__(self, path: str, indent: int | None = 4) -> None:
+        """Constructor
+
+        :param path: The path of the output file
+        :param indent: The indent, or None for compact output, defaults to 4
+        """
+        self._path = path
+        self._tmp_path = path + ".tmp"
+        self._indent = indent
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(b"{")
+        self._num_fields = 0
+        self._num_records = None
+
+    def write_field(self, key: str, value) -> None:
+        """Write a field of the object
+
+        :param key: The key
+        :param value: The JSON serializable value
+        """
+        self._begin_field(key)
+        self._file.write(self._dumps(value, 1))
+
+    def begin_array(self, key: str) -> None:
+        """Start an array field, whose records are written with write_record
+
+        :param key: The key
+        """
+        self._begin_field(key)
+        self._file.write(b"[")
+        self._num_records = 0
+
+    def write_record(self, record) -> None:
+        """Write a record of the current array field
+
+        :param record: The JSON serializable record
+        """
+        if self._num_records:
+            self._file.write(b",")
+        self._file.write(self._newline(2) + self._dumps(record, 2))
+        self._num_records += 1
+
+    def end_array(self) -> None:
+        """End the current array field"""
+        if self._num_records:
+            self._file.write(self._newline(1))
+        self._file.write(b"]")
+        self._num_records = None
+
+    def write_array(self, key: str, records) -> None:
+        """Write an array field from an iterable of records
+
+        :param key: The key
+        :param records: The JSON serializable records
+        """
+        self.begin_array(key)
+        for record in records:
+            self.write_record(record)
+        self.end_array()
+
+    def close(self) -> None:
+        """Finish the object and move it into place"""
+        if self._num_fields:
+            self._file.write(self._newline(0))
+        self._file.write(b"}")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self._path)
+
+    def abort(self) -> None:
+        """Discard the partially written object"""
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self) -> "JsonStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _begin_field(self, key: str) -> None:
+        """Write the separator and key of the next field
+
+        :param key: The key
+        """
+        if self._num_fields:
+            self._file.write(b",")
+        self._file.write(
+            self._newline(1) + dumps(key) + (b":" if self._indent is None else b": ")
+        )
+        self._num_fields += 1
+
+    def _newline(self, level: int) -> bytes:
+        """Get the line break before a value nested at a level of the object
+
+        :param level: The nesting level
+        :return: The line break and indent, or nothing for compact output
+        """
+        if self._indent is None:
+            return b""
+
+        return b"\n" + b" " * (self._indent * level)
+
+    def _dumps(self, value, level: int) -> bytes:
+        """Serialize a value nested at a level of the object
+
+        :param value: The JSON serializable value
+        :param level: The nesting level
+        :return: The serialized value
+        """
+        res = dumps(value, self._indent)
+        if self._indent is None:
+            return res
+
+        # strings never contain a raw newline, so every newline starts a line of the value
+        return res.replace(b"\n", self._newline(level))
 
 
 def get_json_data(file_path: str) -> dict:
@@ -0,0 +1,190 @@
+import os
+from models.game_data import GameData
+from utils.conversion import SroConverter
+from utils.data import JsonStreamWriter
+
+
+class ExportFormat:
+    """ExportFormat class for the native output format, and the base of the other formats
+
+    A format turns the scan results into one JSON file, one record at a time, so every
+    format can be fed from the same pass over the results.
+    """
+
+    NAME = "native"
+    FILE_NAME = "HSRScanData_{}.json"
+    # keys of the parse results that are only used while scanning
+    INTERNAL_KEYS = ("_confidence",)
+
+    def get_header(self, data: dict) -> dict:
+        """Get the fields written before the lists
+
+        :param data: The scan results
+        :return: The fields
+        """
+        return {k: v for k, v in data.items() if not isinstance(v, list)}
+
+    def get_key(self, kind: str, records: list[dict]) -> str | None:
+        """Get the key to write a list of the scan results under
+
+        :param kind: The key of the list in the scan results
+        :param records: The records of the list
+        :return: The key, or None to leave the list out
+        """
+        return kind
+
+    def convert(self, kind: str, record: dict) -> dict:
+        """Convert a record of the scan results
+
+        :param kind: The key of the list in the scan results
+        :param record: The record
+        :return: The converted record
+        """
+        return {k: v for k, v in record.items() if k not in self.INTERNAL_KEYS}
+
+
+class SroExportFormat(ExportFormat):
+    """SroExportFormat class for the Star Rail Optimizer output format"""
+
+    NAME = "SRO"
+    FILE_NAME = "HSRScanData_SRO_{}.json"
+
+    def __init__(self, game_data: GameData) -> None:
+        """Constructor
+
+        :param game_data: The GameData class instance
+        """
+        self._converter = SroConverter(game_data)
+
+    def get_header(self, data: dict) -> dict:
+        return dict(SroConverter.HEADER)
+
+    def get_key(self, kind: str, records: list[dict]) -> str | None:
+        return SroConverter.KEYS[kind] if records else None
+
+    def convert(self, kind: str, record: dict) -> dict:
+        return self._converter.convert(kind, record)
+
+
+class Exporter:
+    """Exporter class for writing the scan results in every output format in one pass
+
+    Every format has its own file open at the same time, and each record is converted
+    and written to all of them before moving on to the next. A format that fails is
+    dropped without affecting the others.
+    """
+
+    def __init__(
+        self, output_location: str, formats: list[ExportFormat], indent: int | None = 4
+    ) -> None:
+        """Constructor
+
+        :param output_location: The directory to write the files to
+        :param formats: The output formats
+        :param indent: The indent, or None for compact output, defaults to 4
+        """
+        self._output_location = output_location
+        self._formats = formats
+        self._indent = indent
+
+    def export(
+        self, data: dict, timestamp: str
+    ) -> tuple[list[str], dict[str, Exception]]:
+        """Write the scan results
+
+        :param data: The scan results
+        :param timestamp: The timestamp to put in the file names
+        :return: The paths of the files written, and the errors by format name
+        """
+        if not os.path.exists(self._output_location):
+            os.makedirs(self._output_location)
+
+        writers = {}
+        paths = {}
+        errors = {}
+        for export_format in self._formats:
+            paths[export_format] = os.path.join(
+                self._output_location, export_format.FILE_NAME.format(timestamp)
+            )
+            writers[export_format] = JsonStreamWriter(
+                paths[export_format], self._indent
+            )
+
+        def run(export_format: ExportFormat, func: callable, *args) -> None:
+            try:
+                func(*args)
+            except Exception as e:
+                errors[export_format.NAME] = e
+                writers.pop(export_format).abort()
+
+        for export_format in list(writers):
+            run(
+                export_format,
+                self._write_header,
+                writers[export_format],
+                export_format,
+                data,
+            )
+
+        for kind, records in data.items():
+            if not isinstance(records, list):
+                continue
+
+            keys = {}
+            for export_format in list(writers):
+                keys[export_format] = export_format.get_key(kind, records)
+                if keys[export_format]:
+                    run(
+                        export_format,
+                        writers[export_format].begin_array,
+                        keys[export_format],
+                    )
+
+            for record in records:
+                for export_format in list(writers):
+                    if keys[export_format]:
+                        run(
+                            export_format,
+                            self._write_record,
+                            writers[export_format],
+                            export_format,
+                            kind,
+                            record,
+                        )
+
+            for export_format in list(writers):
+                if keys[export_format]:
+                    run(export_format, writers[export_format].end_array)
+
+        for export_format in list(writers):
+            run(export_format, writers[export_format].close)
+
+        return [paths[export_format] for export_format in writers], errors
+
+    def _write_header(
+        self, writer: JsonStreamWriter, export_format: ExportFormat, data: dict
+    ) -> None:
+        """Write the fields of a format that come before the lists
+
+        :param writer: The writer of the format
+        :param export_format: The format
+        :param data: The scan results
+        """
+        for key, value in export_format.get_header(data).items():
+            writer.write_field(key, value)
+
+    def _write_record(
+        self,
+        writer: JsonStreamWriter,
+        export_format: ExportFormat,
+        kind: str,
+        record: dict,
+    ) -> None:
+        """Convert and write a record in a format
+
+        :param writer: The writer of the format
+        :param export_format: The format
+        :param kind: The key of the list in the scan results
+        :param record: The record
+        """
+        writer.write_record(export_format.convert(kind, record))
@@ -0,0 +1,212 @@
+import functools
+import threading
+import time
+
+# upper bounds of the timing histogram buckets, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+
+_enabled = False
+_lock = threading.Lock()
+_stages = {}
+_gauges = {}
+_start = 0.0
+
+
+class _Stage:
+    """_Stage class for the timing histogram of a stage"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        """Constructor"""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, seconds: float) -> None:
+        """Add a timing
+
+        :param seconds: The time taken
+        """
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+
+class _Timer:
+    """_Timer class for timing a block of code as a stage"""
+
+    __slots__ = ("_stage", "_start")
+
+    def __init__(self, stage: str) -> None:
+        """Constructor
+
+        :param stage: The stage name
+        """
+        self._stage = stage
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        record(self._stage, time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    """_NullTimer class for not timing a block of code while instrumentation is off"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def enable(enabled: bool = True) -> None:
+    """Turn instrumentation on or off, clearing what was recorded
+
+    :param enabled: Whether to record timings, defaults to True
+    """
+    global _enabled, _start
+    with _lock:
+        _stages.clear()
+        _gauges.clear()
+        _start = time.perf_counter()
+        _enabled = enabled
+
+
+def is_enabled() -> bool:
+    """Check if instrumentation is on
+
+    :return: True if timings are being recorded, False otherwise
+    """
+    return _enabled
+
+
+def record(stage: str, seconds: float) -> None:
+    """Record the time taken by a stage
+
+    :param stage: The stage name
+    :param seconds: The time taken
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        if stage not in _stages:
+            _stages[stage] = _Stage()
+        _stages[stage].add(seconds)
+
+
+def gauge(name: str, value: float) -> None:
+    """Record the value of a gauge at the current time
+
+    :param name: The gauge name
+    :param value: The value
+    """
+    if not _enabled:
+        return
+
+    with _lock:
+        _gauges.setdefault(name, []).append(
+            (round(time.perf_counter() - _start, 3), value)
+        )
+
+
+def measure(stage: str) -> _Timer | _NullTimer:
+    """Time a block of code as a stage
+
+    :param stage: The stage name
+    :return: The context manager to time the block with
+    """
+    return _Timer(stage) if _enabled else _NULL_TIMER
+
+
+def timed(stage: str) -> callable:
+    """Time every call of a function as a stage
+
+    :param stage: The stage name
+    :return: The decorator
+    """
+
+    def decorator(func: callable) -> callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    return decorator
+
+
+def sleep(seconds: float, stage: str = "sleep") -> None:
+    """Sleep, recording the time as idle time of a stage
+
+    :param seconds: The amount of time to sleep
+    :param stage: The stage name, defaults to "sleep"
+    """
+    with measure(stage):
+        time.sleep(seconds)
+
+
+def get_report() -> dict:
+    """Get the timings recorded since instrumentation was turned on
+
+    :return: The elapsed time, the histogram of each stage and the values of each gauge
+    """
+    with _lock:
+        stages = {
+            name: {
+                "count": stage.count,
+                "total": round(stage.total, 4),
+                "mean": round(stage.total / stage.count, 6),
+                "max": round(stage.max, 4),
+                "histogram": {
+                    **{f"<={bound}": n for bound, n in zip(BUCKETS, stage.buckets)},
+                    f">{BUCKETS[-1]}": stage.buckets[-1],
+                },
+            }
+            for name, stage in sorted(_stages.items(), key=lambda s: -s[1].total)
+        }
+        gauges = {name: list(values) for name, values in _gauges.items()}
+
+    return {
+        "elapsed": round(time.perf_counter() - _start, 3),
+        "stages": stages,
+        "gauges": gauges,
+    }
+
+
+def summarize(report: dict, limit: int = 8) -> list[str]:
+    """Summarize a report in a few lines
+
+    :param report: The report
+    :param limit: The number of stages to list, defaults to 8
+    :return: The lines of the summary, stages with the most total time first
+    """
+    lines = []
+    for name, stage in list(report["stages"].items())[:limit]:
+        lines.append(
+            f"{name}: {stage['total']:.2f}s total, {stage['count']} call(s), {stage['mean'] * 1000:.1f}ms mean"
+        )
+
+    return lines
@@ -0,0 +1,205 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+REFERENCE_ASPECT_RATIO = "16:9"
+REFERENCE_SIZE = (1920, 1080)
+
+# keys holding distances instead of positions, with the axis of each value
+_DISTANCE_KEYS = {
+    "offset_x": "x",
+    "offset_y": "y",
+    "ascension_offset_x": "x",
+    "level_sample": "xyxy",
+    "rarity_sample": "xy",
+}
+# keys holding regions in % of another region, which move and scale with it
+_NESTED_KEYS = {"light_cone", "relic"}
+# keys of the UI blocks that are centred as a whole, whatever third of the window they reach into
+_ANCHORS = {
+    "traces": "center",
+    "eidolons": "center",
+    "char_start": "center",
+    "char_end": "center",
+}
+
+# UI scales detected this session, by window size
+_detected_scales = {}
+
+
+class Layout:
+    """Layout class for mapping the 16:9 layout tables onto a game window of any size
+
+    The game draws its UI at one scale, keeping it centred vertically and spreading it
+    out horizontally, so every element sits a fixed distance from the left edge, the
+    centre or the right edge of the window. Positions in the 16:9 tables are anchored
+    by the third of the window they are in, unless their UI block is anchored as a
+    whole, and distances are only scaled. Aspect ratios with a hand-maintained table
+    use it as is.
+    """
+
+    def __init__(self, width: int, height: int, aspect_ratio: str) -> None:
+        """Constructor
+
+        :param width: The width of the game window
+        :param height: The height of the game window
+        :param aspect_ratio: The aspect ratio of the game window
+        """
+        self._width = width
+        self._height = height
+        self._aspect_ratio = aspect_ratio
+        # the UI fits the window until a scale is detected
+        self.scale = _detected_scales.get(
+            (width, height),
+            min(width / REFERENCE_SIZE[0], height / REFERENCE_SIZE[1]),
+        )
+        self._tables = {}
+
+    @property
+    def is_reference(self) -> bool:
+        """Whether the window has the aspect ratio of the reference tables"""
+        return self._aspect_ratio == REFERENCE_ASPECT_RATIO
+
+    def calibrate(
+        self,
+        screen: Image.Image | np.ndarray,
+        needle: Image.Image,
+        size: tuple[float, float],
+    ) -> bool:
+        """Detect the UI scale once per window size by template matching an element of it
+
+        :param screen: The native screenshot of the game window
+        :param needle: The image of the element
+        :param size: The (w, h) of the element in % of the reference window
+        :return: True if the scale is known, False if it is estimated from the window size
+        """
+        if self.is_reference or (self._width, self._height) in _detected_scales:
+            return True
+
+        haystack = cv2.cvtColor(np.asarray(screen)[..., :3], cv2.COLOR_RGB2GRAY)
+        template = cv2.cvtColor(np.asarray(needle.convert("RGB")), cv2.COLOR_RGB2GRAY)
+
+        # search at up to 540p, since the element only needs to be found roughly
+        search = min(1, 540 / haystack.shape[0])
+        if search < 1:
+            haystack = cv2.resize(
+                haystack, None, fx=search, fy=search, interpolation=cv2.INTER_AREA
+            )
+
+        fit = self.scale
+        best_score, best_scale = 0.0, fit
+        for scale in fit * np.linspace(0.7, 1.3, 13):
+            w = int(size[0] * REFERENCE_SIZE[0] * scale * search)
+            h = int(size[1] * REFERENCE_SIZE[1] * scale * search)
+            if not 8 <= w <= haystack.shape[1] or not 8 <= h <= haystack.shape[0]:
+                continue
+
+            scaled = cv2.resize(template, (w, h), interpolation=cv2.INTER_AREA)
+            score = cv2.matchTemplate(haystack, scaled, cv2.TM_CCOEFF_NORMED).max()
+            if score > best_score:
+                best_score, best_scale = float(score), float(scale)
+
+        if best_score < 0.8:
+            return False
+
+        _detected_scales[(self._width, self._height)] = best_scale
+        self.scale = best_scale
+        self._tables.clear()
+
+        return True
+
+    def get_table(self, tables: dict) -> dict:
+        """Get the layout table for the window
+
+        :param tables: The layout tables by aspect ratio
+        :return: The table of the aspect ratio if there is one, otherwise the reference table mapped onto the window
+        """
+        if self._aspect_ratio in tables:
+            return tables[self._aspect_ratio]
+
+        key = id(tables)
+        if key not in self._tables:
+            self._tables[key] = self._map(tables[REFERENCE_ASPECT_RATIO])
+
+        return self._tables[key]
+
+    def dx(self, dx: float) -> float:
+        """Map a horizontal distance
+
+        :param dx: The distance in % of the reference window width
+        :return: The distance in % of the window width
+        """
+        return dx * REFERENCE_SIZE[0] * self.scale / self._width
+
+    def dy(self, dy: float) -> float:
+        """Map a vertical distance
+
+        :param dy: The distance in % of the reference window height
+        :return: The distance in % of the window height
+        """
+        return dy * REFERENCE_SIZE[1] * self.scale / self._height
+
+    def x(self, x: float, anchor: str | None = None) -> float:
+        """Map a horizontal position
+
+        :param x: The position in % of the reference window width
+        :param anchor: "left", "center" or "right", defaults to the third of the window the position is in
+        :return: The position in % of the window width
+        """
+        if anchor is None:
+            anchor = "left" if x < 1 / 3 else "right" if x > 2 / 3 else "center"
+
+        match anchor:
+            case "left":
+                return self.dx(x)
+            case "right":
+                return 1 - self.dx(1 - x)
+            case _:
+                return 0.5 + self.dx(x - 0.5)
+
+    def y(self, y: float) -> float:
+        """Map a vertical position
+
+        :param y: The position in % of the reference window height
+        :return: The position in % of the window height
+        """
+        return 0.5 + self.dy(y - 0.5)
+
+    def _map(self, value, key: str | None = None, anchor: str | None = None):
+        """Map a value of a layout table
+
+        :param value: The dict, list, point (x, y), region (x, y, w, h) or other value
+        :param key: The key of the value, defaults to None
+        :param anchor: The horizontal anchor of the value, defaults to None
+        :return: The mapped value
+        """
+        if isinstance(value, dict):
+            return {
+                k: v if k in _NESTED_KEYS else self._map(v, k, _ANCHORS.get(k, anchor))
+                for k, v in value.items()
+            }
+        if isinstance(value, list):
+            return [self._map(v, key, anchor) for v in value]
+
+        if key in _DISTANCE_KEYS:
+            if isinstance(value, tuple):
+                return tuple(
+                    self.dx(v) if axis == "x" else self.dy(v)
+                    for v, axis in zip(value, _DISTANCE_KEYS[key])
+                )
+            return self.dx(value) if _DISTANCE_KEYS[key] == "x" else self.dy(value)
+
+        if isinstance(value, tuple) and len(value) == 2:
+            return (self.x(value[0], anchor), self.y(value[1]))
+        if isinstance(value, tuple) and len(value) == 4:
+            # regions are anchored by their centre so they keep their size
+            x, y, w, h = value
+            w, h = self.dx(w), self.dy(h)
+            return (
+                self.x(value[0] + value[2] / 2, anchor) - w / 2,
+                self.y(value[1] + value[3] / 2) - h / 2,
+                w,
+                h,
+            )
+
+        return value
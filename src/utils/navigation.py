@@ -5,6 +5,10 @@ import pyautogui
 import time
 from PIL import Image
 from pynput import mouse, keyboard
+from utils.instrumentation import timed
+
+# mouse wheel ticks in one inventory page
+PAGE_SCROLL_TICKS = 25
 
 
 class Navigation:
@@ -47,6 +51,7 @@ class Navigation:
 
         return x, y
 
+    @timed("navigation.move_cursor")
     def move_cursor_to(self, x_percent: float, y_percent: float) -> None:
         """Move the cursor to the specified percentage coordinates
 
@@ -57,6 +62,7 @@ class Navigation:
 
         self._mouse.position = (x, y)
 
+    @timed("navigation.move_cursor_to_image")
     def move_cursor_to_image(self, haystack: Image, needle: Image) -> None:
         """Move the cursor to the center of the needle image in the haystack image
 
@@ -79,6 +85,7 @@ class Navigation:
 
         self.move_cursor_to(*pos)
 
+    @timed("navigation.key_press")
     def key_press(self, key: keyboard.Key) -> None:
         """Press a key
 
@@ -100,10 +107,12 @@ class Navigation:
         """
         self._keyboard.release(key)
 
+    @timed("navigation.click")
     def click(self) -> None:
         """Click the left mouse button"""
         self._mouse.click(mouse.Button.left)
 
+    @timed("navigation.drag_scroll")
     def drag_scroll(
         self, start_x: float, start_y: float, end_x: float, end_y: float
     ) -> None:
@@ -126,6 +135,7 @@ class Navigation:
         time.sleep(0.5)
         pyautogui.mouseUp()
 
+    @timed("navigation.scroll")
     def scroll_page_down(self, times_scrolled) -> None:
         """Scroll down one inventory page
 
@@ -133,13 +143,25 @@ class Navigation:
 
         :param times_scrolled: The number of times scrolled
         """
-        for _ in range(25):
+        for _ in range(PAGE_SCROLL_TICKS):
             self._mouse.scroll(0, -1)
             time.sleep(0.01)
 
         if times_scrolled != 0 and times_scrolled % 4 == 0:
             self._mouse.scroll(0, 1)
 
+    @timed("navigation.scroll")
+    def scroll_to_top(self, times_scrolled) -> None:
+        """Scroll back up to the first inventory page
+
+        :param times_scrolled: The number of pages scrolled down
+        """
+        # undo the page scrolls exactly, including the compensations of scroll_page_down
+        compensations = max(0, times_scrolled - 1) // 4
+        for _ in range(PAGE_SCROLL_TICKS * times_scrolled - compensations):
+            self._mouse.scroll(0, 1)
+            time.sleep(0.01)
+
     def print_mouse_position(self) -> None:
         """Print the current mouse position"""
         x_percent, y_percent = self.get_mouse_position()
@@ -159,6 +181,13 @@ class Navigation:
 
         return x_percent, y_percent
 
+    def get_window_size(self) -> tuple[int, int]:
+        """Get the size of the game window
+
+        :return: The width and height of the game window
+        """
+        return self._width, self._height
+
     def get_aspect_ratio(self) -> str:
         """Get the aspect ratio of the game window
 
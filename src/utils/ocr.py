@@ -1,19 +1,121 @@
 import cv2
 import numpy as np
 import pytesseract
+import threading
 from PIL import Image
+from utils.instrumentation import timed
 
 
-def preprocess_img(img: Image) -> Image:
+class _ColourFilter:
+    """_ColourFilter class for a compiled colour filter preprocessing pipeline
+
+    Keeps pixels within the variance of any of the colours, then converts to grayscale,
+    blurs, brightens and inverts. The colour bounds are compiled once into a per-channel
+    lookup table where bit i is set if the channel value is within the bounds of colour
+    i, so a pixel matches if the bitwise AND of its three entries is nonzero. The
+    brighten and invert steps are fused into a single tone lookup table.
+    """
+
+    # brighten (x2, saturated) and invert in one lookup
+    _TONE_LUT = (255 - np.minimum(np.arange(256) * 2, 255)).astype(np.uint8)
+
+    def __init__(self, colour: tuple | list[tuple], variance: int | list[int]) -> None:
+        """Constructor
+
+        :param colour: The colour or list of colours to keep
+        :param variance: The variance or list of variances to use for each colour
+        :raises ValueError: Thrown if the number of colours and variances differ or exceed 8
+        """
+        if isinstance(colour, tuple):
+            colour = [colour]
+        if isinstance(variance, int):
+            variance = [variance] * len(colour)
+
+        if len(colour) != len(variance):
+            raise ValueError(
+                f"Length of colour ({len(colour)}) and variance ({len(variance)}) must be the same"
+            )
+        if len(colour) > 8:
+            raise ValueError(f"At most 8 colours are supported, got {len(colour)}")
+
+        values = np.arange(256)
+        self._lut = np.zeros((256, 1, 3), dtype=np.uint8)
+        for i, (c, v) in enumerate(zip(colour, variance)):
+            for channel in range(3):
+                in_range = (values >= c[channel] - v) & (values <= c[channel] + v)
+                self._lut[in_range, 0, channel] |= 1 << i
+
+        self._buffers = threading.local()
+
+    @timed("ocr.preprocess")
+    def __call__(self, img: Image.Image | np.ndarray) -> np.ndarray:
+        """Preprocess an image
+
+        :param img: The RGB image to preprocess
+        :return: The preprocessed grayscale image
+        """
+        img_arr = np.asarray(img)[..., :3]
+        shape = img_arr.shape[:2]
+
+        # intermediate buffers are reused per thread while the crop size stays the same
+        buffers = self._buffers
+        if getattr(buffers, "shape", None) != shape:
+            buffers.shape = shape
+            buffers.bits = np.empty((*shape, 3), dtype=np.uint8)
+            buffers.mask = np.empty(shape, dtype=np.uint8)
+            buffers.gray = np.empty(shape, dtype=np.uint8)
+            buffers.blur = np.empty(shape, dtype=np.uint8)
+
+        # colour membership
+        cv2.LUT(img_arr, self._lut, dst=buffers.bits)
+        np.bitwise_and(buffers.bits[..., 0], buffers.bits[..., 1], out=buffers.mask)
+        np.bitwise_and(buffers.mask, buffers.bits[..., 2], out=buffers.mask)
+        cv2.compare(buffers.mask, 0, cv2.CMP_GT, dst=buffers.mask)
+
+        # grayscale of the kept pixels
+        cv2.cvtColor(img_arr, cv2.COLOR_RGB2GRAY, dst=buffers.gray)
+        cv2.bitwise_and(buffers.gray, buffers.mask, dst=buffers.gray)
+
+        # blur
+        cv2.GaussianBlur(buffers.gray, (3, 3), 1, dst=buffers.blur)
+
+        # brighten and invert
+        return cv2.LUT(buffers.blur, self._TONE_LUT)
+
+
+# compiled once per preprocess function
+_IMG_FILTER = _ColourFilter((255, 255, 255), 80)
+_CHAR_COUNT_IMG_FILTER = _ColourFilter([(218, 194, 145), (142, 135, 115)], 60)
+_LC_LEVEL_IMG_FILTER = _ColourFilter([(255, 255, 255), (239, 160, 61)], 80)
+_TRACE_IMG_FILTER = _ColourFilter(
+    [
+        (255, 255, 255),
+        (212, 214, 214),
+        (160, 166, 175),
+        (45, 240, 240),
+        (26, 145, 150),
+        (33, 180, 182),
+        (38, 212, 206),
+        (14, 77, 82),
+    ],
+    [50, 50, 20, 20, 30, 30, 15, 10],
+)
+_EQUIPPED_IMG_FILTER = _ColourFilter((202, 177, 134), 75)
+_MAIN_STAT_IMG_FILTER = _ColourFilter((226, 155, 61), 50)
+_SUB_STAT_IMG_FILTER = _ColourFilter((255, 255, 255), 100)
+_SUPERIMPOSITION_IMG_FILTER = _ColourFilter((220, 196, 145), 50)
+
+
+def preprocess_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-
-    return _preprocess_img_by_colour_filter(img, (255, 255, 255), 80)
+    return _IMG_FILTER(img)
 
 
+@timed("ocr.image_to_string")
 def image_to_string(
     img: Image,
     whitelist: str,
@@ -47,123 +149,253 @@ def image_to_string(
     return res.strip()
 
 
-def preprocess_char_count_img(img: Image) -> Image:
+@timed("ocr.image_to_data")
+def image_to_data(
+    img: Image.Image | np.ndarray,
+    whitelist: str,
+    psm: int,
+    preprocess_func=None,
+    remove_newline=True,
+) -> tuple[str, float]:
+    """Convert image to string in one pass, along with the confidence of the result
+
+    :param img: The image to convert
+    :param whitelist: The whitelist of characters to use
+    :param psm: The page segmentation mode to use
+    :param preprocess_func: The preprocessing function to use, defaults to None
+    :param remove_newline: The flag to replace newlines with spaces, defaults to True
+    :return: The string representation of the image and the lowest word confidence (0-100)
+    """
+    config = f'-c tessedit_char_whitelist="{whitelist}" --psm {psm} -l DIN-Alternate'
+
+    if preprocess_func:
+        img = preprocess_func(img)
+
+    data = pytesseract.image_to_data(
+        img, config=config, output_type=pytesseract.Output.DICT
+    )
+
+    # rebuild the lines from the words, skipping the layout rows that have no confidence
+    lines = {}
+    confs = []
+    for i, text in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not text.strip():
+            continue
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line, []).append(text.strip())
+        confs.append(conf)
+
+    res = "\n".join(" ".join(words) for words in lines.values())
+
+    if remove_newline:
+        res = res.replace("\n", " ")
+
+    return res.strip(), min(confs) if confs else 0.0
+
+
+@timed("ocr.image_to_words")
+def image_to_words(
+    img: Image.Image | np.ndarray,
+    whitelist: str,
+    psm: int,
+    preprocess_func=None,
+) -> list[tuple[str, float, int, int]]:
+    """Convert image to words along with their confidence and vertical position
+
+    :param img: The image to convert
+    :param whitelist: The whitelist of characters to use
+    :param psm: The page segmentation mode to use
+    :param preprocess_func: The preprocessing function to use, defaults to None
+    :return: The (text, confidence, top, height) of each word, in pixels of the image
+    """
+    config = f'-c tessedit_char_whitelist="{whitelist}" --psm {psm} -l DIN-Alternate'
+
+    if preprocess_func:
+        img = preprocess_func(img)
+
+    data = pytesseract.image_to_data(
+        img, config=config, output_type=pytesseract.Output.DICT
+    )
+
+    return [
+        (text.strip(), float(conf), top, height)
+        for text, conf, top, height in zip(
+            data["text"], data["conf"], data["top"], data["height"]
+        )
+        if float(conf) >= 0 and text.strip()
+    ]
+
+
+def warm_up() -> None:
+    """Warm up OCR so the first items of a scan are not the slowest
+
+    Runs every preprocessing pipeline and one recognition on a dummy image, which loads
+    the Tesseract executable and the DIN-Alternate traineddata from disk.
+    """
+    img = np.zeros((32, 96, 3), dtype=np.uint8)
+    cv2.putText(img, "80/80", (4, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255,) * 3, 2)
+
+    for colour_filter in (
+        _IMG_FILTER,
+        _CHAR_COUNT_IMG_FILTER,
+        _LC_LEVEL_IMG_FILTER,
+        _TRACE_IMG_FILTER,
+        _EQUIPPED_IMG_FILTER,
+        _MAIN_STAT_IMG_FILTER,
+        _SUB_STAT_IMG_FILTER,
+        _SUPERIMPOSITION_IMG_FILTER,
+    ):
+        colour_filter(img)
+
+    image_to_data(img, "0123456789/", 7, preprocess_img)
+
+
+class OcrPolicy:
+    """OcrPolicy class for learning which OCR pass works best for each field
+
+    Each field has a list of candidate (preprocessing function, PSM) passes. The pass that
+    has produced the most accepted results so far runs first, and the others only run when
+    its confidence is below the threshold or the validator rejects its result.
+    """
+
+    def __init__(self, threshold: float = 60) -> None:
+        """Constructor
+
+        :param threshold: The confidence (0-100) below which another pass is tried, defaults to 60
+        """
+        self._threshold = threshold
+        self._wins = {}
+        self._lock = threading.Lock()
+
+    def image_to_string(
+        self,
+        field: str,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        passes: list[tuple],
+        remove_newline=True,
+        validate=None,
+    ) -> str:
+        """Convert image to string using the passes of a field in order of past success
+
+        :param field: The name of the field
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use
+        :param passes: The (preprocessing function or None, PSM) passes to choose from
+        :param remove_newline: The flag to replace newlines with spaces, defaults to True
+        :param validate: The function to check a result with, defaults to None
+        :return: The string representation of the image
+        """
+        return self.image_to_data(
+            field, img, whitelist, passes, remove_newline, validate
+        )[0]
+
+    def image_to_data(
+        self,
+        field: str,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        passes: list[tuple],
+        remove_newline=True,
+        validate=None,
+    ) -> tuple[str, float]:
+        """Convert image to string using the passes of a field, along with the confidence
+
+        :param field: The name of the field
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use
+        :param passes: The (preprocessing function or None, PSM) passes to choose from
+        :param remove_newline: The flag to replace newlines with spaces, defaults to True
+        :param validate: The function to check a result with, defaults to None
+        :return: The best string representation of the image and its confidence (0-100), which is 0 if it is invalid
+        """
+        with self._lock:
+            wins = self._wins.setdefault(field, [0] * len(passes))
+            order = sorted(range(len(passes)), key=lambda i: -wins[i])
+
+        best, best_score, best_i = "", (False, 0.0), None
+        for i in order:
+            preprocess_func, psm = passes[i]
+            res, conf = image_to_data(
+                img, whitelist, psm, preprocess_func, remove_newline
+            )
+            if not res:
+                continue
+
+            # valid results always rank above invalid ones
+            score = (not validate or validate(res), conf)
+            if not best or score > best_score:
+                best, best_score, best_i = res, score, i
+            if best_score[0] and best_score[1] >= self._threshold:
+                break
+
+        # empty and rejected results do not count, so failures never reinforce a pass
+        if best and best_score[0]:
+            with self._lock:
+                wins[best_i] += 1
+
+        return best, best_score[1] if best_score[0] else 0.0
+
+
+def preprocess_char_count_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess character count image in the Data Bank screen
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    return _preprocess_img_by_colour_filter(img, [(218, 194, 145), (142, 135, 115)], 60)
+    return _CHAR_COUNT_IMG_FILTER(img)
 
 
-def preprocess_lc_level_img(img: Image) -> Image:
+def preprocess_lc_level_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess light cone level image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    return _preprocess_img_by_colour_filter(img, [(255, 255, 255), (239, 160, 61)], 80)
+    return _LC_LEVEL_IMG_FILTER(img)
 
 
-def preprocess_trace_img(img: Image) -> Image:
+def preprocess_trace_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess trace image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    img = _preprocess_img_by_colour_filter(
-        img,
-        [
-            (255, 255, 255),
-            (212, 214, 214),
-            (160, 166, 175),
-            (45, 240, 240),
-            (26, 145, 150),
-            (33, 180, 182),
-            (38, 212, 206),
-            (14, 77, 82),
-        ],
-        [50, 50, 20, 20, 30, 30, 15, 10],
-    )
-    return img
+    return _TRACE_IMG_FILTER(img)
 
 
-def preprocess_equipped_img(img: Image) -> Image:
+def preprocess_equipped_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess equipped image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    return _preprocess_img_by_colour_filter(img, (202, 177, 134), 75)
+    return _EQUIPPED_IMG_FILTER(img)
 
 
-def preprocess_main_stat_img(img: Image) -> Image:
+def preprocess_main_stat_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess main stat image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    return _preprocess_img_by_colour_filter(img, (226, 155, 61), 50)
+    return _MAIN_STAT_IMG_FILTER(img)
 
 
-def preprocess_sub_stat_img(img: Image) -> Image:
+def preprocess_sub_stat_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess sub stat image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    img = _preprocess_img_by_colour_filter(img, (255, 255, 255), 100)
-    return img
+    return _SUB_STAT_IMG_FILTER(img)
 
 
-def preprocess_superimposition_img(img: Image) -> Image:
+def preprocess_superimposition_img(img: Image.Image | np.ndarray) -> np.ndarray:
     """Preprocess superimposition image
 
     :param img: The image to preprocess
     :return: The preprocessed image
     """
-    img = _preprocess_img_by_colour_filter(img, (220, 196, 145), 50)
-    return img
-
-
-def _preprocess_img_by_colour_filter(
-    img: Image, colour: tuple | list[tuple], variance: int | list[int]
-) -> Image:
-    """Preprocess image by filtering out colours that are not within the variance of the colour
-
-    :param img: The image to preprocess
-    :param colour: The colour or list of colours to filter
-    :param variance: The variance or list of variances to use for each colour
-    :return: The preprocessed image
-    """
-    if isinstance(colour, tuple):
-        colour = [colour]
-    if isinstance(variance, int):
-        variance = [variance] * len(colour)
-
-    if len(colour) != len(variance):
-        raise ValueError(
-            f"Length of colour ({len(colour)}) and variance ({len(variance)}) must be the same"
-        )
-
-    img_arr = np.array(img)
-
-    mask = np.zeros(img_arr.shape[:2], dtype="uint8")
-    for c, v in zip(colour, variance):
-        lower = np.array([max(0, c - v) for c in c], dtype="uint8")
-        upper = np.array([min(255, c + v) for c in c], dtype="uint8")
-        mask = cv2.bitwise_or(mask, cv2.inRange(img_arr, lower, upper))
-
-    img_arr = cv2.bitwise_and(img_arr, img_arr, mask=mask)
-    img_arr = cv2.cvtColor(img_arr, cv2.COLOR_RGB2GRAY)
-
-    # blur
-    img_arr = cv2.GaussianBlur(img_arr, (3, 3), 1)
-
-    # brighten image
-    img_arr = cv2.convertScaleAbs(img_arr, alpha=2, beta=0)
-
-    # invert
-    img_arr = 255 - img_arr
-
-    return Image.fromarray(img_arr)
+    return _SUPERIMPOSITION_IMG_FILTER(img)
@@ -0,0 +1,110 @@
+import collections
+import os
+import sys
+import threading
+
+
+class SamplingProfiler:
+    """SamplingProfiler class for statistically profiling threads of the scanner
+
+    A background thread samples the stacks of the profiled threads from
+    sys._current_frames at a fixed interval, so the profiled code runs unmodified and
+    the overhead does not depend on how many calls it makes. Stacks are counted in the
+    collapsed format used by flame graph tools, one "role;frame;...;frame count" line
+    per unique stack, with the outermost frame first.
+    """
+
+    def __init__(self, interval: float = 0.01) -> None:
+        """Constructor
+
+        :param interval: The time between samples in seconds, defaults to 0.01
+        """
+        self._interval = interval
+        self._threads = {}
+        self._prefixes = {}
+        self._stacks = collections.Counter()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self.samples = 0
+
+    def add_thread(self, ident: int, role: str) -> None:
+        """Profile a thread
+
+        :param ident: The identifier of the thread
+        :param role: The name to group the samples of the thread under
+        """
+        self._threads[ident] = role
+
+    def add_threads(self, name_prefix: str, role: str) -> None:
+        """Profile every thread whose name starts with a prefix, including future ones
+
+        :param name_prefix: The thread name prefix
+        :param role: The name to group the samples of the threads under
+        """
+        self._prefixes[name_prefix] = role
+
+    def start(self) -> None:
+        """Start sampling"""
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="SamplingProfiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def save(self, path: str) -> None:
+        """Save the samples as collapsed stacks
+
+        :param path: The path of the file
+        """
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(path, "w", encoding="utf-8") as profile_file:
+            for stack, count in self._stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+
+    def _run(self) -> None:
+        """Sample the profiled threads until stopped"""
+        while not self._stop_event.wait(self._interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        """Count the current stack of each profiled thread"""
+        roles = self._get_roles()
+        for ident, frame in sys._current_frames().items():
+            role = roles.get(ident)
+            if role is None:
+                continue
+
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                )
+                frame = frame.f_back
+            frames.append(role)
+
+            self._stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def _get_roles(self) -> dict[int, str]:
+        """Get the role of each profiled thread that is alive
+
+        :return: The roles by thread identifier
+        """
+        roles = dict(self._threads)
+        for thread in threading.enumerate():
+            for prefix, role in self._prefixes.items():
+                if thread.name.startswith(prefix):
+                    roles[thread.ident] = role
+
+        return roles
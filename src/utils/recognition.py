@@ -0,0 +1,605 @@
+import cv2
+import numpy as np
+import threading
+from PIL import Image
+from utils.ocr import OcrPolicy, image_to_data, preprocess_img
+
+GLYPH_SIZE = 16
+
+
+def segment_glyphs(img: Image.Image | np.ndarray) -> list[np.ndarray]:
+    """Segment a preprocessed single line image into normalized glyphs
+
+    :param img: The preprocessed image with dark text on a light background
+    :return: The glyphs from left to right, each a GLYPH_SIZE x GLYPH_SIZE float array
+    """
+    img_arr = np.asarray(img)
+    if img_arr.ndim == 3:
+        img_arr = cv2.cvtColor(img_arr[..., :3], cv2.COLOR_RGB2GRAY)
+
+    binary = (img_arr < 128).astype(np.uint8)
+    count, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+
+    # skip the background and specks of noise
+    min_area = max(2, binary.shape[0] // 10)
+    boxes = sorted(
+        [list(stats[i, :4]) for i in range(1, count) if stats[i, 4] >= min_area],
+        key=lambda box: box[0],
+    )
+    if not boxes:
+        return []
+
+    # merge components that overlap horizontally, e.g. the parts of a %
+    merged = [boxes[0]]
+    for x, y, w, h in boxes[1:]:
+        px, py, pw, ph = merged[-1]
+        if x < px + pw - 1:
+            upper = min(py, y)
+            merged[-1] = [
+                px,
+                upper,
+                max(px + pw, x + w) - px,
+                max(py + ph, y + h) - upper,
+            ]
+        else:
+            merged.append([x, y, w, h])
+
+    # pad every glyph to a square so the aspect ratio is kept, e.g. "1" against "0"
+    glyphs = []
+    for x, y, w, h in merged:
+        size = max(w, h)
+        square = np.zeros((size, size), dtype=np.float32)
+        left, upper = (size - w) // 2, (size - h) // 2
+        square[upper : upper + h, left : left + w] = binary[y : y + h, x : x + w]
+        glyphs.append(
+            cv2.resize(square, (GLYPH_SIZE, GLYPH_SIZE), interpolation=cv2.INTER_AREA)
+        )
+
+    return glyphs
+
+
+def segment_lines(img: Image.Image | np.ndarray) -> list[tuple[int, int]]:
+    """Find the lines of text in a preprocessed image by horizontal projection
+
+    :param img: The preprocessed image with dark text on a light background
+    :return: The (top, bottom) rows of each line from top to bottom
+    """
+    img_arr = np.asarray(img)
+    if img_arr.ndim == 3:
+        img_arr = cv2.cvtColor(img_arr[..., :3], cv2.COLOR_RGB2GRAY)
+
+    # a row is part of a line if it has any ink
+    profile = (img_arr < 128).sum(axis=1)
+    is_ink = np.concatenate(([False], profile > 0, [False]))
+    edges = np.flatnonzero(np.diff(is_ink.astype(np.int8)))
+
+    # skip bands of noise that are too short to be text
+    min_height = max(2, img_arr.shape[0] // 40)
+    return [
+        (int(top), int(bottom))
+        for top, bottom in zip(edges[::2], edges[1::2])
+        if bottom - top >= min_height
+    ]
+
+
+def image_to_lines(
+    cells: list[np.ndarray], whitelist: str
+) -> tuple[list[str], float] | None:
+    """Convert preprocessed single line cells to strings in one Tesseract pass
+
+    :param cells: The preprocessed cells with dark text on a light background, all the same width
+    :param whitelist: The whitelist of characters to use
+    :return: The string of each cell and the lowest word confidence, or None if the lines could not be told apart
+    """
+    if not cells:
+        return [], 100.0
+
+    # stack the cells with a blank gap so each one is read as its own line
+    gap = np.full(
+        (max(cell.shape[0] for cell in cells) // 2, cells[0].shape[1]),
+        255,
+        dtype=np.uint8,
+    )
+    batch = np.vstack([part for cell in cells for part in (cell, gap)])
+
+    res, conf = image_to_data(batch, whitelist, 6, None, False)
+    lines = [line.strip() for line in res.split("\n") if line.strip()]
+    if len(lines) != len(cells):
+        return None
+
+    return lines, conf
+
+
+class GlyphRecognizer:
+    """GlyphRecognizer class for reading numeric fields by template matching
+
+    The game renders numbers in one font with a tiny alphabet, so every glyph can be
+    classified by its nearest template. There is no font to render templates from, so
+    templates are learned per field from Tesseract results with high confidence, and
+    Tesseract remains the fallback whenever a glyph has no close template or the result
+    is rejected by the validator. A glyph only becomes a template once several confident
+    results have read it as the same character, so a single misread is never learned.
+    A glyph is also left to Tesseract when it is nearly as close to another character,
+    or while a character of the whitelist has no template and the glyph is not a close
+    match, since it would otherwise be read as the nearest character that does.
+    """
+
+    # the number of candidates waiting for agreement to keep per field
+    MAX_CANDIDATES = 64
+
+    def __init__(
+        self,
+        max_dist: float = 0.1,
+        min_margin: float = 0.04,
+        min_conf: float = 85,
+        max_templates: int = 8,
+        min_samples: int = 3,
+    ) -> None:
+        """Constructor
+
+        :param max_dist: The largest mean pixel difference to a template to accept a glyph, defaults to 0.1
+        :param min_margin: The smallest difference between the distances to the nearest and the next nearest character to accept a glyph, defaults to 0.04
+        :param min_conf: The Tesseract confidence (0-100) needed to learn from a result, defaults to 85
+        :param max_templates: The number of templates to keep per character, defaults to 8
+        :param min_samples: The number of results that must agree on a glyph to learn it, defaults to 3
+        """
+        self._max_dist = max_dist
+        self._min_margin = min_margin
+        self._min_conf = min_conf
+        self._max_templates = max_templates
+        self._min_samples = min_samples
+        self._templates = {}
+        self._candidates = {}
+        self._ocr_policy = OcrPolicy()
+        self._lock = threading.Lock()
+
+    def image_to_string(
+        self,
+        field: str,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        psm: int | list[int],
+        preprocess_func=preprocess_img,
+        validate=None,
+    ) -> str:
+        """Convert a single line image to string, falling back to Tesseract
+
+        :param field: The name of the field
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use
+        :param psm: The page segmentation mode or modes to use for Tesseract
+        :param preprocess_func: The preprocessing function to use, defaults to preprocess_img
+        :param validate: The function to check a result with, defaults to None
+        :return: The string representation of the image
+        """
+        return self.image_to_data(
+            field, img, whitelist, psm, preprocess_func, validate
+        )[0]
+
+    def image_to_data(
+        self,
+        field: str,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        psm: int | list[int],
+        preprocess_func=preprocess_img,
+        validate=None,
+    ) -> tuple[str, float]:
+        """Convert a single line image to string, along with the confidence
+
+        :param field: The name of the field
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use
+        :param psm: The page segmentation mode or modes to use for Tesseract
+        :param preprocess_func: The preprocessing function to use, defaults to preprocess_img
+        :param validate: The function to check a result with, defaults to None
+        :return: The string representation of the image and its confidence (0-100)
+        """
+        processed = preprocess_func(img)
+        glyphs = segment_glyphs(processed)
+
+        read = self.read(field, glyphs, whitelist)
+        if read is not None and (not validate or validate(read[0])):
+            return read
+
+        psms = psm if isinstance(psm, list) else [psm]
+        res, conf = self._ocr_policy.image_to_data(
+            field,
+            processed,
+            whitelist,
+            [(None, psm) for psm in psms],
+            validate=validate,
+        )
+        if conf >= self._min_conf:
+            self.learn(field, glyphs, res)
+
+        return res, conf
+
+    def read_cells(
+        self, field: str, cells: list[np.ndarray], whitelist: str
+    ) -> list[tuple[str, float]]:
+        """Convert preprocessed single line cells to strings, reading the unknown ones in one batch
+
+        :param field: The name of the field
+        :param cells: The preprocessed cells, all the same width
+        :param whitelist: The whitelist of characters to use for Tesseract
+        :return: The string and confidence (0-100) of each cell
+        """
+        glyphs = [segment_glyphs(cell) for cell in cells]
+        res = [self.read(field, g, whitelist) for g in glyphs]
+
+        unknown = [i for i, r in enumerate(res) if r is None]
+        batch = image_to_lines([cells[i] for i in unknown], whitelist)
+        if batch:
+            lines, conf = batch
+            for i, line in zip(unknown, lines):
+                res[i] = line, conf
+                if conf >= self._min_conf:
+                    self.learn(field, glyphs[i], line)
+        else:
+            for i in unknown:
+                res[i] = self._ocr_policy.image_to_data(
+                    field, cells[i], whitelist, [(None, 7)]
+                )
+
+        return res
+
+    def read(
+        self, field: str, glyphs: list[np.ndarray], whitelist: str = ""
+    ) -> tuple[str, float] | None:
+        """Classify glyphs by their nearest templates
+
+        :param field: The name of the field
+        :param glyphs: The glyphs from segment_glyphs
+        :param whitelist: The characters the field can contain, defaults to ""
+        :return: The string and its confidence (0-100), or None if any glyph is not a clear match
+        """
+        with self._lock:
+            templates = self._templates.get(field)
+            if not templates or not glyphs:
+                return None
+            chars = np.array([c for c, t in templates.items() for _ in t])
+            stack = np.stack([t for c in templates for t in templates[c]])
+            is_learned = all(c in templates for c in "".join(whitelist.split()))
+
+        # a glyph of an unlearned character can still be nearest to a learned one, so
+        # only glyphs as close as the learned variations of a character are accepted
+        max_dist = self._max_dist if is_learned else self._max_dist / 2
+
+        res = ""
+        worst = 0.0
+        for glyph in glyphs:
+            dists = np.abs(stack - glyph).mean(axis=(1, 2))
+            i = int(np.argmin(dists))
+            if dists[i] > max_dist:
+                return None
+            rivals = dists[chars != chars[i]]
+            if rivals.size and rivals.min() - dists[i] < self._min_margin:
+                return None
+            res += chars[i]
+            worst = max(worst, float(dists[i]))
+
+        return res, 100 * (1 - worst)
+
+    def learn(self, field: str, glyphs: list[np.ndarray], text: str) -> bool:
+        """Learn templates from glyphs and the text they were read as
+
+        Each glyph is held as a candidate until enough results agree on its character.
+        A candidate read as a different character is dropped.
+
+        :param field: The name of the field
+        :param glyphs: The glyphs from segment_glyphs
+        :param text: The text of the glyphs
+        :return: True if the glyphs lined up with the text, False otherwise
+        """
+        text = "".join(text.split())
+        if not text or len(text) != len(glyphs):
+            return False
+
+        with self._lock:
+            templates = self._templates.setdefault(field, {})
+            candidates = self._candidates.setdefault(field, [])
+            for c, glyph in zip(text, glyphs):
+                if any(
+                    np.abs(t - glyph).mean() < self._max_dist / 2
+                    for t in templates.get(c, [])
+                ):
+                    continue
+
+                candidate = next(
+                    (
+                        candidate
+                        for candidate in candidates
+                        if np.abs(candidate[1] - glyph).mean() < self._max_dist / 2
+                    ),
+                    None,
+                )
+                if candidate is None:
+                    candidates.append([c, glyph, 1])
+                    if len(candidates) > self.MAX_CANDIDATES:
+                        candidates.pop(0)
+                    continue
+                if candidate[0] != c:
+                    # the same glyph was read as two characters
+                    candidates.remove(candidate)
+                    continue
+
+                candidate[2] += 1
+                if candidate[2] < self._min_samples:
+                    continue
+                candidates.remove(candidate)
+                char_templates = templates.setdefault(c, [])
+                char_templates.append(candidate[1])
+                if len(char_templates) > self._max_templates:
+                    char_templates.pop(0)
+
+        return True
+
+
+class LineClassifier:
+    """LineClassifier class for reading lines of text that come from a fixed set
+
+    Every line is compared against learned templates of each class, so a line is
+    read as the class itself rather than as free-form text that has to be corrected.
+    Templates are learned from Tesseract results that exactly match a class, and
+    Tesseract remains the fallback whenever a line has no close template. A line is also
+    left to Tesseract while any class of a similar length has no template yet, since it
+    would otherwise be read as the nearest class that does.
+    """
+
+    TEMPLATE_SIZE = (96, 16)
+
+    def __init__(
+        self, classes: set[str], min_score: float = 0.9, max_templates: int = 4
+    ) -> None:
+        """Constructor
+
+        :param classes: The set of possible lines
+        :param min_score: The lowest similarity (0-1) to a template to accept a line, defaults to 0.9
+        :param max_templates: The number of templates to keep per class, defaults to 4
+        """
+        self._classes = classes
+        self._min_score = min_score
+        self._max_templates = max_templates
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def image_to_string(
+        self,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        psm: int,
+        preprocess_func=preprocess_img,
+        remove_newline=True,
+    ) -> str:
+        """Convert image to string by classifying each line, falling back to Tesseract
+
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use for Tesseract
+        :param psm: The page segmentation mode to use for Tesseract
+        :param preprocess_func: The preprocessing function to use, defaults to preprocess_img
+        :param remove_newline: The flag to replace newlines with spaces, defaults to True
+        :return: The string representation of the image
+        """
+        return self.image_to_data(img, whitelist, psm, preprocess_func, remove_newline)[
+            0
+        ]
+
+    def image_to_data(
+        self,
+        img: Image.Image | np.ndarray,
+        whitelist: str,
+        psm: int,
+        preprocess_func=preprocess_img,
+        remove_newline=True,
+    ) -> tuple[str, float]:
+        """Convert image to string by classifying each line, along with the confidence
+
+        :param img: The image to convert
+        :param whitelist: The whitelist of characters to use for Tesseract
+        :param psm: The page segmentation mode to use for Tesseract
+        :param preprocess_func: The preprocessing function to use, defaults to preprocess_img
+        :param remove_newline: The flag to replace newlines with spaces, defaults to True
+        :return: The string representation of the image and its confidence (0-100)
+        """
+        processed = preprocess_func(img)
+        lines = [processed[top:bottom] for top, bottom in segment_lines(processed)]
+
+        classified = [self.classify(line) for line in lines]
+        if classified and None not in [label for label, _ in classified]:
+            return (" " if remove_newline else "\n").join(
+                label for label, _ in classified
+            ), 100 * min(score for _, score in classified)
+
+        res, conf = image_to_data(processed, whitelist, psm, None, False)
+
+        # learn from the lines that Tesseract read exactly, if the lines line up
+        ocr_lines = [line.strip() for line in res.split("\n") if line.strip()]
+        if len(ocr_lines) == len(lines):
+            for line, text in zip(lines, ocr_lines):
+                if text in self._classes:
+                    self.learn(line, text)
+
+        return res.replace("\n", " ").strip() if remove_newline else res, conf
+
+    def read_cells(
+        self, cells: list[np.ndarray], whitelist: str
+    ) -> list[tuple[str, float]]:
+        """Classify preprocessed single line cells, reading the unknown ones in one batch
+
+        :param cells: The preprocessed cells, all the same width
+        :param whitelist: The whitelist of characters to use for Tesseract
+        :return: The class or Tesseract string of each cell and its confidence (0-100)
+        """
+        res = []
+        for cell in cells:
+            label, score = self.classify(cell)
+            res.append(None if label is None else (label, 100 * score))
+
+        unknown = [i for i, r in enumerate(res) if r is None]
+        batch = image_to_lines([cells[i] for i in unknown], whitelist)
+        if batch:
+            lines, conf = batch
+            for i, line in zip(unknown, lines):
+                res[i] = line, conf
+                if line in self._classes:
+                    self.learn(cells[i], line)
+        else:
+            for i in unknown:
+                res[i] = image_to_data(cells[i], whitelist, 7)
+
+        return res
+
+    def classify(self, line: np.ndarray) -> tuple[str | None, float]:
+        """Classify a line by its most similar template
+
+        :param line: The preprocessed line image
+        :return: The class and its similarity (0-1), with the class None if no template is close enough
+        """
+        feature = self._get_feature(line)
+        if feature is None:
+            return None, 0.0
+        aspect, template = feature
+
+        best, best_score = None, 0.0
+        with self._lock:
+            for label, templates in self._templates.items():
+                for t_aspect, t in templates:
+                    # lines of very different lengths are never the same class
+                    if abs(aspect - t_aspect) > 0.15 * t_aspect:
+                        continue
+                    score = 1 - float(np.abs(t - template).mean())
+                    if score > best_score:
+                        best, best_score = label, score
+
+        if best_score < self._min_score or self._has_unlearned_rival(aspect):
+            return None, best_score
+
+        return best, best_score
+
+    def learn(self, line: np.ndarray, label: str) -> None:
+        """Learn a template for a class
+
+        :param line: The preprocessed line image
+        :param label: The class of the line
+        """
+        feature = self._get_feature(line)
+        if feature is None:
+            return
+
+        with self._lock:
+            templates = self._templates.setdefault(label, [])
+            templates.append(feature)
+            if len(templates) > self._max_templates:
+                templates.pop(0)
+
+    def _has_unlearned_rival(self, aspect: float) -> bool:
+        """Check if a class without templates could have the aspect ratio of a line
+
+        The aspect ratio of a class without templates is estimated from its length and
+        the aspect ratio per character of the learned classes.
+
+        :param aspect: The aspect ratio of the line
+        :return: True if a class of a similar length has no template, False otherwise
+        """
+        with self._lock:
+            per_char = [
+                t_aspect / len(label)
+                for label, templates in self._templates.items()
+                for t_aspect, _ in templates
+            ]
+            unlearned = self._classes - self._templates.keys()
+        if not unlearned:
+            return False
+
+        # widths vary per character, so the estimate gets twice the usual tolerance
+        per_char = float(np.median(per_char))
+        return any(
+            abs(aspect - per_char * len(label)) <= 0.3 * per_char * len(label)
+            for label in unlearned
+        )
+
+    def _get_feature(self, line: np.ndarray) -> tuple[float, np.ndarray] | None:
+        """Get the aspect ratio and normalized image of the ink of a line
+
+        :param line: The preprocessed line image
+        :return: The aspect ratio and the normalized image, or None if the line is empty
+        """
+        line = np.asarray(line)
+        if line.ndim == 3:
+            line = cv2.cvtColor(line[..., :3], cv2.COLOR_RGB2GRAY)
+
+        ink = line < 128
+        cols = np.flatnonzero(ink.any(axis=0))
+        rows = np.flatnonzero(ink.any(axis=1))
+        if not len(cols) or not len(rows):
+            return None
+
+        ink = ink[rows[0] : rows[-1] + 1, cols[0] : cols[-1] + 1].astype(np.float32)
+        template = cv2.resize(ink, self.TEMPLATE_SIZE, interpolation=cv2.INTER_AREA)
+
+        return ink.shape[1] / ink.shape[0], template
+
+
+class NameImageCache:
+    """NameImageCache class for resolving names from images of names seen before
+
+    Each name image is reduced to a small grayscale descriptor. Once a name has been
+    read and matched, later images with a close descriptor resolve to the same name
+    without OCR or fuzzy matching.
+    """
+
+    DESCRIPTOR_SIZE = (96, 12)
+
+    def __init__(self, max_dist: float = 0.05) -> None:
+        """Constructor
+
+        :param max_dist: The largest difference (0-1) between descriptors of the same name, defaults to 0.05
+        """
+        self._max_dist = max_dist
+        self._names = []
+        self._descriptors = np.empty((0, *self.DESCRIPTOR_SIZE[::-1]), np.float32)
+        self._lock = threading.Lock()
+
+    def get(self, img: Image.Image | np.ndarray) -> str | None:
+        """Get the name of an image from the cache
+
+        :param img: The name image
+        :return: The name, or None if no cached image is close enough
+        """
+        descriptor = self._get_descriptor(img)
+
+        with self._lock:
+            if not self._names:
+                return None
+            # compare column by column so a single different letter is not averaged away
+            dists = np.abs(self._descriptors - descriptor).mean(axis=1).max(axis=1)
+            i = int(np.argmin(dists))
+            return self._names[i] if dists[i] <= self._max_dist else None
+
+    def add(self, img: Image.Image | np.ndarray, name: str) -> None:
+        """Add the name of an image to the cache
+
+        :param img: The name image
+        :param name: The name
+        """
+        descriptor = self._get_descriptor(img)
+
+        with self._lock:
+            self._names.append(name)
+            self._descriptors = np.concatenate((self._descriptors, descriptor[None]))
+
+    def _get_descriptor(self, img: Image.Image | np.ndarray) -> np.ndarray:
+        """Get the descriptor of a name image
+
+        :param img: The name image
+        :return: The downsampled grayscale image scaled to 0-1
+        """
+        img_arr = np.asarray(img)
+        if img_arr.ndim == 3:
+            img_arr = cv2.cvtColor(img_arr[..., :3], cv2.COLOR_RGB2GRAY)
+
+        return (
+            cv2.resize(img_arr, self.DESCRIPTOR_SIZE, interpolation=cv2.INTER_AREA)
+            / 255
+        ).astype(np.float32)
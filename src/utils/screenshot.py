@@ -4,38 +4,45 @@ import win32gui
 from PIL import Image, ImageGrab
 from config.screenshot import SCREENSHOT_COORDS
 from enums.increment_type import IncrementType
+from models.captured_item import CapturedItem
+from utils.layout import Layout
+from utils.instrumentation import timed
 
 
 class Screenshot:
     """Screenshot class for taking screenshots of the game window"""
 
-    def __init__(self, hwnd: int, aspect_ratio: str = "16:9") -> None:
+    def __init__(self, hwnd: int, layout: Layout) -> None:
         """Constructor
 
         :param hwnd: The window handle of the game window
-        :param aspect_ratio: The aspect ratio of the game window, defaults to "16:9"
+        :param layout: The layout of the game window
         """
-        self._aspect_ratio = aspect_ratio
+        self._layout = layout
 
         self._window_width, self._window_height = win32gui.GetClientRect(hwnd)[2:]
         self._window_x, self._window_y = win32gui.ClientToScreen(hwnd, (0, 0))
 
-        self._x_scaling_factor = self._window_width / 1920
-        self._y_scaling_factor = self._window_height / 1080
+    @property
+    def _coords(self) -> dict:
+        """The screenshot coordinates for the layout of the game window"""
+        return self._layout.get_table(SCREENSHOT_COORDS)
 
     def screenshot_screen(self) -> Image:
-        """Takes a screenshot of the entire screen
+        """Takes a screenshot of the entire screen at the native resolution
+
+        Everything read from it is located in % of the window, so it is not resized.
 
         :return: The screenshot
         """
-        return self._take_screenshot(0, 0, 1, 1)
+        return self._take_screenshot(0, 0, 1, 1, native=True)
 
-    def screenshot_stats(self, scan_type: IncrementType) -> dict:
+    def screenshot_stats(self, scan_type: IncrementType) -> CapturedItem:
         """Takes a screenshot of the stats
 
         :param scan_type: The scan type
         :raises ValueError: Thrown if the scan type is invalid
-        :return: A dict of the stats with the key being the stat name and the value being the screenshot
+        :return: The item holding the screenshot of each stat
         """
         match IncrementType(scan_type):
             case IncrementType.LIGHT_CONE_ADD:
@@ -54,13 +61,16 @@ class Screenshot:
         """
         match IncrementType(scan_type):
             case IncrementType.LIGHT_CONE_ADD:
-                return self._take_screenshot(
-                    *SCREENSHOT_COORDS[self._aspect_ratio]["sort"]
-                )
+                return self._take_screenshot(*self._coords["sort"])
             case IncrementType.RELIC_ADD:
                 # need to adjust coordinates for relic sort button because it's not in the same place as the light cone sort button
-                coords = SCREENSHOT_COORDS[self._aspect_ratio]["sort"]
-                coords = (coords[0] + 0.035, coords[1], coords[2], coords[3])
+                coords = self._coords["sort"]
+                coords = (
+                    coords[0] + self._layout.dx(0.035),
+                    coords[1],
+                    coords[2],
+                    coords[3],
+                )
 
                 return self._take_screenshot(*coords)
             case _:
@@ -71,33 +81,39 @@ class Screenshot:
 
         :return: The screenshot
         """
-        return self._take_screenshot(*SCREENSHOT_COORDS[self._aspect_ratio]["quantity"])
+        return self._take_screenshot(*self._coords["quantity"])
 
     def screenshot_character_count(self) -> Image:
         """Takes a screenshot of the character count
 
         :return: The screenshot
         """
-        return self._take_screenshot(
-            *SCREENSHOT_COORDS[self._aspect_ratio]["character"]["count"]
-        )
+        return self._take_screenshot(*self._coords["character"]["count"])
 
     def screenshot_character_name(self) -> Image:
         """Takes a screenshot of the character name
 
         :return: The screenshot
         """
-        return self._take_screenshot(
-            *SCREENSHOT_COORDS[self._aspect_ratio]["character"]["name"]
-        )
+        return self._take_screenshot(*self._coords["character"]["name"])
 
     def screenshot_character_level(self) -> Image:
         """Takes a screenshot of the character level
 
         :return: The screenshot
         """
-        return self._take_screenshot(
-            *SCREENSHOT_COORDS[self._aspect_ratio]["character"]["level"]
+        return self._take_screenshot(*self._coords["character"]["level"])
+
+    def screenshot_character_settle(self, tab: str) -> np.ndarray:
+        """Takes a screenshot of the region of a character tab that changes when the ui updates
+
+        :param tab: The character tab
+        :return: The screenshot
+        """
+        # only compared against other captures of the region, so it is not resized
+        return self._grab(
+            *self._coords["character"]["settle"][tab],
+            native=True,
         )
 
     def screenshot_character(self) -> Image:
@@ -105,9 +121,7 @@ class Screenshot:
 
         :return: The screenshot
         """
-        return self._take_screenshot(
-            *SCREENSHOT_COORDS[self._aspect_ratio]["character"]["chest"]
-        )
+        return self._take_screenshot(*self._coords["character"]["chest"])
 
     def screenshot_character_eidolons(self) -> list[np.ndarray]:
         """Takes a screenshot of the character eidolons
@@ -125,11 +139,11 @@ class Screenshot:
         mask = np.zeros((dim, dim), dtype="uint8")
         cv2.circle(mask, (int(dim / 2), int(dim / 2)), int(dim / 2), 255, -1)
 
-        for c in SCREENSHOT_COORDS[self._aspect_ratio]["character"]["eidolons"]:
+        for c in self._coords["character"]["eidolons"]:
             left = self._window_x + int(self._window_width * c[0])
             upper = self._window_y + int(self._window_height * c[1])
-            right = left + self._window_width * 0.042
-            lower = upper + self._window_height * 0.075
+            right = left + self._window_width * self._layout.dx(0.042)
+            lower = upper + self._window_height * self._layout.dy(0.075)
             img = screenshot.crop((left - x0, upper - y0, right - x0, lower - y0))
 
             # Apply circle mask
@@ -150,7 +164,7 @@ class Screenshot:
         return self._screenshot_traces(key)
 
     def _take_screenshot(
-        self, x: float, y: float, width: float, height: float
+        self, x: float, y: float, width: float, height: float, native: bool = False
     ) -> Image:
         """Takes a screenshot of the game window
 
@@ -158,7 +172,23 @@ class Screenshot:
         :param y: The y coordinate of the top left corner of the screenshot
         :param width: The width of the screenshot
         :param height: The height of the screenshot
-        :return: The screenshot normalized to 1920x1080
+        :param native: The flag to keep the resolution of the window, defaults to False
+        :return: The screenshot normalized to 1920x1080, unless native
+        """
+        return Image.fromarray(self._grab(x, y, width, height, native))
+
+    @timed("screenshot")
+    def _grab(
+        self, x: float, y: float, width: float, height: float, native: bool = False
+    ) -> np.ndarray:
+        """Grabs a region of the game window as an array
+
+        :param x: The x coordinate of the top left corner of the region
+        :param y: The y coordinate of the top left corner of the region
+        :param width: The width of the region
+        :param height: The height of the region
+        :param native: The flag to keep the resolution of the window, defaults to False
+        :return: The RGB region normalized to the 1920x1080 UI scale, unless native
         """
         # adjust coordinates to window
         x = self._window_x + int(self._window_width * x)
@@ -166,39 +196,39 @@ class Screenshot:
         width = int(self._window_width * width)
         height = int(self._window_height * height)
 
-        screenshot = ImageGrab.grab(
-            bbox=(x, y, x + width, y + height), all_screens=True
+        screenshot = np.asarray(
+            ImageGrab.grab(bbox=(x, y, x + width, y + height), all_screens=True)
         )
 
-        screenshot = screenshot.resize(
-            (int(width / self._x_scaling_factor), int(height / self._y_scaling_factor))
-        )
+        scale = self._layout.scale
+        if native or scale == 1:
+            return screenshot
 
-        return screenshot
+        # area averaging is the fastest good filter for shrinking, but blocky for growing
+        return cv2.resize(
+            screenshot,
+            (int(width / scale), int(height / scale)),
+            interpolation=cv2.INTER_AREA if scale > 1 else cv2.INTER_CUBIC,
+        )
 
-    def _screenshot_stats(self, key: str) -> dict:
+    def _screenshot_stats(self, key: str) -> CapturedItem:
         """Takes a screenshot of the stats
 
         :param key: The key of the stats to screenshot
-        :return: A dict of the stats with the key being the stat name and the value being the screenshot
+        :return: The item holding the screenshot of each stat
         """
-        coords = SCREENSHOT_COORDS[self._aspect_ratio]
-
-        img = self._take_screenshot(*coords["stats"])
+        coords = self._coords
 
-        adjusted_stat_coords = {
-            k: tuple(
-                [
-                    int(v * img.width) if i % 2 == 0 else int(v * img.height)
-                    for i, v in enumerate(v)
-                ]
-            )
-            for k, v in coords[key].items()
-        }
+        img = self._grab(*coords["stats"])
+        height, width = img.shape[:2]
 
-        res = {k: img.crop(v) for k, v in adjusted_stat_coords.items()}
+        rois = {}
+        for k, (x0, y0, x1, y1) in coords[key].items():
+            rois[k] = img[
+                int(y0 * height) : int(y1 * height), int(x0 * width) : int(x1 * width)
+            ]
 
-        return res
+        return CapturedItem(rois)
 
     def _screenshot_traces(self, key: str) -> dict:
         """Takes a screenshot of the trace levels
@@ -206,7 +236,7 @@ class Screenshot:
         :param key: The key of the traces to screenshot
         :return: A dict of the traces with the key being the trace name and the value being the screenshot
         """
-        coords = SCREENSHOT_COORDS[self._aspect_ratio]
+        coords = self._coords
 
         res = {}
 
@@ -217,8 +247,8 @@ class Screenshot:
         for k, v in coords["character"]["traces"][key].items():
             left = self._window_x + int(self._window_width * v[0])
             upper = self._window_y + int(self._window_height * v[1])
-            right = left + int(self._window_width * 0.04)
-            lower = upper + int(self._window_height * 0.028)
+            right = left + int(self._window_width * self._layout.dx(0.04))
+            lower = upper + int(self._window_height * self._layout.dy(0.028))
 
             res[k] = screenshot.crop((left - x0, upper - y0, right - x0, lower - y0))
 